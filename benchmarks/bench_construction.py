@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+"""Benchmark the NaverTTS construction rate.
+
+Usage::
+
+    $ PYTHONPATH=. python benchmarks/bench_construction.py [-n 200000]
+
+"""
+
+import argparse
+import time
+
+from navertts import NaverTTS, Voice
+
+
+def rate(n, func):
+    t0 = time.perf_counter()
+    for _ in range(n):
+        func()
+    return n / (time.perf_counter() - t0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("-n", type=int, default=200000, help="objects to create")
+    args = parser.parse_args()
+
+    voice = Voice(lang="en", speed="slow")
+    cases = [
+        ("defaults", lambda: NaverTTS("hello")),
+        ("keywords", lambda: NaverTTS("hello", lang="en", speed="slow", gender="m")),
+        ("shared voice", lambda: NaverTTS("hello", voice=voice)),
+    ]
+    for name, func in cases:
+        print("%-14s %12.0f objects/s" % (name, rate(args.n, func)))
+
+
+if __name__ == "__main__":
+    main()
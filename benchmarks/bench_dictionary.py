@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+"""Benchmark PreProcessorDict against PreProcessorSub as the dictionary grows.
+
+The cost per character of PreProcessorDict should stay about the same
+whatever the number of entries, while PreProcessorSub makes one pass per
+entry (it's skipped above ``--max-sub`` entries).
+
+Usage::
+
+    $ PYTHONPATH=. python benchmarks/bench_dictionary.py [--kb 200] [--entries 10 1000 100000]
+
+"""
+
+import argparse
+import random
+import time
+
+from navertts.tokenizer import PreProcessorDict, PreProcessorSub
+
+WORDS = (
+    "the quick brown fox jumps over lazy dog while farmer watches from porch "
+    "and wonders whether weather will hold until harvest is over barn full"
+).split()
+
+
+def make_entries(n, r):
+    """``n`` entries, some of them words of the text"""
+    entries = [(w, w.upper()) for w in WORDS[: min(n, len(WORDS) // 2)]]
+    while len(entries) < n:
+        word = "".join(r.choice("abcdefghijklmnopqrstuvwxyz") for _ in range(8))
+        entries.append((word, word.upper()))
+    return entries
+
+
+def timeit(func, text, repeat=3):
+    best = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        out = func(text)
+        elapsed = time.perf_counter() - t0
+        best = elapsed if best is None else min(best, elapsed)
+    return best, out
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--kb", type=float, default=200)
+    parser.add_argument(
+        "--entries", type=int, nargs="+", default=[10, 100, 1000, 10000, 100000]
+    )
+    parser.add_argument("--max-sub", type=int, default=1000)
+    args = parser.parse_args()
+
+    r = random.Random(0)
+    text = []
+    size = 0
+    while size < args.kb * 1000:
+        word = r.choice(WORDS)
+        text.append(word)
+        size += len(word) + 1
+    text = " ".join(text)
+
+    print(
+        "%8s %10s %14s %12s %14s" % ("entries", "build", "Dict ns/char", "Dict", "Sub")
+    )
+    for n in args.entries:
+        entries = make_entries(n, r)
+        pp = PreProcessorDict(entries)
+        t0 = time.perf_counter()
+        pp.run("")
+        build = time.perf_counter() - t0
+        t_dict, out = timeit(pp.run, text)
+
+        sub = "-"
+        if n <= args.max_sub:
+            t_sub, _ = timeit(PreProcessorSub(entries).run, text, repeat=1)
+            sub = "%.3fs" % t_sub
+        print(
+            "%8d %9.3fs %14.1f %11.3fs %14s"
+            % (n, build, t_dict / len(text) * 1e9, t_dict, sub)
+        )
+
+
+if __name__ == "__main__":
+    main()
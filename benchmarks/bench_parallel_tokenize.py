@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+"""Benchmark ParallelTokenizer scaling from 1 to N processes.
+
+Usage::
+
+    $ PYTHONPATH=. python benchmarks/bench_parallel_tokenize.py [--mb 20] [--max-procs N]
+
+"""
+
+import argparse
+import multiprocessing
+import time
+
+from navertts.parallel import ParallelTokenizer
+from navertts.tts import NaverTTS
+
+PARAGRAPH = (
+    "Dr. Smith arrived at 10:30, as planned. Was it too late? No! "
+    "The meeting -- held in the main hall -- went on for hours; "
+    "everyone (even Mr. Jones) had something to say. "
+    "M. Dupont summed it up: the project, at last, was finished.\n\n"
+)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--mb", type=float, default=20, help="corpus size in MB")
+    parser.add_argument("--max-procs", type=int, default=multiprocessing.cpu_count())
+    parser.add_argument("--block-size", type=int, default=1 << 16)
+    args = parser.parse_args()
+
+    text = PARAGRAPH * int(args.mb * 1e6 / len(PARAGRAPH))
+    tts = NaverTTS(text="x")
+    print("corpus: %.1f MB" % (len(text) / 1e6))
+
+    t0 = time.perf_counter()
+    expected = tts._tokenize(text)
+    serial = time.perf_counter() - t0
+    print("%-10s %8.2fs %8s" % ("serial", serial, "1.00x"))
+
+    for procs in range(1, args.max_procs + 1):
+        pt = ParallelTokenizer.from_tts(
+            tts, processes=procs, block_size=args.block_size
+        )
+        t0 = time.perf_counter()
+        tokens = pt.run(text)
+        elapsed = time.perf_counter() - t0
+        assert tokens == expected, "parallel output differs from serial output"
+        print("%-10s %8.2fs %7.2fx" % ("%d procs" % procs, elapsed, serial / elapsed))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+"""Benchmark reading a text against a cassette, offline and deterministically.
+
+Record the cassette once (against the real API) with::
+
+    $ navertts-cli --file book.txt --output book.mp3 --record book.cassette
+
+then time the same run, as many times as needed, without the network::
+
+    $ PYTHONPATH=. python benchmarks/bench_replay.py book.txt book.cassette \\
+        [--latency 1.0] [--repeat 3]
+
+"""
+
+import argparse
+import io
+import time
+
+from navertts.cassette import ReplayTransport
+from navertts.tts import NaverTTS
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("text", help="text file that was recorded")
+    parser.add_argument("cassette", help="cassette file")
+    parser.add_argument("--lang", default="ko", help="language it was read in")
+    parser.add_argument(
+        "--latency", type=float, default=1.0, help="factor of the recorded latencies"
+    )
+    parser.add_argument("--repeat", type=int, default=3, help="runs")
+    args = parser.parse_args()
+
+    with io.open(args.text, encoding="utf-8") as f:
+        text = f.read()
+
+    for run in range(args.repeat):
+        replay = ReplayTransport(args.cassette, latency=args.latency)
+        tts = NaverTTS(text=text, lang=args.lang, transport=replay)
+        t0 = time.perf_counter()
+        parts = tts.write_to_fp(io.BytesIO())
+        elapsed = time.perf_counter() - t0
+        print(
+            "run %d: %d parts in %.3fs (%.1f parts/s), %d miss(es)"
+            % (run + 1, len(parts), elapsed, len(parts) / elapsed, replay.misses)
+        )
+
+
+if __name__ == "__main__":
+    main()
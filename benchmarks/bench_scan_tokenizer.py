@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+"""Benchmark ScanTokenizer against the default regex Tokenizer.
+
+Usage::
+
+    $ PYTHONPATH=. python benchmarks/bench_scan_tokenizer.py [--mb 1 5 20]
+
+"""
+
+import argparse
+import time
+
+from navertts.tokenizer import ScanTokenizer, Tokenizer, tokenizer_cases
+
+# Punctuation-heavy
+DENSE = (
+    "Dr. Smith arrived at 10:30, as planned. Was it too late? No! "
+    "The meeting (held in the main hall) went on for hours; "
+    "everyone had something to say: e.g. the budget, the plan... "
+    "这是一个三岁的小孩在讲述她从一系列照片里看到的东西。 "
+)
+
+# Typical prose, a cut every sentence or so
+PROSE = (
+    "The quick brown fox jumps over the lazy dog while the farmer watches "
+    "from the porch and wonders whether the weather will hold until the "
+    "harvest is over and the barn is full again for the long winter months. "
+    "Nobody in the village remembers a summer as dry as this one and the old "
+    "well at the end of the road has not given a drop of water since spring, "
+    "so every morning the children walk down to the river with their buckets "
+    "and come back with stories about the fish and the herons they have seen. "
+)
+
+
+def timeit(func, text, repeat=3):
+    best = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        tokens = func(text)
+        elapsed = time.perf_counter() - t0
+        best = elapsed if best is None else min(best, elapsed)
+    return best, tokens
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--mb", type=float, nargs="+", default=[1, 5, 20])
+    args = parser.parse_args()
+
+    regex = Tokenizer(
+        [
+            tokenizer_cases.tone_marks,
+            tokenizer_cases.period_comma,
+            tokenizer_cases.colon,
+            tokenizer_cases.other_punctuation,
+        ]
+    ).run
+    scan = ScanTokenizer().run
+
+    print("%6s %8s %12s %12s %8s" % ("", "MB", "Tokenizer", "ScanTok.", "speedup"))
+    for name, corpus in (("dense", DENSE), ("prose", PROSE)):
+        for mb in args.mb:
+            text = corpus * int(mb * 1e6 / len(corpus))
+            t_regex, expected = timeit(regex, text)
+            t_scan, tokens = timeit(scan, text)
+            assert tokens == expected, "ScanTokenizer output differs"
+            print(
+                "%6s %8.1f %11.3fs %11.3fs %7.2fx"
+                % (name, mb, t_regex, t_scan, t_regex / t_scan)
+            )
+
+
+if __name__ == "__main__":
+    main()
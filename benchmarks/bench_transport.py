@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+"""Benchmark the per-part overhead of each transport against a local server.
+
+Parts are fetched one at a time (no concurrency), so the time per part is
+the round-trip to the local server plus the work of the HTTP stack and of
+NaverTTS itself. The in-memory FakeTransport gives the floor: NaverTTS
+without any HTTP.
+
+Usage::
+
+    $ PYTHONPATH=. python benchmarks/bench_transport.py [-n 2000] [--frames 16]
+
+"""
+
+import argparse
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+
+import requests
+
+from navertts import constants
+from navertts.transport import (
+    SILENT_FRAME,
+    FakeTransport,
+    RequestsTransport,
+    Urllib3Transport,
+)
+from navertts.tts import NaverTTS
+
+
+class Server(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # Keep-alive
+    disable_nagle_algorithm = True
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        body = self.server.body
+        self.send_response(200)
+        self.send_header("Content-Type", "audio/mpeg")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def per_part(tts, n):
+    """Seconds per part, fetching ``n`` parts in a row"""
+    urls = [
+        constants.translate_endpoint(text="part %d" % i, speaker=tts.speaker)
+        for i in range(n)
+    ]
+    tts._request_part(0, urls[0])  # Warm up (e.g. connect)
+    t0 = time.perf_counter()
+    for i, url in enumerate(urls):
+        tts._request_part(i, url)
+    return (time.perf_counter() - t0) / n
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("-n", type=int, default=2000, help="parts to fetch")
+    parser.add_argument("--frames", type=int, default=16, help="mp3 frames per part")
+    args = parser.parse_args()
+
+    body = SILENT_FRAME * args.frames
+    server = Server(("127.0.0.1", 0), Handler)
+    server.body = body
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    constants.TRANSLATE_ENDPOINT = "http://127.0.0.1:%d/api/nvoice" % (
+        server.server_address[1]
+    )
+    print("%d parts of %d bytes" % (args.n, len(body)))
+
+    cases = [
+        ("fake", FakeTransport(body=body)),
+        ("urllib3", Urllib3Transport()),
+        ("requests", RequestsTransport()),
+        ("session", RequestsTransport(session=requests.Session())),
+    ]
+    floor = None
+    for name, transport in cases:
+        seconds = per_part(NaverTTS(text="x", transport=transport), args.n)
+        floor = seconds if floor is None else floor
+        print(
+            "%-10s %8.1f us/part %8.1f us over fake"
+            % (name, seconds * 1e6, (seconds - floor) * 1e6)
+        )
+        transport.close()
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,22 @@
 # -*- coding: utf-8 -*-
+from . import profiling  # noqa: F401 (first, to time the import of the others)
+from .cancel import CancelToken
 from .tts import NaverTTS
+from .tts import NaverTTSCancelled
 from .tts import NaverTTSError
+from .tts import NaverTTSInvalidPayload
+from .tts import NaverTTSRateLimited
+from .tts import NaverTTSTimeout
+from .tts import Voice
 from .version import __version__  # noqa: F401
 
-__all__ = ["NaverTTS", "NaverTTSError"]
+__all__ = [
+    "CancelToken",
+    "NaverTTS",
+    "NaverTTSCancelled",
+    "NaverTTSError",
+    "NaverTTSInvalidPayload",
+    "NaverTTSRateLimited",
+    "NaverTTSTimeout",
+    "Voice",
+]
@@ -0,0 +1,285 @@
+# -*- coding: utf-8 -*-
+from . import utils
+
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+import io
+import json
+import logging
+import tarfile
+import threading
+import time
+import zipfile
+
+__all__ = ["ArchiveWriter", "write_archive"]
+
+# Logger
+log = logging.getLogger(__name__)
+log.addHandler(logging.NullHandler())
+
+TAR = "tar"
+ZIP = "zip"
+FORMATS = (TAR, ZIP)
+
+# Name of the last entry of an archive: the index of the others
+INDEX_NAME = "index.json"
+
+
+class _Sequential:
+    """A file-like object written to in sequence, that knows its position.
+
+    ``tarfile`` and ``zipfile`` need to ``tell()``: this lets them write to
+    pipes (e.g. stdout) too.
+
+    """
+
+    def __init__(self, fp):
+        self._fp = fp
+        self.pos = 0
+
+    def write(self, data):
+        self._fp.write(data)
+        self.pos += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.pos
+
+    def flush(self):
+        if hasattr(self._fp, "flush"):
+            self._fp.flush()
+
+
+class ArchiveWriter:
+    """Write synthesized items into a tar or zip archive, as they complete.
+
+    Each item is synthesized in memory (with :meth:`NaverTTS.write_to_fp
+    <navertts.NaverTTS.write_to_fp>`), then written as an entry of the
+    archive at once: no temporary files, and ``fp`` is only written to in
+    sequence, so it can be any file-like object that takes bytes (e.g.
+    stdout). Entries are stored, not compressed (``mp3`` doesn't compress):
+    the ``size`` bytes of an entry are at its ``offset`` in the archive,
+    ready to be read without unpacking it.
+
+    Once closed, the archive ends with an :data:`INDEX_NAME` entry: the
+    ``name``, ``offset``, ``size``, ``duration`` and number of ``parts`` of
+    each entry, as JSON.
+
+    Args:
+        fp (file object): Any file-like object to write the archive to.
+        format (string): ``"tar"`` or ``"zip"``.
+        index (bool): Whether to end the archive with the index.
+
+    Attributes:
+        entries (list): The index entry (a ``dict``) of each item written,
+            in the order of the archive.
+
+    Raises:
+        ValueError: When ``format`` is unknown.
+
+    Example:
+        >>> voice = Voice(lang="en")
+        >>> with ArchiveWriter(sys.stdout.buffer, "tar") as archive:
+        ...     for i, text in enumerate(texts):
+        ...         archive.add("%d.mp3" % i, NaverTTS(text, voice=voice))
+
+    """
+
+    def __init__(self, fp, format=TAR, index=True):
+        """Create the archive."""
+        if format not in FORMATS:
+            raise ValueError(
+                "format must be one of {}. Got {!r}".format(FORMATS, format)
+            )
+        self.format = format
+        self.index = index
+        self.entries = []
+        self._names = set()
+        self._lock = threading.Lock()
+        self._fp = _Sequential(fp)
+        if format == TAR:
+            self._archive = tarfile.open(fileobj=self._fp, mode="w")
+        else:
+            self._archive = zipfile.ZipFile(self._fp, mode="w")
+
+    def add(self, name, tts, deadline=None, cancel=None):
+        """Synthesize ``tts`` and write it as the entry ``name``.
+
+        Thread-safe: items added by several threads at once are written as
+        they complete.
+
+        Args:
+            name (string): Name of the entry in the archive.
+            tts (:class:`navertts.NaverTTS`): The item.
+            deadline (float, optional): Seconds to read the item in.
+            cancel (:class:`navertts.cancel.CancelToken`, optional): A token
+                to stop the requests of the item with.
+
+        Returns:
+            dict: The index entry of the item.
+
+        Raises:
+            :class:`navertts.NaverTTSError`: When synthesizing fails; nothing
+                is written.
+            ValueError: When there's already an entry ``name``.
+
+        """
+        buf = io.BytesIO()
+        parts = tts.write_to_fp(buf, deadline, cancel)
+        return self.write(name, buf.getvalue(), parts)
+
+    def write(self, name, data, parts=()):
+        """Write ``data`` as the entry ``name``.
+
+        Args:
+            name (string): Name of the entry in the archive.
+            data (bytes): Content of the entry.
+            parts (list): The :class:`navertts.tts.PartResult` of ``data``,
+                if any.
+
+        Returns:
+            dict: The index entry of ``data``.
+
+        Raises:
+            ValueError: When there's already an entry ``name``, or the
+                archive is closed.
+
+        """
+        with self._lock:
+            if self._archive is None:
+                raise ValueError("The archive is closed")
+            if name in self._names or name == INDEX_NAME:
+                raise ValueError("Duplicate entry: {}".format(name))
+            offset = self._write(name, data)
+            self._names.add(name)
+            entry = {
+                "name": name,
+                "offset": offset,
+                "size": len(data),
+                "duration": sum(p.duration for p in parts),
+                "parts": len(parts),
+            }
+            self.entries.append(entry)
+        utils._log(log.debug, "%s: %i bytes at %i", name, len(data), offset)
+        return entry
+
+    def _write(self, name, data):
+        # Called with the lock held. Returns the offset of the content
+        if self.format == TAR:
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            info.mtime = int(time.time())
+            self._archive.addfile(info, io.BytesIO(data))
+            # The content is followed by padding, to a whole block
+            blocks = -(-len(data) // tarfile.BLOCKSIZE)
+            return self._fp.pos - blocks * tarfile.BLOCKSIZE
+        info = zipfile.ZipInfo(name, time.localtime()[:6])
+        info.file_size = len(data)
+        with self._archive.open(info, mode="w") as f:
+            # The local header is written
+            offset = self._fp.pos
+            f.write(data)
+        return offset
+
+    def add_all(self, items, jobs=4):
+        """Synthesize many items, writing each as soon as it's complete.
+
+        Up to ``jobs`` items are synthesized at once, and written in the
+        order they complete. ``items`` is read as jobs are available, so it
+        can be a generator of any size.
+
+        Args:
+            items (iterable): ``(name, tts)`` of each item, ``tts`` being a
+                :class:`navertts.NaverTTS` (possibly sharing a
+                :class:`navertts.Voice`).
+            jobs (int): Number of items synthesized at once.
+
+        Returns:
+            list: The index entry of each item written so far, in the order of
+            the archive.
+
+        Raises:
+            :class:`navertts.NaverTTSError`: When an item fails, once the items
+                being synthesized are written.
+            ValueError: When two items have the same ``name``.
+
+        """
+        with ThreadPoolExecutor(max_workers=jobs) as pool:
+            running = set()
+            for name, tts in items:
+                if len(running) >= jobs:
+                    done, running = wait(running, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        future.result()
+                running.add(pool.submit(self.add, name, tts))
+            for future in wait(running)[0]:
+                future.result()
+        return self.entries
+
+    def to_dict(self):
+        """Return the index of the archive (e.g. for ``json.dumps``)."""
+        with self._lock:
+            entries = list(self.entries)
+        return {
+            "format": self.format,
+            "size": sum(e["size"] for e in entries),
+            "duration": sum(e["duration"] for e in entries),
+            "entries": entries,
+        }
+
+    def close(self):
+        """Write the index (if enabled), and end the archive (not ``fp``)."""
+        index = json.dumps(self.to_dict(), ensure_ascii=False).encode("utf-8")
+        with self._lock:
+            if self._archive is None:
+                return
+            if self.index:
+                self._write(INDEX_NAME, index)
+            self._archive.close()
+            self._archive = None
+            self._fp.flush()
+
+    def __enter__(self):
+        """Write the archive in the block."""
+        return self
+
+    def __exit__(self, *exc):
+        """End the archive, with the entries written so far."""
+        self.close()
+
+    def __repr__(self):  # pragma: no cover
+        """Print the archive."""
+        return "ArchiveWriter(format={!r}, entries={})".format(
+            self.format, len(self.entries)
+        )
+
+
+def write_archive(fp, items, format=TAR, jobs=4, index=True):
+    """Synthesize many items into a tar or zip archive, as they complete.
+
+    See :class:`ArchiveWriter` and :meth:`ArchiveWriter.add_all`.
+
+    Args:
+        fp (file object): Any file-like object to write the archive to.
+        items (iterable): ``(name, tts)`` of each item.
+        format (string): ``"tar"`` or ``"zip"``.
+        jobs (int): Number of items synthesized at once.
+        index (bool): Whether to end the archive with the index.
+
+    Returns:
+        list: The index entry of each item, in the order of the archive.
+
+    Raises:
+        :class:`navertts.NaverTTSError`: When an item fails. The archive is
+            still ended, with the items complete by then.
+        ValueError: When ``format`` is unknown, or two items have the same
+            ``name``.
+
+    Example:
+        >>> voice = Voice(lang="en")
+        >>> with open("book.tar", "wb") as f:
+        ...     write_archive(f, (("%d.mp3" % i, NaverTTS(t, voice=voice))
+        ...                       for i, t in enumerate(chapters)))
+
+    """
+    with ArchiveWriter(fp, format, index) as archive:
+        return archive.add_all(items, jobs)
@@ -0,0 +1,135 @@
+# -*- coding: utf-8 -*-
+from concurrent import futures
+import threading
+import time
+import weakref
+
+__all__ = ["CancelToken"]
+
+
+class CancelToken:
+    """Cooperative cancellation of a synthesis, with an optional deadline.
+
+    Pass a token as the ``cancel`` argument of
+    :meth:`navertts.NaverTTS.write_to_fp` (or ``save``...) and call
+    :meth:`cancel` from any thread to stop it: queued part requests are
+    dropped, requests in flight are abandoned (their connections closed)
+    and the call raises :class:`navertts.tts.NaverTTSCancelled`. Once the
+    ``timeout`` has passed, it raises :class:`navertts.tts.NaverTTSTimeout`
+    instead.
+
+    Args:
+        timeout (float, optional): Seconds before the deadline, from now.
+        parent (:class:`CancelToken`, optional): A token that cancels this
+            one too (and whose deadline also applies).
+
+    Example:
+        Stop a synthesis when the user leaves::
+
+            >>> token = CancelToken()
+            >>> on_disconnect(token.cancel)
+            >>> try:
+            ...     tts.write_to_fp(fp, cancel=token)
+            ... except NaverTTSCancelled:
+            ...     pass
+
+    """
+
+    def __init__(self, timeout=None, parent=None):
+        """Create the token."""
+        self.deadline = None if timeout is None else time.monotonic() + timeout
+        self.parent = parent
+        self._reason = None
+        self._lock = threading.Lock()
+        # Done once cancelled, by the token or a parent: waited on along
+        # with the futures, so nothing is left registered on them
+        self._done = futures.Future()
+        self._children = weakref.WeakSet()
+        if parent is not None:
+            with parent._lock:
+                parent._children.add(self)
+            if parent.cancelled:
+                self._wake()
+
+    def cancel(self, reason="Cancelled"):
+        """Cancel, waking up anything waiting on the token (or its children).
+
+        Args:
+            reason (string): Why, for the error message.
+
+        """
+        with self._lock:
+            if self._reason is None:
+                self._reason = reason
+        self._wake()
+
+    @property
+    def reason(self):
+        """Why the token was cancelled, or ``None``."""
+        if self._reason is None and self.parent is not None:
+            return self.parent.reason
+        return self._reason
+
+    @property
+    def cancelled(self):
+        """Whether the token (or its parent) was cancelled."""
+        return self.reason is not None
+
+    def remaining(self):
+        """Seconds before the deadline (of the token or its parent).
+
+        Returns:
+            float: The seconds left (``<= 0`` once passed), or ``None``
+            without a deadline.
+
+        """
+        remaining = None
+        if self.deadline is not None:
+            remaining = self.deadline - time.monotonic()
+        if self.parent is not None:
+            parent = self.parent.remaining()
+            if parent is not None and (remaining is None or parent < remaining):
+                remaining = parent
+        return remaining
+
+    @property
+    def expired(self):
+        """Whether the deadline has passed."""
+        remaining = self.remaining()
+        return remaining is not None and remaining <= 0
+
+    def wait(self, future):
+        """Wait for ``future``, unless cancelled or past the deadline first.
+
+        Args:
+            future (:class:`concurrent.futures.Future`): The future.
+
+        Returns:
+            bool: Whether ``future`` is done.
+
+        """
+        while not future.done():
+            if self.cancelled:
+                return False
+            remaining = self.remaining()
+            if remaining is not None and remaining <= 0:
+                return False
+            futures.wait(
+                (future, self._done), remaining, return_when=futures.FIRST_COMPLETED
+            )
+        return True
+
+    def _wake(self):
+        # Wake up anything waiting on the token or its children
+        with self._lock:
+            children = list(self._children)
+            if not self._done.done():
+                self._done.set_result(None)
+        for child in children:
+            child._wake()
+
+    def __repr__(self):  # pragma: no cover
+        """Print the token."""
+        return "CancelToken(reason={!r}, remaining={})".format(
+            self.reason, self.remaining()
+        )
@@ -0,0 +1,294 @@
+# -*- coding: utf-8 -*-
+from . import utils
+from .transport import (
+    ConnectError,
+    ConnectTimeout,
+    Response,
+    Transport,
+    TransportError,
+    TransportTimeout,
+    get_transport,
+)
+
+import collections
+import io
+import json
+import logging
+import threading
+import time
+
+__all__ = ["RecordingTransport", "ReplayTransport", "read_cassette"]
+
+# Logger
+log = logging.getLogger(__name__)
+log.addHandler(logging.NullHandler())
+
+VERSION = 1
+
+# Transport errors by their name in a cassette, subclasses first
+_ERRORS = collections.OrderedDict(
+    [
+        ("connect_timeout", ConnectTimeout),
+        ("connect", ConnectError),
+        ("timeout", TransportTimeout),
+        ("error", TransportError),
+    ]
+)
+
+
+def _query(url):
+    """The request parameters of ``url``, as sent (whatever the host)."""
+    return url.partition("?")[2]
+
+
+def _error_name(e):
+    for name, cls in _ERRORS.items():
+        if isinstance(e, cls):
+            return name
+
+
+def read_cassette(path):
+    """Read the interactions of a cassette.
+
+    A cassette starts with a JSON header line. Then each interaction is a
+    JSON line with the ``query`` of the request, the ``status``,
+    ``content_type`` and ``size`` of its response (or the ``error`` of the
+    request) and the ``latency`` observed (in seconds), followed by the
+    ``size`` bytes of the response body.
+
+    Args:
+        path (string): The cassette file.
+
+    Returns:
+        list: ``(entry, body)`` of each interaction, in order.
+
+    Raises:
+        ValueError: When ``path`` isn't a cassette.
+
+    """
+    interactions = []
+    with io.open(path, "rb") as f:
+        try:
+            header = json.loads(f.readline().decode("utf-8"))
+        except ValueError:
+            header = None
+        if not isinstance(header, dict) or header.get("cassette") != VERSION:
+            raise ValueError("{} is not a cassette (version {})".format(path, VERSION))
+        for line in iter(f.readline, b""):
+            entry = json.loads(line.decode("utf-8"))
+            body = f.read(entry.get("size", 0))
+            if len(body) < entry.get("size", 0):
+                # Interrupted while recording
+                utils._log(log.warning, "%s: truncated interaction", path)
+                break
+            interactions.append((entry, body))
+    return interactions
+
+
+class _RecordedResponse(Response):
+    def __init__(self, recorder, url, r, start):
+        super(_RecordedResponse, self).__init__(r.url, r.status_code, r.reason)
+        self.headers = r.headers
+        self._recorder = recorder
+        self._url = url
+        self._r = r
+        self._start = start
+
+    def iter_content(self, chunk_size):
+        chunks = []
+        try:
+            for chunk in self._r.iter_content(chunk_size):
+                chunks.append(chunk)
+                yield chunk
+        except TransportError as e:
+            self._recorder._record(self._url, self._start, error=e)
+            raise
+        self._recorder._record(self._url, self._start, self, b"".join(chunks))
+
+    def close(self):
+        self._r.close()
+
+
+class RecordingTransport(Transport):
+    """Record the requests sent by another transport into a cassette.
+
+    Every request is sent by ``transport``. Once its response is read to
+    the end (or the request fails), the interaction is appended to the
+    cassette: the request parameters, the status, content type and body of
+    the response and the time it took. A :class:`ReplayTransport` can then
+    serve them again, without the network. Responses that aren't read to
+    the end (e.g. cancelled ones) aren't recorded.
+
+    Args:
+        path (string): The cassette file, overwritten.
+        transport (:class:`navertts.transport.Transport`, optional): The
+            transport to record. Defaults to the process-wide one.
+
+    Example:
+        Record a run, then replay it twice as fast::
+
+            >>> with RecordingTransport("run.cassette") as recorder:
+            ...     NaverTTS(text, transport=recorder).save("run.mp3")
+            >>> replay = ReplayTransport("run.cassette", latency=0.5)
+            >>> NaverTTS(text, transport=replay).save("run.mp3")
+
+    """
+
+    def __init__(self, path, transport=None):
+        """Create the transport, and the cassette."""
+        self.path = path
+        self.transport = get_transport() if transport is None else transport
+        self.recorded = 0
+        self._lock = threading.Lock()
+        self._file = io.open(path, "wb")
+        self._write({"cassette": VERSION, "created": time.time()})
+
+    def _write(self, entry, body=b""):
+        # Called with the lock held (or from __init__)
+        line = json.dumps(entry, ensure_ascii=False, separators=(",", ":"))
+        self._file.write(line.encode("utf-8") + b"\n")
+        self._file.write(body)
+
+    def get(self, url, headers, timeout):
+        """Send a ``GET`` request, see :meth:`navertts.transport.Transport.get`."""
+        start = time.perf_counter()
+        try:
+            r = self.transport.get(url, headers, timeout)
+        except TransportError as e:
+            self._record(url, start, error=e)
+            raise
+        # The URL as requested (not as sent): what replays are matched on
+        return _RecordedResponse(self, url, r, start)
+
+    def _record(self, url, start, r=None, body=b"", error=None):
+        entry = {
+            "query": _query(url),
+            "latency": round(time.perf_counter() - start, 6),
+        }
+        if error is not None:
+            entry["error"] = _error_name(error)
+            entry["message"] = str(error)
+        else:
+            entry["status"] = r.status_code
+            entry["reason"] = r.reason
+            entry["content_type"] = r.headers.get("Content-Type")
+            entry["size"] = len(body)
+        with self._lock:
+            if self._file.closed:
+                return
+            self._write(entry, body)
+            self.recorded += 1
+        utils._log(log.debug, "recorded %s (%.3fs)", url, entry["latency"])
+
+    def close(self):
+        """Close the cassette (not the recorded transport)."""
+        with self._lock:
+            self._file.close()
+
+    def __enter__(self):
+        """Record until the end of the block."""
+        return self
+
+    def __exit__(self, *exc):
+        """Close the cassette."""
+        self.close()
+
+    def __repr__(self):  # pragma: no cover
+        """Print the transport."""
+        return "RecordingTransport({!r}, recorded={})".format(self.path, self.recorded)
+
+
+class _ReplayedResponse(Response):
+    def __init__(self, url, entry, body):
+        headers = {"Content-Length": str(len(body))}
+        if entry.get("content_type") is not None:
+            headers["Content-Type"] = entry["content_type"]
+        super(_ReplayedResponse, self).__init__(
+            url, entry["status"], entry.get("reason", ""), headers
+        )
+        self._body = body
+
+    def iter_content(self, chunk_size):
+        for pos in range(0, len(self._body), chunk_size):
+            yield self._body[pos : pos + chunk_size]
+
+
+class ReplayTransport(Transport):
+    """Serve the responses of a cassette, without the network.
+
+    Requests are matched to the recorded interactions on their parameters
+    (whatever the host). Interactions recorded several times for the same
+    parameters are served in order, the last one being served again from
+    then on. A request that isn't in the cassette gets a ``404``.
+
+    Args:
+        path (string): The cassette, from a :class:`RecordingTransport`.
+        latency (float): Factor of the recorded latencies: ``1`` to wait as
+            long as when recording, ``0.5`` for half as long, ``0`` not to
+            wait at all. A request whose latency is over its read timeout
+            waits for the timeout, then raises
+            :class:`navertts.transport.TransportTimeout`.
+
+    Attributes:
+        misses (int): Number of requests that weren't in the cassette.
+
+    Raises:
+        ValueError: When ``path`` isn't a cassette, or ``latency`` is negative.
+        IOError: When ``path`` can't be read.
+
+    """
+
+    def __init__(self, path, latency=1.0):
+        """Create the transport, reading the cassette."""
+        if latency < 0:
+            raise ValueError("latency must be positive. Got {}".format(latency))
+        self.path = path
+        self.latency = latency
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._interactions = collections.defaultdict(collections.deque)
+        for entry, body in read_cassette(path):
+            self._interactions[entry["query"]].append((entry, body))
+        utils._log(
+            log.debug, "%s: %i request(s) to replay", path, len(self._interactions)
+        )
+
+    def __len__(self):
+        """Number of distinct requests in the cassette."""
+        return len(self._interactions)
+
+    def get(self, url, headers, timeout):
+        """Replay a ``GET`` request, see :meth:`navertts.transport.Transport.get`."""
+        query = _query(url)
+        with self._lock:
+            recorded = self._interactions.get(query)
+            if not recorded:
+                self.misses += 1
+                entry, body = None, b""
+            elif len(recorded) > 1:
+                entry, body = recorded.popleft()
+            else:
+                entry, body = recorded[0]
+
+        if entry is None:
+            utils._log(log.debug, "not in %s: %s", self.path, url)
+            return _ReplayedResponse(
+                url, {"status": 404, "reason": "Not in cassette"}, b""
+            )
+        if self.latency:
+            latency = entry["latency"] * self.latency
+            # Waiting for the response is bounded by the read timeout
+            limit = None if timeout is None else timeout[1]
+            if limit is not None and latency > limit:
+                time.sleep(limit)
+                raise TransportTimeout(
+                    "Replayed latency of {:.3f}s is over the timeout".format(latency)
+                )
+            time.sleep(latency)
+        if "error" in entry:
+            raise _ERRORS.get(entry["error"], TransportError)(entry.get("message"))
+        return _ReplayedResponse(url, entry, body)
+
+    def __repr__(self):  # pragma: no cover
+        """Print the transport."""
+        return "ReplayTransport({!r}, latency={})".format(self.path, self.latency)
@@ -0,0 +1,221 @@
+# -*- coding: utf-8 -*-
+from . import utils
+
+import hashlib
+import io
+import json
+import logging
+import os
+
+__all__ = ["Checkpoint"]
+
+# Logger
+log = logging.getLogger(__name__)
+log.addHandler(logging.NullHandler())
+
+
+def _digest(text):
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+class Checkpoint:
+    """Partial output and manifest of a resumable :meth:`navertts.NaverTTS.save`.
+
+    The ``mp3`` is written to ``<savefile>.part``. Once a part is written
+    (and synced to disk), a line with its size, frames, duration and a
+    digest of its text is appended to the ``<savefile>.manifest`` sidecar
+    (JSON lines, after a header line with the voice). When the same text is saved again with the
+    same voice, the parts of the manifest that still match the text are
+    kept and the partial output is truncated after them: saving continues
+    from the first missing (or changed) part. Once all parts are written,
+    the partial output atomically replaces ``savefile``.
+
+    Args:
+        savefile (string): The path of the final ``mp3``.
+        voice (:class:`navertts.Voice`): The voice the text is read with.
+
+    Attributes:
+        total (int): Number of parts seen by :meth:`resume` (so far).
+        skipped (int): Number of parts found in the partial output.
+        offset (int): Size of those parts, in bytes.
+        start (float): Duration of those parts, in seconds.
+        parts (list): Index entry (see :meth:`navertts.tts.PartResult.to_dict`)
+            of every part found or committed.
+
+    """
+
+    VERSION = 2
+
+    def __init__(self, savefile, voice):
+        """Create the checkpoint."""
+        self.savefile = savefile
+        self.partial = savefile + ".part"
+        self.manifest = savefile + ".manifest"
+        self.header = {
+            "version": self.VERSION,
+            "lang": voice.lang,
+            "tld": voice.tld,
+            "speaker": voice.speaker,
+            "speed": voice.speed,
+        }
+        self.total = 0
+        self.skipped = 0
+        self.offset = 0
+        self.start = 0.0
+        self.parts = []
+        self.fp = None
+        self._entries = []
+        self._manifest_fp = None
+
+    def __enter__(self):
+        """Open the partial output, keeping the parts of a previous run."""
+        self._entries = self._load()
+        self.fp = io.open(self.partial, "r+b" if self._entries else "w+b")
+        # Without what couldn't be loaded (e.g. a half-written line)
+        self._rewrite_manifest()
+        return self
+
+    def __exit__(self, *exc):
+        """Close the files, keeping them for a later run unless finalized."""
+        self.close()
+
+    def close(self):
+        """Close the partial output and the manifest."""
+        for f in (self.fp, self._manifest_fp):
+            if f is not None:
+                f.close()
+        self.fp = self._manifest_fp = None
+
+    def _load(self):
+        """Entries of the manifest that are in the partial output."""
+        try:
+            with io.open(self.manifest, encoding="utf-8") as f:
+                lines = f.read().split("\n")
+            size = os.path.getsize(self.partial)
+        except (IOError, OSError):
+            return []
+
+        try:
+            if json.loads(lines[0]) != self.header:
+                utils._log(log.debug, "%s: other voice, starting over", self.manifest)
+                return []
+        except ValueError:
+            return []
+
+        entries = []
+        offset = 0
+        for line in lines[1:]:
+            try:
+                entry = json.loads(line)
+                entry = (
+                    entry["size"],
+                    entry["digest"],
+                    entry["frames"],
+                    entry["duration"],
+                )
+            except (ValueError, KeyError, TypeError):
+                # Interrupted while appending
+                break
+            offset += entry[0]
+            if offset > size:
+                break
+            entries.append(entry)
+        utils._log(log.debug, "%s: %i part(s) found", self.manifest, len(entries))
+        return entries
+
+    def _rewrite_manifest(self):
+        if self._manifest_fp is not None:
+            self._manifest_fp.close()
+        tmp = self.manifest + ".tmp"
+        with io.open(tmp, "w", encoding="utf-8") as f:
+            f.write(json.dumps(self.header) + "\n")
+            for entry in self._entries:
+                f.write(self._entry_line(*entry))
+        os.replace(tmp, self.manifest)
+        self._manifest_fp = io.open(self.manifest, "a", encoding="utf-8")
+
+    @staticmethod
+    def _entry_line(size, digest, frames, duration):
+        entry = {"size": size, "digest": digest, "frames": frames, "duration": duration}
+        return json.dumps(entry) + "\n"
+
+    def _truncate(self, idx, offset):
+        """Drop the parts from ``idx``, at ``offset`` in the partial output."""
+        if idx < len(self._entries):
+            utils._log(log.debug, "dropping part(s) from part-%i", idx)
+            del self._entries[idx:]
+            self._rewrite_manifest()
+        self.fp.seek(offset)
+        self.fp.truncate()
+
+    def resume(self, text_parts):
+        """Skip the parts already in the partial output.
+
+        Args:
+            text_parts (iterable): The text parts, in order.
+
+        Returns:
+            generator: ``(index, part)`` for each part left to write, from
+            the first one missing from the partial output.
+
+        """
+        text_parts = iter(text_parts)
+        for idx, part in enumerate(text_parts):
+            self.total += 1
+            if idx < len(self._entries) and self._entries[idx][1] == _digest(part):
+                size, _, frames, duration = self._entries[idx]
+                self.parts.append(
+                    {
+                        "index": idx,
+                        "text": part,
+                        "offset": self.offset,
+                        "size": size,
+                        "start": self.start,
+                        "duration": duration,
+                        "frames": frames,
+                    }
+                )
+                self.offset += size
+                self.start += duration
+                self.skipped += 1
+                continue
+
+            utils._log(log.debug, "resuming from part-%i", idx)
+            self._truncate(idx, self.offset)
+            yield idx, part
+            for idx, part in enumerate(text_parts, idx + 1):
+                self.total += 1
+                yield idx, part
+            return
+
+        # Every part was there (the text might have gotten shorter)
+        self._truncate(self.total, self.offset)
+
+    def commit(self, result):
+        """Record a part written to :attr:`fp`.
+
+        Args:
+            result (:class:`navertts.tts.PartResult`): The part.
+
+        """
+        self.fp.flush()
+        os.fsync(self.fp.fileno())
+        entry = (result.size, _digest(result.text), result.frames, result.duration)
+        self._entries.append(entry)
+        self._manifest_fp.write(self._entry_line(*entry))
+        self._manifest_fp.flush()
+        self.parts.append(result.to_dict())
+
+    def discard(self):
+        """Remove the partial output and the manifest."""
+        self.close()
+        for path in (self.partial, self.manifest):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def finalize(self):
+        """Atomically move the complete output to ``savefile``."""
+        self.close()
+        os.replace(self.partial, self.savefile)
+        os.remove(self.manifest)
+        utils._log(log.debug, "%s complete", self.savefile)
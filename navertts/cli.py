@@ -2,10 +2,22 @@
 from . import __version__
 from . import NaverTTS
 from . import NaverTTSError
+from . import Voice
+from .archive import FORMATS, TAR, ZIP, ArchiveWriter
+from .cassette import RecordingTransport, ReplayTransport
 from .lang import tts_langs
+from .profiling import Profiler
+from .spool import SpoolDaemon
+from .streaming import iter_chunks
+from .transport import get_transport
+from .tts import write_index
 import click
+import contextlib
+import io
+import json
 import logging
 import logging.config
+import os
 
 # Click settings
 CONTEXT_SETTINGS = {"help_option_names": ["-h", "--help"]}
@@ -85,14 +97,33 @@ def validate_speed(ctx, param, speed):
 
     try:
         return int(speed)
-    except TypeError:
-        raise click.UsageError(
+    except (TypeError, ValueError):
+        raise click.BadParameter(
             "'%s' not in list of supported speeds.\n"
             "Choose from ['slow', 'normal', 'fast'] or "
             "an integer between -5 (fast) and 5 (slow)." % speed
         )
 
 
+def validate_variants(ctx, param, variants):
+    """Validate <variant> options.
+
+    Parses each '<gender>[:<speed>]=<file>' into a (gender, speed, file)
+    tuple, speed being None when not set
+    """
+    parsed = []
+    for variant in variants:
+        voice, sep, path = variant.partition("=")
+        if not sep or not path:
+            raise click.BadParameter(
+                "'%s' is not of the form <gender>[:<speed>]=<file>." % variant
+            )
+        gender, _, speed = voice.partition(":")
+        speed = validate_speed(ctx, param, speed) if speed else None
+        parsed.append((gender or "f", speed, path))
+    return parsed
+
+
 def print_languages(ctx, param, value):
     """Print all languages.
 
@@ -125,6 +156,89 @@ def set_debug(ctx, param, debug):
     return
 
 
+def _checked_chunks(file):
+    """Read <file> in chunks, as for --stream."""
+    try:
+        for chunk in iter_chunks(file):
+            yield chunk
+    except UnicodeDecodeError as e:  # pragma: no cover
+        log.debug(str(e), exc_info=True)
+        raise click.FileError(
+            file.name, "<file> must be encoded using '%s'." % sys_encoding()
+        )
+
+
+def _echo_plan(plan, output):
+    """Print <plan> as JSON to <output> (or stdout)."""
+    text = json.dumps(plan.to_dict(), indent=2, ensure_ascii=False)
+    if output:
+        output.write((text + "\n").encode("utf-8"))
+    else:
+        click.echo(text)
+
+
+@contextlib.contextmanager
+def _profiling(enabled, output):
+    """Profile the block when <enabled>, then print the report on stderr."""
+    if not enabled:
+        yield None
+        return
+    profiler = Profiler().start()
+    try:
+        yield profiler
+    finally:
+        profiler.stop()
+        click.echo(profiler.report(), err=True)
+        if output:
+            profiler.dump(output)
+
+
+def _archive_items(files, voice):
+    """The (name, tts) of each of <files> (or line of stdin), as it's needed."""
+    if not files:
+        stdin = click.get_text_stream("stdin", encoding=sys_encoding())
+        lines = (line.strip() for line in stdin)
+        for i, line in enumerate(line for line in lines if line):
+            yield "%06d.mp3" % i, NaverTTS(text=line, voice=voice)
+        return
+    for path in files:
+        with io.open(path, encoding=sys_encoding()) as f:
+            text = f.read()
+        name = os.path.splitext(os.path.basename(path))[0] + ".mp3"
+        yield name, NaverTTS(text=text, voice=voice)
+
+
+def _write_variants(tts, variants, speed, tld, lang, nocheck, profiler=None):
+    """Write the <variant> files of <tts>, and print their timing."""
+    voices = [
+        Voice(
+            lang=lang,
+            tld=tld,
+            speed=speed if variant_speed is None else variant_speed,
+            gender=gender,
+            lang_check=not nocheck,
+        )
+        for gender, variant_speed, _ in variants
+    ]
+    paths = [path for _, _, path in variants]
+    try:
+        with contextlib.ExitStack() as stack:
+            fps = [stack.enter_context(open(path, "wb")) for path in paths]
+            if profiler:
+                fps = [profiler.writer(fp) for fp in fps]
+            results = tts.write_variants(list(zip(voices, fps)))
+    except NaverTTSError:
+        for path in paths:
+            if os.path.exists(path):
+                os.remove(path)
+        raise
+
+    for path, result in zip(paths, results):
+        timing = result.to_dict()
+        timing["output"] = path
+        click.echo(json.dumps(timing, sort_keys=True))
+
+
 @click.command(context_settings=CONTEXT_SETTINGS)
 @click.argument(
     "text", metavar="<text>", nargs=-1, required=False, callback=validate_text
@@ -189,6 +303,73 @@ def set_debug(ctx, param, debug):
     help="Print all documented available IETF language tags and exit. "
     "Use --tld beforehand to use an alternate domain",
 )
+@click.option(
+    "--stream",
+    default=False,
+    is_flag=True,
+    help="Read <file> (or standard input) in chunks as it's spoken, "
+    "for very large inputs.",
+)
+@click.option(
+    "--plan",
+    default=False,
+    is_flag=True,
+    help="Print the upstream requests needed (as JSON) instead of sending them.",
+)
+@click.option(
+    "--index",
+    metavar="<file>",
+    type=click.Path(dir_okay=False, writable=True),
+    help="Also write the byte offset and start time of each part "
+    "(as JSON) to <file>.",
+)
+@click.option(
+    "--variant",
+    "variants",
+    metavar="<voice>=<file>",
+    multiple=True,
+    callback=validate_variants,
+    help="Read with <voice>, '<gender>[:<speed>]' (e.g. 'm:slow'), to <file> "
+    "instead of <output>. Repeat for more variants: the text is tokenized "
+    "once for all of them. Prints the timing of each (as JSON).",
+)
+@click.option(
+    "--record",
+    metavar="<file>",
+    type=click.Path(dir_okay=False, writable=True),
+    help="Record the upstream requests and their responses to the cassette <file>.",
+)
+@click.option(
+    "--replay",
+    metavar="<file>",
+    type=click.Path(exists=True, dir_okay=False),
+    help="Serve the upstream requests from the cassette <file> (see --record) "
+    "instead of sending them.",
+)
+@click.option(
+    "--replay-latency",
+    metavar="<factor>",
+    type=click.FloatRange(min=0),
+    default=1.0,
+    show_default=True,
+    help="Wait <factor> times the recorded latency of each --replay'ed "
+    "response (0 not to wait).",
+)
+@click.option(
+    "--profile",
+    default=False,
+    is_flag=True,
+    help="Print the time spent in each phase (startup, pre-processing, "
+    "tokenizing, network and writes) and the functions that took the longest, "
+    "on stderr.",
+)
+@click.option(
+    "--profile-output",
+    metavar="<file>",
+    type=click.Path(dir_okay=False, writable=True),
+    help="Also write the profile of functions to <file>, for pstats "
+    "(implies --profile).",
+)
 @click.option(
     "--debug",
     default=False,
@@ -199,36 +380,350 @@ def set_debug(ctx, param, debug):
     help="Show debug information.",
 )
 @click.version_option(version=__version__)
-def tts_cli(text, file, output, speed, tld, lang, nocheck):
+def tts_cli(
+    text,
+    file,
+    output,
+    speed,
+    tld,
+    lang,
+    nocheck,
+    stream,
+    plan,
+    index,
+    variants,
+    record,
+    replay,
+    replay_latency,
+    profile,
+    profile_output,
+):
     """Read <text> to mp3 format using NAVER Papago's Text-to-Speech API.
 
     (set <text> or --file <file> to - for standard input)
     """
     # stdin for <text>
     if text == "-":
-        text = click.get_text_stream("stdin").read()
+        if stream:
+            file = click.get_text_stream("stdin")
+        else:
+            text = click.get_text_stream("stdin").read()
+
+    if variants and (output or plan or index):
+        raise click.UsageError(
+            "--variant can't be used together with --output, --plan or --index."
+        )
+    if record and replay:
+        raise click.UsageError("--record and --replay can't be used together.")
+
+    with _profiling(profile or profile_output, profile_output) as profiler:
+        # stdout (when no <output>)
+        if not output and not plan and not variants:
+            output = click.get_binary_stream("stdout")
 
-    # stdout (when no <output>)
-    if not output:
-        output = click.get_binary_stream("stdout")
+        # <file> input (stdin on '-' is handled by click.File)
+        if file and stream:
+            text = _checked_chunks(file)
+        elif file:
+            try:
+                text = file.read()
+            except UnicodeDecodeError as e:  # pragma: no cover
+                log.debug(str(e), exc_info=True)
+                raise click.FileError(
+                    file.name, "<file> must be encoded using '%s'." % sys_encoding()
+                )
 
-    # <file> input (stdin on '-' is handled by click.File)
-    if file:
+        # Upstream requests
+        transport = None
+        if replay:
+            try:
+                transport = ReplayTransport(replay, latency=replay_latency)
+            except (IOError, ValueError) as e:
+                raise click.FileError(replay, str(e))
+        elif record:
+            transport = RecordingTransport(record)
+
+        # Profiling: time the network, pre-processing, tokenizing and writes
+        if profiler:
+            transport = profiler.transport(
+                get_transport() if transport is None else transport
+            )
+            if output:
+                output = profiler.writer(output)
+
+        # TTS
         try:
-            text = file.read()
-        except UnicodeDecodeError as e:  # pragma: no cover
-            log.debug(str(e), exc_info=True)
-            raise click.FileError(
-                file.name, "<file> must be encoded using '%s'." % sys_encoding()
+            tts = NaverTTS(
+                text=text,
+                lang=lang,
+                speed=speed,
+                tld=tld,
+                lang_check=not nocheck,
+                transport=transport,
             )
+            if profiler:
+                tts = profiler.profile(tts)
+            if plan:
+                _echo_plan(tts.plan(), output)
+                return
+            if variants:
+                _write_variants(tts, variants, speed, tld, lang, nocheck, profiler)
+                return
+            # Only keep the index entries of (possibly many) parts, if any
+            parts = []
+            for part in tts.stream_to_fp(output):
+                if index:
+                    parts.append(part.to_dict())
+            if index:
+                write_index(index, parts)
+        except (ValueError, AssertionError) as e:
+            raise click.UsageError(str(e))
+        except NaverTTSError as e:
+            raise click.ClickException(str(e))
+        finally:
+            if record:
+                transport.close()
+
+
+@click.command(context_settings=CONTEXT_SETTINGS)
+@click.argument(
+    "spool_dir",
+    metavar="<dir>",
+    type=click.Path(exists=True, file_okay=False, writable=True),
+)
+@click.option(
+    "-o",
+    "--output",
+    metavar="<dir>",
+    type=click.Path(file_okay=False, writable=True),
+    help="Write the mp3 files to <dir> instead of the spool directory.",
+)
+@click.option(
+    "-s",
+    "--speed",
+    metavar="<speed>",
+    default="normal",
+    show_default=True,
+    callback=validate_speed,
+    help="Reading speed. Choose from 'slow', 'normal', 'fast' "
+    "or an integer between -5 (fast) and 5 (slow).",
+)
+@click.option(
+    "-t",
+    "--tld",
+    metavar="<tld>",
+    default="com",
+    show_default=True,
+    is_eager=True,  # Prioritize <tld> to ensure it gets set before <lang>
+    help="Top-level domain of the API host.",
+)
+@click.option(
+    "--nocheck",
+    default=False,
+    is_flag=True,
+    is_eager=True,  # Prioritize <nocheck> to ensure it gets set before <lang>
+    help="Disable strict IETF language tag checking. Allow undocumented tags.",
+)
+@click.option(
+    "-l",
+    "--lang",
+    metavar="<lang>",
+    default="ko",
+    show_default=True,
+    callback=validate_lang,
+    help="IETF language tag. Language to speak in. List documented tags with --all.",
+)
+@click.option(
+    "-j",
+    "--jobs",
+    metavar="<n>",
+    default=4,
+    show_default=True,
+    type=click.IntRange(min=1),
+    help="Number of files synthesized at once.",
+)
+@click.option(
+    "--db",
+    metavar="<file>",
+    type=click.Path(dir_okay=False, writable=True),
+    help="Job queue database. [default: <dir>/.navertts-spool.db]",
+)
+@click.option(
+    "--poll",
+    metavar="<seconds>",
+    default=1.0,
+    show_default=True,
+    type=click.FloatRange(min=0),
+    help="Seconds between scans of the spool directory.",
+)
+@click.option(
+    "--report",
+    metavar="<seconds>",
+    default=60.0,
+    show_default=True,
+    type=click.FloatRange(min=0),
+    help="Seconds between reports of the queue depth and throughput "
+    "(as JSON, on stderr).",
+)
+@click.option(
+    "--once",
+    default=False,
+    is_flag=True,
+    help="Process the files in the spool directory, then exit.",
+)
+@click.option(
+    "--debug",
+    default=False,
+    is_flag=True,
+    is_eager=True,  # Prioritize <debug> to see debug logs of callbacks
+    expose_value=False,
+    callback=set_debug,
+    help="Show debug information.",
+)
+@click.version_option(version=__version__)
+def spool_cli(
+    spool_dir, output, speed, tld, nocheck, lang, jobs, db, poll, report, once
+):
+    """Synthesize the <dir>/*.txt files to mp3, as they're dropped into <dir>.
+
+    Jobs are recorded in a durable queue: finished files aren't processed
+    again after a restart, and interrupted ones continue where they stopped.
+    """
+
+    def echo_stats(stats):
+        click.echo(json.dumps(stats, sort_keys=True), err=True)
 
-    # TTS
     try:
-        tts = NaverTTS(
-            text=text, lang=lang, speed=speed, tld=tld, lang_check=not nocheck
-        )
-        tts.write_to_fp(output)
+        voice = Voice(lang=lang, tld=tld, speed=speed, lang_check=not nocheck)
+    except ValueError as e:
+        raise click.UsageError(str(e))
+
+    daemon = SpoolDaemon(
+        spool_dir, output_dir=output, voice=voice, db=db, jobs=jobs, poll=poll
+    )
+    try:
+        if once:
+            daemon.run_once()
+            echo_stats(daemon.stats())
+        else:
+            daemon.run(report=report, on_report=echo_stats)
+    except KeyboardInterrupt:
+        echo_stats(daemon.stats())
+    finally:
+        daemon.close()
+
+
+@click.command(context_settings=CONTEXT_SETTINGS)
+@click.argument(
+    "files",
+    metavar="<file>",
+    nargs=-1,
+    type=click.Path(exists=True, dir_okay=False),
+)
+@click.option(
+    "-o",
+    "--output",
+    metavar="<file>",
+    type=click.File(mode="wb"),
+    default="-",
+    help="Write the archive to <file> instead of stdout.",
+)
+@click.option(
+    "--format",
+    "archive_format",
+    type=click.Choice(FORMATS),
+    help="Archive format. [default: zip for a .zip <output>, tar otherwise]",
+)
+@click.option(
+    "-s",
+    "--speed",
+    metavar="<speed>",
+    default="normal",
+    show_default=True,
+    callback=validate_speed,
+    help="Reading speed. Choose from 'slow', 'normal', 'fast' "
+    "or an integer between -5 (fast) and 5 (slow).",
+)
+@click.option(
+    "-t",
+    "--tld",
+    metavar="<tld>",
+    default="com",
+    show_default=True,
+    is_eager=True,  # Prioritize <tld> to ensure it gets set before <lang>
+    help="Top-level domain of the API host.",
+)
+@click.option(
+    "--nocheck",
+    default=False,
+    is_flag=True,
+    is_eager=True,  # Prioritize <nocheck> to ensure it gets set before <lang>
+    help="Disable strict IETF language tag checking. Allow undocumented tags.",
+)
+@click.option(
+    "-l",
+    "--lang",
+    metavar="<lang>",
+    default="ko",
+    show_default=True,
+    callback=validate_lang,
+    help="IETF language tag. Language to speak in. List documented tags with --all.",
+)
+@click.option(
+    "-j",
+    "--jobs",
+    metavar="<n>",
+    default=4,
+    show_default=True,
+    type=click.IntRange(min=1),
+    help="Number of files synthesized at once.",
+)
+@click.option(
+    "--index",
+    metavar="<file>",
+    type=click.Path(dir_okay=False, writable=True),
+    help="Also write the index of the archive (as JSON) to <file>.",
+)
+@click.option(
+    "--debug",
+    default=False,
+    is_flag=True,
+    is_eager=True,  # Prioritize <debug> to see debug logs of callbacks
+    expose_value=False,
+    callback=set_debug,
+    help="Show debug information.",
+)
+@click.version_option(version=__version__)
+def archive_cli(files, output, archive_format, speed, tld, nocheck, lang, jobs, index):
+    """Synthesize each <file> into an mp3 entry of a tar or zip archive.
+
+    (or each line of standard input, without <file>)
+
+    Entries are written as soon as they're complete, without temporary
+    files. The archive ends with an index.json entry: the offset and size
+    of each entry in the archive.
+    """
+    names = [os.path.splitext(os.path.basename(path))[0] for path in files]
+    if len(set(names)) < len(names):
+        raise click.UsageError("<file>s must have different names.")
+    if archive_format is None:
+        name = getattr(output, "name", "")
+        archive_format = ZIP if str(name).lower().endswith(".zip") else TAR
+
+    try:
+        voice = Voice(lang=lang, tld=tld, speed=speed, lang_check=not nocheck)
+    except ValueError as e:
+        raise click.UsageError(str(e))
+
+    archive = ArchiveWriter(output, archive_format)
+    try:
+        with archive:
+            archive.add_all(_archive_items(files, voice), jobs)
     except (ValueError, AssertionError) as e:
         raise click.UsageError(str(e))
     except NaverTTSError as e:
         raise click.ClickException(str(e))
+    finally:
+        if index:
+            with io.open(index, "w", encoding="utf-8") as f:
+                f.write(json.dumps(archive.to_dict(), ensure_ascii=False))
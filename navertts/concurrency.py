@@ -0,0 +1,163 @@
+# -*- coding: utf-8 -*-
+import logging
+import threading
+import time
+
+__all__ = ["AIMDLimit"]
+
+# Logger
+log = logging.getLogger(__name__)
+log.addHandler(logging.NullHandler())
+
+
+class AIMDLimit:
+    """Adaptive concurrency limit (additive increase, multiplicative decrease).
+
+    Tracks the outcome and latency of upstream requests to find how many of
+    them can run at once. While requests succeed with a stable latency and
+    the limit is actually used, the limit grows by about ``increase`` per
+    round-trip. On a drop (throttling ``429``, ``5xx``, connection error) or
+    a latency spike, it's multiplied by ``backoff``, at most once per
+    round-trip so that a burst of failures from one window counts once.
+
+    Args:
+        initial (int): Initial limit.
+        min_limit (int): Lowest the limit can go.
+        max_limit (int): Highest the limit can go.
+        increase (float): Additive increase per round-trip.
+        backoff (float): Multiplicative decrease factor, in ``(0, 1)``.
+        tolerance (float): A request slower than ``tolerance`` times the
+            baseline latency is a latency spike.
+        smoothing (float): Weight of a new sample in the baseline latency
+            (exponential moving average).
+
+    Example:
+        Report the outcome of each request::
+
+            >>> limit = AIMDLimit(initial=4)
+            >>> start = limit.start()
+            >>> try:
+            ...     r = fetch()
+            ... except ConnectionError:
+            ...     limit.on_drop(start)
+            ... else:
+            ...     limit.on_success(start)
+            >>> limit.limit
+            4
+
+    """
+
+    def __init__(
+        self,
+        initial=4,
+        min_limit=1,
+        max_limit=64,
+        increase=1.0,
+        backoff=0.5,
+        tolerance=2.0,
+        smoothing=0.1,
+    ):
+        """Create the limit."""
+        if not 0 < backoff < 1:
+            raise ValueError("backoff must be in (0, 1). Got {}".format(backoff))
+        if not min_limit <= initial <= max_limit:
+            raise ValueError("Expected min_limit <= initial <= max_limit")
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.increase = increase
+        self.backoff = backoff
+        self.tolerance = tolerance
+        self.smoothing = smoothing
+
+        self._lock = threading.Lock()
+        self._limit = float(initial)
+        self._inflight = 0
+        self._baseline = None
+        self._last_drop = None
+        self.drops = 0
+        self.spikes = 0
+
+    @property
+    def limit(self):
+        """Current concurrency limit (int)."""
+        return int(self._limit)
+
+    @property
+    def inflight(self):
+        """Number of started requests not reported yet."""
+        return self._inflight
+
+    @property
+    def baseline(self):
+        """Baseline latency in seconds (``None`` until the first success)."""
+        return self._baseline
+
+    def start(self):
+        """Record the start of a request.
+
+        Returns:
+            float: A start time to pass to :meth:`on_success` or :meth:`on_drop`.
+
+        """
+        with self._lock:
+            self._inflight += 1
+        return time.perf_counter()
+
+    def on_success(self, start):
+        """Record a successful request.
+
+        Args:
+            start (float): Value returned by :meth:`start`.
+
+        """
+        now = time.perf_counter()
+        latency = now - start
+        with self._lock:
+            self._inflight -= 1
+            if self._baseline is None:
+                self._baseline = latency
+            elif latency > self.tolerance * self._baseline:
+                self.spikes += 1
+                self._decrease(now, "latency spike (%.3fs)" % latency)
+                # Let the baseline follow lasting changes, slowly
+                self._baseline += self.smoothing / 4 * (latency - self._baseline)
+                return
+            else:
+                self._baseline += self.smoothing * (latency - self._baseline)
+
+            if self._inflight + 1 >= self._limit / 2:
+                # The limit is actually used: probe for more
+                self._limit = min(
+                    self.max_limit, self._limit + self.increase / self._limit
+                )
+
+    def on_drop(self, start):
+        """Record a request that was throttled or failed upstream.
+
+        Args:
+            start (float): Value returned by :meth:`start`.
+
+        """
+        with self._lock:
+            self._inflight -= 1
+            self.drops += 1
+            self._decrease(time.perf_counter(), "drop")
+
+    def on_ignore(self, start):
+        """Record a request whose outcome says nothing about congestion.
+
+        Args:
+            start (float): Value returned by :meth:`start`.
+
+        """
+        with self._lock:
+            self._inflight -= 1
+
+    def _decrease(self, now, reason):
+        # Called with the lock held
+        window = self._baseline or 0
+        if self._last_drop is not None and now - self._last_drop < window:
+            return
+        self._last_drop = now
+        self._limit = max(self.min_limit, self._limit * self.backoff)
+        log.debug("concurrency limit down to %d: %s", self._limit, reason)
@@ -5,6 +5,10 @@ TRANSLATE_PARAMS = (
     "?service=dictionary&speech_fmt=mp3&text={text}&speaker={speaker}&speed={speed}"
 )
 
+# Languages and speakers of a host, as JSON (see navertts.discovery).
+# A URL template with a {tld} field; None to only use LANGUAGES and SPEAKERS
+DISCOVERY_ENDPOINT = None
+
 LANGUAGES = {
     "en": "English",
     "es": "Spanish",
@@ -22,21 +26,33 @@ SPEAKERS = {
     "zh": {"f": "meimei", "m": "liangliang"},
 }
 
+# Typical reading rates (characters per second, at normal speed),
+# to estimate the duration of the audio
+CHARS_PER_SECOND = {
+    "en": 14.0,
+    "es": 14.0,
+    "ja": 7.0,
+    "ko": 7.0,
+    "zh": 4.5,
+}
+DEFAULT_CHARS_PER_SECOND = 10.0
+
 
-def get_speaker(lang="ko", gender="f"):
-    """Get the API name for the chosen speaker."""
+def get_speaker(lang="ko", gender="f", speakers=None):
+    """Get the API name for the chosen speaker (from ``speakers``, or SPEAKERS)."""
+    speakers = SPEAKERS if speakers is None else speakers
     try:
-        speakers = SPEAKERS[lang]
+        by_gender = speakers[lang]
     except KeyError:
         raise ValueError(
             "No speaker for language {}. "
-            "Available languages: {}".format(lang, list(SPEAKERS.keys()))
+            "Available languages: {}".format(lang, list(speakers.keys()))
         )
     try:
-        return speakers[gender]
+        return by_gender[gender]
     except KeyError:
         warnings.warn("Gender {} not available for language" " {}".format(gender, lang))
-        return list(speakers.values())[0]
+        return list(by_gender.values())[0]
 
 
 def translate_base(tld="com"):
@@ -44,6 +60,13 @@ def translate_base(tld="com"):
     return TRANSLATE_ENDPOINT.format(tld=tld)
 
 
+def discovery_endpoint(tld="com"):
+    """Get the discovery URL (None when discovery is disabled)."""
+    if DISCOVERY_ENDPOINT is None:
+        return None
+    return DISCOVERY_ENDPOINT.format(tld=tld)
+
+
 def translate_endpoint(text, speaker="kyuri", speed=0, tld="com"):
     """Get the endpoint URL."""
     url = translate_base(tld=tld)
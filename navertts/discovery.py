@@ -0,0 +1,325 @@
+# -*- coding: utf-8 -*-
+from . import constants
+from . import utils
+
+import io
+import json
+import logging
+import os
+import re
+import requests
+import threading
+import time
+from types import MappingProxyType
+
+__all__ = ["Discovery", "Tables", "get_discovery", "set_discovery"]
+
+# Logger
+log = logging.getLogger(__name__)
+log.addHandler(logging.NullHandler())
+
+DEFAULT_TTL = 24 * 60 * 60
+
+# Seconds before retrying a failed discovery
+DEFAULT_RETRY = 60
+
+
+class Tables:
+    """Read-only languages and speakers of an API host.
+
+    Attributes:
+        langs (mappingproxy): ``{'<lang>': '<name>'}``.
+        speakers (mappingproxy): ``{'<lang>': {'<gender>': '<speaker>'}}``.
+        fetched (float): When they were discovered (``time.time()``), or
+            ``None`` for the built-in tables.
+        endpoint (string): The discovery URL they come from, if any.
+
+    """
+
+    __slots__ = ("langs", "speakers", "fetched", "endpoint")
+
+    def __init__(self, langs, speakers, fetched=None, endpoint=None):
+        """Create the tables, on top of the built-in ones."""
+        all_langs = dict(constants.LANGUAGES)
+        all_langs.update(langs)
+        all_speakers = {k: dict(v) for k, v in constants.SPEAKERS.items()}
+        for lang, by_gender in speakers.items():
+            all_speakers.setdefault(lang, {}).update(by_gender)
+
+        self.langs = MappingProxyType(all_langs)
+        self.speakers = MappingProxyType(
+            {k: MappingProxyType(v) for k, v in all_speakers.items()}
+        )
+        self.fetched = fetched
+        self.endpoint = endpoint
+
+    @classmethod
+    def parse(cls, data, fetched=None, endpoint=None):
+        """Create the tables from a discovery answer.
+
+        Args:
+            data (dict): ``{"languages": {...}, "speakers": {...}}``, as
+                :attr:`langs` and :attr:`speakers`.
+
+        Raises:
+            ValueError: When ``data`` isn't of that form.
+
+        """
+        try:
+            langs = data.get("languages", {})
+            speakers = data.get("speakers", {})
+            langs = {k.lower(): v for k, v in langs.items() if isinstance(v, str)}
+            speakers = {
+                k.lower(): {g: s for g, s in v.items() if isinstance(s, str)}
+                for k, v in speakers.items()
+            }
+        except (AttributeError, TypeError):
+            raise ValueError("Unexpected discovery answer: {!r:.200}".format(data))
+        return cls(langs, speakers, fetched, endpoint)
+
+    def to_dict(self):
+        """Return the discovered part of the tables (e.g. for ``json.dumps``)."""
+        return {
+            "fetched": self.fetched,
+            "endpoint": self.endpoint,
+            "languages": dict(self.langs),
+            "speakers": {k: dict(v) for k, v in self.speakers.items()},
+        }
+
+    def __repr__(self):  # pragma: no cover
+        """Print the tables."""
+        return "Tables(langs={}, fetched={}, endpoint={!r})".format(
+            len(self.langs), self.fetched, self.endpoint
+        )
+
+
+# Built-in languages and speakers
+BUILTIN = Tables({}, {})
+
+
+class Discovery:
+    """Languages and speakers of each API host, discovered and cached.
+
+    The tables of a host (``tld``) are fetched as JSON from
+    ``constants.DISCOVERY_ENDPOINT`` and cached in memory and in a
+    ``directory`` (shared by the processes of a user), for ``ttl`` seconds. Looking them
+    up never waits on the network: until a host's tables are discovered,
+    or while they're refreshed once stale, the last known tables (or the
+    built-in ``constants.LANGUAGES`` and ``constants.SPEAKERS``) are used,
+    and a background thread fetches new ones.
+
+    The discovery endpoint answers with::
+
+        {"languages": {"en": "English", ...},
+         "speakers": {"en": {"f": "danna", "m": "matt"}, ...}}
+
+    Discovered languages and speakers are added to the built-in ones.
+
+    Args:
+        ttl (float): Seconds before discovered tables are refreshed.
+        directory (string, optional): Where tables are cached on disk.
+            Defaults to ``navertts/discovery`` in the user's cache directory
+            (``$XDG_CACHE_HOME``, or else ``~/.cache``). It's created only
+            accessible to the user, and cached tables are only read from
+            files owned by the user that no one else can write.
+        timeout (float): Timeout of a discovery request, in seconds.
+        retry (float): Seconds before retrying after a failed discovery.
+
+    Example:
+        Discover the voices of each host::
+
+            >>> constants.DISCOVERY_ENDPOINT = "https://example.com/voices?tld={tld}"
+            >>> tts_langs("com")  # Returns right away, fetches in the background
+            {'en': 'English', ...}
+            >>> get_discovery().refresh("com")  # Or wait for them
+
+    """
+
+    def __init__(
+        self, ttl=DEFAULT_TTL, directory=None, timeout=10, retry=DEFAULT_RETRY
+    ):
+        """Create the discovery cache."""
+        self.ttl = ttl
+        self.directory = directory or utils._cache_dir("discovery")
+        self.timeout = timeout
+        self.retry = retry
+
+        self._lock = threading.Lock()
+        self._tables = {}
+        self._threads = {}
+        self._attempts = {}
+
+    def _path(self, tld):
+        name = re.sub(r"[^\w.-]", "_", tld) or "_"
+        return os.path.join(self.directory, name + ".json")
+
+    def _stale(self, tables, now):
+        return tables.fetched is None or now - tables.fetched > self.ttl
+
+    def tables(self, tld="com"):
+        """Languages and speakers of ``tld``, without waiting.
+
+        Stale (or missing) tables are refreshed in the background.
+
+        Args:
+            tld (string): Top-level domain of the API host.
+
+        Returns:
+            :class:`Tables`: The last known tables of ``tld``.
+
+        """
+        endpoint = constants.discovery_endpoint(tld)
+        if endpoint is None:
+            return BUILTIN
+
+        tables = self._tables.get(tld)
+        now = time.time()
+        if tables is not None and tables.endpoint == endpoint:
+            if not self._stale(tables, now):
+                return tables
+
+        with self._lock:
+            tables = self._tables.get(tld)
+            if tables is None or tables.endpoint != endpoint:
+                tables = self._load(tld, endpoint) or BUILTIN
+                self._tables[tld] = tables
+            if self._stale(tables, now):
+                self._refresh_async(tld, now)
+        return tables
+
+    def _load(self, tld, endpoint):
+        """Tables of ``tld`` cached on disk (even stale), if any."""
+        path = self._path(tld)
+        try:
+            with io.open(path, encoding="utf-8") as f:
+                if not utils._trusted(os.fstat(f.fileno())):
+                    utils._log(log.warning, "%s: not the user's own, ignored", path)
+                    return None
+                data = json.load(f)
+            if data.get("endpoint") != endpoint:
+                return None
+            tables = Tables.parse(data, data["fetched"], endpoint)
+        except (IOError, OSError, ValueError, KeyError, AttributeError):
+            return None
+        utils._log(log.debug, "%s: loaded tables of '%s'", path, tld)
+        return tables
+
+    def _refresh_async(self, tld, now):
+        # Called with the lock held
+        thread = self._threads.get(tld)
+        if thread is not None and thread.is_alive():
+            return
+        if now - self._attempts.get(tld, now - self.retry) < self.retry:
+            return
+        self._attempts[tld] = now
+        thread = threading.Thread(
+            target=self._refresh_quietly, args=(tld,), name="navertts-discovery"
+        )
+        thread.daemon = True
+        self._threads[tld] = thread
+        thread.start()
+
+    def _refresh_quietly(self, tld):
+        try:
+            self.refresh(tld)
+        except RuntimeError as e:
+            log.debug(str(e), exc_info=True)
+            utils._log(log.warning, str(e))
+
+    def refresh(self, tld="com"):
+        """Discover the languages and speakers of ``tld`` now.
+
+        Args:
+            tld (string): Top-level domain of the API host.
+
+        Returns:
+            :class:`Tables`: The new tables (the built-in ones when discovery
+            is disabled).
+
+        Raises:
+            RuntimeError: When the tables can't be discovered.
+
+        """
+        endpoint = constants.discovery_endpoint(tld)
+        if endpoint is None:
+            return BUILTIN
+
+        utils._log(log.debug, "discovering '%s': %s", tld, endpoint)
+        try:
+            r = requests.get(endpoint, timeout=self.timeout)
+            r.raise_for_status()
+            tables = Tables.parse(r.json(), time.time(), endpoint)
+        except (requests.RequestException, ValueError) as e:
+            raise RuntimeError(
+                "Unable to discover languages of '{}': {}".format(tld, str(e))
+            )
+
+        with self._lock:
+            self._tables[tld] = tables
+        self._save(tld, tables)
+        return tables
+
+    def _save(self, tld, tables):
+        path = self._path(tld)
+        tmp = "{}.{}.tmp".format(path, os.getpid())
+        try:
+            utils._makedirs_private(self.directory)
+            # Not through a file (or link) that's already there
+            fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+            with io.open(fd, "w", encoding="utf-8") as f:
+                f.write(json.dumps(tables.to_dict(), ensure_ascii=False))
+            os.replace(tmp, path)
+        except (IOError, OSError) as e:
+            # Only cached in memory
+            log.debug(str(e), exc_info=True)
+
+    def join(self, timeout=None):
+        """Wait for the background refreshes.
+
+        Args:
+            timeout (float, optional): Seconds to wait for each of them.
+
+        """
+        with self._lock:
+            threads = list(self._threads.values())
+        for thread in threads:
+            thread.join(timeout)
+
+    def clear(self):
+        """Forget the tables cached in memory (not on disk)."""
+        with self._lock:
+            self._tables.clear()
+            self._attempts.clear()
+
+    def __repr__(self):  # pragma: no cover
+        """Print the discovery cache."""
+        return "Discovery(ttl={}, directory={!r})".format(self.ttl, self.directory)
+
+
+# Process-wide discovery cache, consulted by voices and the CLI
+_discovery = Discovery()
+
+
+def get_discovery():
+    """Get the process-wide :class:`Discovery` cache.
+
+    Returns:
+        :class:`Discovery`: The discovery cache.
+
+    """
+    return _discovery
+
+
+def set_discovery(discovery):
+    """Replace the process-wide discovery cache.
+
+    Args:
+        discovery (:class:`Discovery`): The new discovery cache.
+
+    Returns:
+        :class:`Discovery`: The previous discovery cache.
+
+    """
+    global _discovery
+    previous, _discovery = _discovery, discovery
+    return previous
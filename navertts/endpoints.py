@@ -0,0 +1,266 @@
+# -*- coding: utf-8 -*-
+from . import constants
+from . import utils
+
+import logging
+import threading
+import time
+
+__all__ = ["Endpoint", "EndpointPool", "get_endpoint_pool", "set_endpoint_pool"]
+
+# Logger
+log = logging.getLogger(__name__)
+log.addHandler(logging.NullHandler())
+
+
+class Endpoint:
+    """An API host of an :class:`EndpointPool`, and its health.
+
+    Attributes:
+        template (string): Base URL of the TTS endpoint, with an optional
+            ``{tld}`` field, like ``constants.TRANSLATE_ENDPOINT``.
+        weight (float): Share of the requests it gets, relative to the others.
+        outstanding (int): Number of requests in flight.
+        requests (int): Number of requests sent so far.
+        failures (int): Number of failures in a row.
+        down_until (float): Until when (``time.monotonic()``) it's left out,
+            ``0`` while healthy.
+
+    """
+
+    __slots__ = (
+        "template",
+        "weight",
+        "outstanding",
+        "requests",
+        "failures",
+        "down_until",
+        "_current",
+    )
+
+    def __init__(self, template, weight=1.0):
+        """Create the endpoint."""
+        if weight <= 0:
+            raise ValueError("weight must be positive. Got {}".format(weight))
+        self.template = template
+        self.weight = float(weight)
+        self.outstanding = 0
+        self.requests = 0
+        self.failures = 0
+        self.down_until = 0.0
+        self._current = 0.0
+
+    def base(self, tld="com"):
+        """Get the base URL of the endpoint, for ``tld``."""
+        return self.template.format(tld=tld)
+
+    def rewrite(self, url, tld="com"):
+        """Send ``url``, a URL of the default endpoint, to this endpoint instead.
+
+        Args:
+            url (string): A URL from :func:`navertts.constants.translate_endpoint`.
+            tld (string): Top-level domain ``url`` was built with.
+
+        Returns:
+            string: The same request, on this endpoint.
+
+        """
+        default = constants.translate_base(tld=tld)
+        if not url.startswith(default):
+            raise ValueError("{} isn't a URL of {}".format(url, default))
+        return self.base(tld) + url[len(default) :]
+
+    def to_dict(self):
+        """Return the state of the endpoint (e.g. for ``json.dumps``)."""
+        return {
+            "endpoint": self.template,
+            "weight": self.weight,
+            "outstanding": self.outstanding,
+            "requests": self.requests,
+            "failures": self.failures,
+            "down": max(0.0, self.down_until - time.monotonic()),
+        }
+
+    def __repr__(self):  # pragma: no cover
+        """Print the endpoint."""
+        return "Endpoint({!r}, weight={}, outstanding={}, failures={})".format(
+            self.template, self.weight, self.outstanding, self.failures
+        )
+
+
+class EndpointPool:
+    """Equivalent API hosts to spread part requests over, with failover.
+
+    Each part request goes to one endpoint of the pool, chosen among the
+    healthy ones either by smooth weighted round robin
+    (:attr:`ROUND_ROBIN`) or as the one with the fewest requests in flight
+    for its weight (:attr:`LEAST_OUTSTANDING`). When an endpoint can't be
+    connected to, the request fails over to the next one. After
+    ``max_failures`` failures in a row (connection errors, timeouts, ``429``
+    and ``5xx`` answers, invalid payloads), an endpoint is left out for
+    ``cooldown`` seconds, then tried again. When every endpoint is down,
+    the one back the soonest is used.
+
+    Args:
+        endpoints (list): Base URLs of the TTS endpoint, with an optional
+            ``{tld}`` field (see ``constants.TRANSLATE_ENDPOINT``), or
+            ``(url, weight)`` tuples.
+        strategy (string): :attr:`ROUND_ROBIN` or :attr:`LEAST_OUTSTANDING`.
+        max_failures (int): Failures in a row before an endpoint is left out.
+        cooldown (float): Seconds an endpoint is left out.
+
+    Raises:
+        ValueError: When ``endpoints`` is empty, or ``strategy`` is unknown.
+
+    Example:
+        Spread requests over two hosts, twice as many to the first one::
+
+            >>> set_endpoint_pool(EndpointPool([
+            ...     ("https://tts-1.example.com/api/nvoice", 2),
+            ...     "https://tts-2.example.com/api/nvoice",
+            ... ]))
+            >>> NaverTTS(text).save("hello.mp3")
+
+    """
+
+    ROUND_ROBIN = "round_robin"
+    LEAST_OUTSTANDING = "least_outstanding"
+
+    def __init__(self, endpoints, strategy=ROUND_ROBIN, max_failures=3, cooldown=30.0):
+        """Create the pool."""
+        self.endpoints = [
+            Endpoint(*e) if isinstance(e, tuple) else Endpoint(e) for e in endpoints
+        ]
+        if not self.endpoints:
+            raise ValueError("No endpoints")
+        if strategy not in (self.ROUND_ROBIN, self.LEAST_OUTSTANDING):
+            raise ValueError(
+                "strategy must be '{}' or '{}'. Got {!r}".format(
+                    self.ROUND_ROBIN, self.LEAST_OUTSTANDING, strategy
+                )
+            )
+        self.strategy = strategy
+        self.max_failures = max_failures
+        self.cooldown = cooldown
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        """Number of endpoints."""
+        return len(self.endpoints)
+
+    def acquire(self, exclude=()):
+        """Choose the endpoint of a request.
+
+        Args:
+            exclude (iterable): Endpoints not to choose, e.g. those already
+                tried by the request.
+
+        Returns:
+            :class:`Endpoint`: The endpoint (to :meth:`release` once the
+            request is done), or ``None`` when they're all excluded.
+
+        """
+        now = time.monotonic()
+        with self._lock:
+            candidates = [e for e in self.endpoints if e not in exclude]
+            if not candidates:
+                return None
+            healthy = [e for e in candidates if e.down_until <= now]
+            if not healthy:
+                endpoint = min(candidates, key=lambda e: e.down_until)
+            elif self.strategy == self.LEAST_OUTSTANDING:
+                endpoint = min(
+                    healthy,
+                    key=lambda e: (e.outstanding / e.weight, e.requests / e.weight),
+                )
+            else:
+                endpoint = self._round_robin(healthy)
+            endpoint.outstanding += 1
+            endpoint.requests += 1
+        return endpoint
+
+    def _round_robin(self, endpoints):
+        # Smooth weighted round robin: spreads the picks of heavier endpoints
+        # rather than sending them in bursts. Called with the lock held
+        total = 0.0
+        for e in endpoints:
+            e._current += e.weight
+            total += e.weight
+        endpoint = max(endpoints, key=lambda e: e._current)
+        endpoint._current -= total
+        return endpoint
+
+    def release(self, endpoint, ok=None):
+        """Report the outcome of a request.
+
+        Args:
+            endpoint (:class:`Endpoint`): The endpoint, from :meth:`acquire`.
+            ok (bool, optional): Whether the endpoint answered properly
+                (``True``) or failed (``False``). ``None`` when the outcome
+                says nothing about its health (e.g. a cancelled request).
+
+        """
+        down = False
+        with self._lock:
+            endpoint.outstanding -= 1
+            if ok:
+                endpoint.failures = 0
+                endpoint.down_until = 0.0
+            elif ok is not None:
+                endpoint.failures += 1
+                down = endpoint.failures >= self.max_failures
+                if down:
+                    endpoint.down_until = time.monotonic() + self.cooldown
+        if down:
+            utils._log(
+                log.warning,
+                "%s: %i failure(s) in a row, left out for %.0fs",
+                endpoint.template,
+                endpoint.failures,
+                self.cooldown,
+            )
+
+    def to_dict(self):
+        """Return the state of the endpoints (e.g. for ``json.dumps``)."""
+        with self._lock:
+            return {
+                "strategy": self.strategy,
+                "endpoints": [e.to_dict() for e in self.endpoints],
+            }
+
+    def __repr__(self):  # pragma: no cover
+        """Print the pool."""
+        return "EndpointPool({}, strategy={!r})".format(
+            [e.template for e in self.endpoints], self.strategy
+        )
+
+
+# Process-wide endpoint pool, consulted by every part request
+_endpoint_pool = None
+
+
+def get_endpoint_pool():
+    """Get the process-wide :class:`EndpointPool`.
+
+    Returns:
+        :class:`EndpointPool`: The pool, ``None`` (the default) when requests
+        go to ``constants.TRANSLATE_ENDPOINT`` only.
+
+    """
+    return _endpoint_pool
+
+
+def set_endpoint_pool(pool):
+    """Replace the process-wide endpoint pool.
+
+    Args:
+        pool (:class:`EndpointPool`): The new pool, or ``None`` to only use
+            ``constants.TRANSLATE_ENDPOINT``.
+
+    Returns:
+        :class:`EndpointPool`: The previous pool (or ``None``).
+
+    """
+    global _endpoint_pool
+    previous, _endpoint_pool = _endpoint_pool, pool
+    return previous
@@ -0,0 +1,274 @@
+# -*- coding: utf-8 -*-
+from concurrent import futures
+import collections
+import heapq
+import itertools
+import logging
+import threading
+import time
+
+__all__ = ["HedgePolicy"]
+
+# Logger
+log = logging.getLogger(__name__)
+log.addHandler(logging.NullHandler())
+
+
+class _Timer:
+    """A single thread calling functions after a delay, for every policy."""
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._calls = []
+        self._seq = itertools.count()
+        self._thread = None
+
+    def call_later(self, delay, func):
+        """Call ``func()`` in ``delay`` seconds."""
+        with self._cond:
+            due = time.perf_counter() + delay
+            heapq.heappush(self._calls, (due, next(self._seq), func))
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="navertts-hedge-timer"
+                )
+                self._thread.daemon = True
+                self._thread.start()
+            self._cond.notify()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._calls or self._calls[0][0] > time.perf_counter():
+                    timeout = None
+                    if self._calls:
+                        timeout = self._calls[0][0] - time.perf_counter()
+                    self._cond.wait(timeout)
+                func = heapq.heappop(self._calls)[2]
+            try:
+                func()
+            except Exception:  # pragma: no cover
+                log.exception("hedge timer callback failed")
+
+
+_timer = _Timer()
+
+
+class _Race:
+    """A request and, once it's slow, its hedge: the first success wins."""
+
+    def __init__(self, policy, submit, func, args, delay):
+        self.future = futures.Future()
+        self._policy = policy
+        self._submit = submit
+        self._func = func
+        self._args = args
+        self._delay = delay
+        self._lock = threading.Lock()
+        self._start = None
+        self._requests = {}
+        self._hedged = False
+        self._denied = False
+        self._error = None
+        self._settled = False
+        self.future.add_done_callback(self._cancel)
+        self._send(HedgePolicy.PRIMARY)
+
+    def _send(self, outcome):
+        request = self._submit(self._run, outcome)
+        with self._lock:
+            if self._settled:
+                # Won while the hedge was submitted
+                request.cancel()
+                return
+            self._requests[request] = outcome
+            self._hedged = outcome == HedgePolicy.HEDGE
+        request.add_done_callback(self._done)
+
+    def _run(self, outcome):
+        if outcome == HedgePolicy.PRIMARY:
+            # From when the request is sent, not queued
+            self._start = time.perf_counter()
+            if self._delay is not None:
+                _timer.call_later(self._delay, self._hedge)
+        return self._func(*self._args)
+
+    def _hedge(self):
+        with self._lock:
+            if self._settled:
+                return
+        if not self._policy._spend():
+            self._denied = True
+            return
+        log.debug("hedging request after %.3fs", self._delay)
+        self._send(HedgePolicy.HEDGE)
+
+    def _done(self, request):
+        with self._lock:
+            outcome = self._requests.pop(request)
+            if self._settled:
+                return
+            if request.cancelled():
+                error = futures.CancelledError()
+            else:
+                error = request.exception()
+            if error is not None and self._requests:
+                # The other one may still succeed
+                self._error = error
+                return
+            self._settled = True
+            others = list(self._requests)
+
+        for other in others:
+            # Not started yet: no need to send it anymore
+            other.cancel()
+        if error is not None:
+            if self.future.set_running_or_notify_cancel():
+                self.future.set_exception(error)
+            return
+
+        if not self._hedged:
+            outcome = HedgePolicy.DENIED if self._denied else HedgePolicy.NOT_HEDGED
+        latency = time.perf_counter() - self._start
+        self._policy.record(latency)
+        with self._policy._lock:
+            self._policy.outcomes[outcome] += 1
+        if self.future.set_running_or_notify_cancel():
+            self.future.set_result((request.result(), latency, outcome))
+
+    def _cancel(self, future):
+        if future.cancelled():
+            with self._lock:
+                requests = list(self._requests)
+            for request in requests:
+                request.cancel()
+
+
+class HedgePolicy:
+    """Hedged requests: race a duplicate against a slow request.
+
+    When a request hasn't completed after the ``percentile`` of recent
+    request latencies, a duplicate (*hedge*) is sent and the first one to
+    complete successfully wins. The other one is left to finish in the
+    background and its result is discarded. A budget caps the share of
+    requests that can be hedged so that a slow upstream isn't hit twice
+    as hard.
+
+    A policy is meant to be shared (e.g. by every :class:`navertts.NaverTTS`
+    reading with the same upstream) so that its latency estimate is built
+    from as many requests as possible.
+
+    Args:
+        percentile (float): Percentile of recent latencies after which to
+            hedge, between 0 and 100.
+        budget (float): Maximum long-run ratio of hedges to requests.
+        burst (int): Maximum number of hedges that can be sent in a row
+            when the budget was saved up.
+        min_samples (int): Don't hedge before that many latencies were
+            observed.
+        window (int): Number of recent latencies to keep.
+        min_delay (float): Never hedge before that many seconds.
+
+    Attributes:
+        NOT_HEDGED: Outcome when the request completed in time.
+        PRIMARY: Outcome when a hedge was sent but the original request won.
+        HEDGE: Outcome when a hedge was sent and won.
+        DENIED: Outcome when the request was slow but the budget was spent.
+
+    Example:
+        Read many texts with hedging::
+
+            >>> hedge = HedgePolicy(percentile=95, budget=0.05)
+            >>> for text in texts:
+            ...     parts = NaverTTS(text, hedge=hedge).write_to_fp(fp)
+            ...     print([p.hedge for p in parts])
+
+    """
+
+    NOT_HEDGED = None
+    PRIMARY = "primary"
+    HEDGE = "hedge"
+    DENIED = "denied"
+
+    def __init__(
+        self,
+        percentile=95,
+        budget=0.1,
+        burst=10,
+        min_samples=20,
+        window=256,
+        min_delay=0.0,
+    ):
+        """Create the hedging policy."""
+        if not 0 < percentile <= 100:
+            raise ValueError(
+                "percentile must be in (0, 100]. Got {}".format(percentile)
+            )
+        if not 0 <= budget <= 1:
+            raise ValueError("budget must be in [0, 1]. Got {}".format(budget))
+        self.percentile = percentile
+        self.budget = budget
+        self.burst = burst
+        self.min_samples = min_samples
+        self.min_delay = min_delay
+
+        self._lock = threading.Lock()
+        self._latencies = collections.deque(maxlen=window)
+        self._tokens = 0.0
+        self.outcomes = collections.Counter()
+
+    def delay(self):
+        """Time (in seconds) after which a request gets hedged.
+
+        Returns:
+            float: The delay, or ``None`` while there aren't enough samples.
+
+        """
+        with self._lock:
+            if len(self._latencies) < self.min_samples:
+                return None
+            latencies = sorted(self._latencies)
+        idx = int(round(self.percentile / 100.0 * (len(latencies) - 1)))
+        return max(self.min_delay, latencies[idx])
+
+    def record(self, latency):
+        """Add a latency sample (in seconds)."""
+        with self._lock:
+            self._latencies.append(latency)
+
+    def submit(self, submit, func, *args):
+        """Schedule ``func(*args)``, hedging it if it's slow.
+
+        The request and its hedge are both run with ``submit`` (e.g.
+        :meth:`navertts.scheduler.Scheduler.submit`), so that they count
+        against the same concurrency limits as every other request. The
+        hedge is submitted by a timer, once the request has been running for
+        :meth:`delay`: no thread waits for the race.
+
+        Args:
+            submit (callable): Takes a function and its arguments, and
+                returns the :class:`concurrent.futures.Future` of its result.
+            func (callable): The request, which must be safe to run twice
+                concurrently.
+
+        Returns:
+            :class:`concurrent.futures.Future`: ``(result, latency, outcome)``
+            where ``latency`` is the time (in seconds) from the request was
+            started to the result, and ``outcome`` is one of
+            :attr:`NOT_HEDGED`, :attr:`PRIMARY`, :attr:`HEDGE` or
+            :attr:`DENIED`. Its exception is what ``func`` raised when
+            neither request succeeded. Cancelling it cancels the requests
+            that haven't started.
+
+        """
+        with self._lock:
+            self._tokens = min(self.burst, self._tokens + self.budget)
+        return _Race(self, submit, func, args, self.delay()).future
+
+    def _spend(self):
+        """Take a hedge out of the budget, if there's one left."""
+        with self._lock:
+            if self._tokens < 1:
+                return False
+            self._tokens -= 1
+            return True
@@ -1,8 +1,9 @@
 # -*- coding: utf-8 -*-
 from . import constants
+from .discovery import get_discovery
 import logging
 
-__all__ = ["tts_langs"]
+__all__ = ["tts_langs", "tts_speakers"]
 
 # Logger
 log = logging.getLogger(__name__)
@@ -26,20 +27,48 @@ def tts_langs(tld="com"):
 
     The dictionnary returned combines languages from two origins:
 
-    - Languages fetched automatically from Google Translate
+    - Languages discovered from ``constants.DISCOVERY_ENDPOINT`` (when set),
+      in the background (see :class:`navertts.discovery.Discovery`)
     - Languages that are undocumented variations that were observed to work and
       present different dialects or accents.
 
     """
-    try:
-        langs = dict()
-        # log.debug("Fetching with '{}' tld".format(tld))
-        # langs.update(_fetch_langs(tld))
-        langs.update(_extra_langs())
-        log.debug("langs: {}".format(langs))
-        return langs
-    except Exception as e:
-        raise RuntimeError("Unable to get language list: {}".format(str(e)))
+    langs = dict(_langs_table(tld))
+    log.debug("langs: %s", langs)
+    return langs
+
+
+def tts_speakers(tld="com"):
+    """Speakers of each language Naver Text-to-Speech supports.
+
+    Args:
+        tld (string): Top-level domain of the API host. Default is ``com``.
+
+    Returns:
+        dict: A dictionnary of the type `{ '<lang>': {'<gender>': '<speaker>'}}`,
+        such as `{'en': {'f': 'danna', 'm': 'matt'}}`. Like :func:`tts_langs`,
+        it combines discovered and built-in speakers.
+
+    """
+    return {k: dict(v) for k, v in _speakers_table(tld).items()}
+
+
+def _langs_table(tld="com"):
+    """Read-only table of supported languages, for use in hot paths.
+
+    Same content as :func:`tts_langs` but cached and shared, so it is
+    neither copied nor logged on every call, and never waits on discovery.
+
+    Returns:
+        mappingproxy: A read-only dictionnary of the type `{ '<lang>': '<name>'}`
+
+    """
+    return get_discovery().tables(tld).langs
+
+
+def _speakers_table(tld="com"):
+    """Read-only table of speakers, for use in hot paths (see :func:`tts_speakers`)."""
+    return get_discovery().tables(tld).speakers
 
 
 def _extra_langs():
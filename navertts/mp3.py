@@ -0,0 +1,202 @@
+# -*- coding: utf-8 -*-
+import struct
+
+__all__ = ["FrameScanner", "scan", "sniff"]
+
+# Bitrates (kbps) by (MPEG-1?, layer), indexed by the bitrate index
+_BITRATES = {
+    (True, 1): (0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448),
+    (True, 2): (0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384),
+    (True, 3): (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320),
+    (False, 1): (0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256),
+    (False, 2): (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+    (False, 3): (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+}
+
+# Sample rates (Hz) by version bits, indexed by the sample rate index
+_SAMPLE_RATES = {
+    3: (44100, 48000, 32000),  # MPEG-1
+    2: (22050, 24000, 16000),  # MPEG-2
+    0: (11025, 12000, 8000),  # MPEG-2.5
+}
+
+# Enough bytes to read any header (ID3v2 tag header, frame header)
+_HEADER_SIZE = 10
+
+# Bytes needed by :func:`sniff`
+SNIFF_SIZE = 4
+
+# Enough bytes of a frame to find a Xing/Info/VBRI tag in it
+_VBR_TAG_END = 40
+
+_ID3V2_HEADER = struct.Struct(">3sBBB4s")
+
+
+def _frame(data, pos):
+    """Parse the frame header at ``data[pos:]``.
+
+    Returns:
+        tuple: ``(length, samples, sample_rate)`` of the frame, or ``None``
+        when there's no valid header at ``pos``.
+
+    """
+    b0, b1, b2 = data[pos], data[pos + 1], data[pos + 2]
+    if b0 != 0xFF or b1 & 0xE0 != 0xE0:
+        return None
+    version = (b1 >> 3) & 3
+    layer = 4 - ((b1 >> 1) & 3)
+    bitrate_idx = b2 >> 4
+    rate_idx = (b2 >> 2) & 3
+    if version == 1 or layer == 4 or bitrate_idx in (0, 15) or rate_idx == 3:
+        # Reserved, or free format (no frame length)
+        return None
+
+    mpeg1 = version == 3
+    bitrate = _BITRATES[(mpeg1, layer)][bitrate_idx] * 1000
+    sample_rate = _SAMPLE_RATES[version][rate_idx]
+    padding = (b2 >> 1) & 1
+    if layer == 1:
+        return (12 * bitrate // sample_rate + padding) * 4, 384, sample_rate
+    if layer == 3 and not mpeg1:
+        return 72 * bitrate // sample_rate + padding, 576, sample_rate
+    return 144 * bitrate // sample_rate + padding, 1152, sample_rate
+
+
+def _is_vbr_tag(data, pos):
+    """Whether the frame at ``pos`` is a Xing/Info/VBRI tag (no audio)."""
+    mpeg1 = (data[pos + 1] >> 3) & 3 == 3
+    mono = data[pos + 3] >> 6 == 3
+    if mpeg1:
+        offset = 21 if mono else 36
+    else:
+        offset = 13 if mono else 21
+    return data[pos + offset : pos + offset + 4] in (b"Xing", b"Info") or (
+        data[pos + 36 : pos + 40] == b"VBRI"
+    )
+
+
+class FrameScanner:
+    """Count the frames of an ``mp3`` stream and their duration, incrementally.
+
+    Only frame headers are parsed (no decoding): the scanner reads a header,
+    skips the rest of its frame and expects the next header right after it.
+    ID3v2 and ID3v1 tags are skipped, Xing/Info/VBRI tag frames aren't
+    counted (they hold no audio) and anything else is skipped until the next
+    valid header.
+
+    Attributes:
+        frames (int): Number of audio frames.
+        samples (int): Number of samples (per channel) in those frames.
+        duration (float): Duration of those frames, in seconds.
+        junk (int): Number of bytes skipped that weren't a frame or a tag.
+
+    Example:
+        Feed it any chunks of a stream::
+
+            >>> scanner = FrameScanner()
+            >>> for chunk in iter(lambda: f.read(4096), b""):
+            ...     scanner.feed(chunk)
+            >>> scanner.frames, scanner.duration
+            (1722, 44.98)
+
+    """
+
+    def __init__(self):
+        """Create the scanner."""
+        self.frames = 0
+        self.samples = 0
+        self.duration = 0.0
+        self.junk = 0
+        self._skip = 0
+        self._buf = b""
+
+    def feed(self, data):
+        """Scan the next bytes of the stream.
+
+        Args:
+            data (bytes): The bytes.
+
+        """
+        if self._buf:
+            data = self._buf + data
+            self._buf = b""
+        pos = 0
+        n = len(data)
+
+        while True:
+            if self._skip:
+                step = min(self._skip, n - pos)
+                pos += step
+                self._skip -= step
+                if self._skip:
+                    return
+
+            if n - pos < _HEADER_SIZE:
+                # Wait for more (a frame is larger than that anyway)
+                self._buf = data[pos:]
+                return
+
+            if data[pos : pos + 3] == b"ID3":
+                _, _, _, flags, size = _ID3V2_HEADER.unpack_from(data, pos)
+                size = (size[0] << 21) | (size[1] << 14) | (size[2] << 7) | size[3]
+                self._skip = 10 + size + (10 if flags & 0x10 else 0)
+                continue
+            if data[pos : pos + 3] == b"TAG":
+                self._skip = 128
+                continue
+
+            frame = _frame(data, pos)
+            if frame is None:
+                # Resynchronize on the next possible header
+                sync = data.find(b"\xff", pos + 1)
+                sync = n if sync < 0 else sync
+                self.junk += sync - pos
+                pos = sync
+                continue
+
+            length, samples, sample_rate = frame
+            if self.frames == 0 and n - pos < min(length, _VBR_TAG_END):
+                # Wait for more to look for a tag in the first frame
+                self._buf = data[pos:]
+                return
+            if not (
+                self.frames == 0 and length >= _VBR_TAG_END and _is_vbr_tag(data, pos)
+            ):
+                self.frames += 1
+                self.samples += samples
+                self.duration += samples / float(sample_rate)
+            self._skip = length
+
+
+def scan(data):
+    """Scan a complete ``mp3`` stream.
+
+    Args:
+        data (bytes): The stream.
+
+    Returns:
+        :class:`FrameScanner`: The scanner, with the stream's ``frames``,
+        ``samples`` and ``duration``.
+
+    """
+    scanner = FrameScanner()
+    scanner.feed(data)
+    return scanner
+
+
+def sniff(data):
+    """Check that ``data`` starts like an ``mp3`` stream.
+
+    Only the first :data:`SNIFF_SIZE` bytes are looked at: they must be an
+    ID3v2 tag or a valid frame header.
+
+    Args:
+        data (bytes): The first bytes of the stream.
+
+    Returns:
+        bool: Whether it looks like an ``mp3`` stream.
+
+    """
+    if data[:3] == b"ID3":
+        return True
+    return len(data) >= SNIFF_SIZE and _frame(data, 0) is not None
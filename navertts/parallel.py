@@ -0,0 +1,362 @@
+# -*- coding: utf-8 -*-
+from . import utils
+
+import itertools
+import logging
+import multiprocessing
+import re
+
+__all__ = ["ParallelTokenizer"]
+
+# Logger
+log = logging.getLogger(__name__)
+log.addHandler(logging.NullHandler())
+
+_SAFE_BOUNDARY = re.compile(r"(?<=[^-]\n)(?=\n)")
+"""Regex that matches between the two newlines of a blank line that
+doesn't follow an end-of-line hyphen. Pre-processing and tokenizing both
+sides of such a position independently gives the same result as processing
+them together (see :class:`ParallelTokenizer`).
+
+"""
+
+_HARD_BOUNDARY = re.compile(r"[.!?]\s|[。！？]|(?<=[^-])\n")
+"""Regex that matches the end of a sentence or of a line (that doesn't end
+with a hyphen). Blocks are cut right after it when there's no blank line in
+``max_block_size`` characters: the default pre-processors and tokenizer
+cases don't match across it either.
+
+"""
+
+_SPACE = re.compile(r"\s")
+
+_NON_SPACE = re.compile(r"\S")
+
+# Per-process pipeline, set by _init_worker()
+_worker_pipeline = None
+
+
+def _init_worker(pre_processor_funcs, tokenizer_func, max_chars):
+    global _worker_pipeline
+    _worker_pipeline = (pre_processor_funcs, tokenizer_func, max_chars)
+
+
+def _finalize(tokens, max_chars):
+    """Clean and minimize tokens, as :meth:`NaverTTS._tokenize` does."""
+    min_tokens = []
+    for t in utils._clean_tokens(tokens):
+        min_tokens += utils._minimize(t, " ", max_chars)
+    return min_tokens
+
+
+def _process_block(block, pipeline=None):
+    """Pre-process and tokenize a single block.
+
+    Returns:
+        tuple: ``(length, head, tokens, tail, short)`` where ``length`` is the
+        size of the pre-processed block, ``head`` and ``tail`` are the raw
+        (unfinished) text before the first and after the last split, and
+        ``tokens`` are the finished tokens in between. ``tokens`` is ``None``
+        when the block wasn't split at all, in which case ``tail`` is ``None``
+        and ``head`` holds the whole block. ``short`` is the pre-processed
+        block when it's no longer than ``max_chars``, ``None`` otherwise.
+
+    """
+    pre_processor_funcs, tokenizer_func, max_chars = pipeline or _worker_pipeline
+
+    for pp in pre_processor_funcs:
+        block = pp(block)
+
+    short = block if utils._len(block) <= max_chars else None
+    tokens = tokenizer_func(block)
+    if len(tokens) == 1:
+        return len(block), tokens[0], None, None, short
+    return (
+        len(block),
+        tokens[0],
+        _finalize(tokens[1:-1], max_chars),
+        tokens[-1],
+        short,
+    )
+
+
+class ParallelTokenizer:
+    """Pre-process and tokenize very large texts with a process pool.
+
+    Splits the text into blocks of about ``block_size`` characters at safe
+    boundaries (blank lines), pre-processes and tokenizes each block in a
+    worker process and stitches the tokens that straddle block boundaries
+    back together, so that the result is exactly the one of
+    :meth:`NaverTTS._tokenize <navertts.NaverTTS>` run on the whole text.
+
+    Args:
+        pre_processor_funcs (list): Pre-processors, as for
+            :class:`navertts.NaverTTS`. They must be picklable.
+        tokenizer_func (callable): Tokenizer, as for
+            :class:`navertts.NaverTTS`. It must be picklable.
+        max_chars (int): Maximum size of a token. Defaults to
+            ``NaverTTS.NAVER_TTS_MAX_CHARS``.
+        processes (int, optional): Number of worker processes. Defaults to
+            the number of CPUs. With ``1``, blocks are processed in the
+            calling process.
+        block_size (int): Approximate size (in characters) of a block.
+        max_block_size (int, optional): Maximum size (in characters) of a
+            block. Defaults to ``4 * block_size``.
+
+    Note:
+        Custom pre-processors and tokenizer cases must not match across a
+        blank line (``"\\n\\n"``) for the result to be exact. The default ones
+        don't. When there's no blank line in ``max_block_size`` characters,
+        the block is cut after the last end of a sentence or line in it
+        instead, or else after its last space, or else (a single "word" that
+        long) right at ``max_block_size`` characters, where words may be
+        split differently than in the whole text.
+
+    Example:
+        Tokenize a large dump the way ``tts`` would, streaming the tokens
+        of each block as soon as they are ready::
+
+            >>> pt = ParallelTokenizer.from_tts(tts, processes=4)
+            >>> for tokens in pt.imap(text):
+            ...     handle(tokens)
+
+        Tokenize a text too large to hold in memory, reading it in chunks::
+
+            >>> pt = ParallelTokenizer.from_tts(tts, processes=1)
+            >>> for tokens in pt.imap_stream(iter(lambda: f.read(1 << 16), "")):
+            ...     handle(tokens)
+
+    """
+
+    def __init__(
+        self,
+        pre_processor_funcs,
+        tokenizer_func,
+        max_chars=100,
+        processes=None,
+        block_size=1 << 16,
+        max_block_size=None,
+    ):
+        """Create the tokenizer."""
+        self.pre_processor_funcs = list(pre_processor_funcs)
+        self.tokenizer_func = tokenizer_func
+        self.max_chars = max_chars
+        self.processes = processes or multiprocessing.cpu_count()
+        self.block_size = block_size
+        self.max_block_size = max_block_size or 4 * block_size
+
+    @classmethod
+    def from_tts(cls, tts, **kwargs):
+        """Create a tokenizer using the pipeline of a :class:`NaverTTS`."""
+        return cls(
+            tts.pre_processor_funcs,
+            tts.tokenizer_func,
+            max_chars=tts.NAVER_TTS_MAX_CHARS,
+            **kwargs
+        )
+
+    @property
+    def _pipeline(self):
+        return (self.pre_processor_funcs, self.tokenizer_func, self.max_chars)
+
+    def iter_blocks(self, text):
+        """Split ``text`` in blocks at safe boundaries.
+
+        Args:
+            text (string): The (stripped) text to split.
+
+        Returns:
+            generator: Blocks of ``block_size`` to ``max_block_size``
+            characters (but the last one) that join back into ``text``.
+
+        """
+        start = 0
+        while start < len(text):
+            m = _SAFE_BOUNDARY.search(
+                text, start + self.block_size, start + self.max_block_size + 1
+            )
+            if m is not None:
+                end = m.start()
+            elif len(text) - start > self.max_block_size:
+                end = self._fallback_cut(text, start)
+            else:
+                end = len(text)
+            yield text[start:end]
+            start = end
+
+    def _fallback_cut(self, text, start):
+        """Where to cut a block of ``text`` without a blank line."""
+        lo = start + self.block_size
+        hi = start + self.max_block_size
+        for boundary in (_HARD_BOUNDARY, _SPACE):
+            end = None
+            for m in boundary.finditer(text, lo, hi):
+                end = m.end()
+            if end is not None:
+                return end
+        utils._log(log.debug, "no boundary in %i characters", hi - start)
+        return hi
+
+    def imap(self, text):
+        """Tokenize ``text``, yielding the tokens of each block in order.
+
+        Args:
+            text (string): The text to tokenize.
+
+        Returns:
+            generator: Lists of tokens. Their concatenation is the list of
+            tokens for the whole text.
+
+        """
+        text = text.strip()
+
+        if utils._len(text) <= self.block_size:
+            # Not worth the trouble
+            yield self._run_serial(text)
+            return
+
+        for tokens in self._imap_blocks(self.iter_blocks(text)):
+            yield tokens
+
+    def iter_stream_blocks(self, chunks):
+        """Split a stream of text in blocks at safe boundaries.
+
+        Same as :meth:`iter_blocks` on the (stripped) concatenation of
+        ``chunks``, but only holds up to ``max_block_size`` characters (and
+        a chunk) in memory at a time, blank lines or not.
+
+        Args:
+            chunks (iterable): Pieces of text, of any size.
+
+        Returns:
+            generator: Blocks of ``block_size`` to ``max_block_size``
+            characters (but the last one) that join back into the stripped
+            text.
+
+        """
+        buf = ""
+        # Where to resume looking for a boundary in ``buf``
+        pos = self.block_size
+        for chunk in chunks:
+            if not buf:
+                chunk = chunk.lstrip()
+            buf += chunk
+
+            while True:
+                m = _SAFE_BOUNDARY.search(buf, pos, self.max_block_size + 1)
+                if m is not None:
+                    end = m.start()
+                elif len(buf) > self.max_block_size:
+                    end = self._fallback_cut(buf, 0)
+                else:
+                    # A boundary needs the character following it
+                    pos = max(self.block_size, len(buf))
+                    break
+                if not _NON_SPACE.search(buf, end):
+                    # Maybe trailing whitespace, stripped at the end
+                    pos = end
+                    break
+                yield buf[:end]
+                buf = buf[end:]
+                pos = self.block_size
+
+        buf = buf.rstrip()
+        if buf:
+            yield buf
+
+    def imap_stream(self, chunks):
+        """Tokenize a stream of text, yielding the tokens of each block in order.
+
+        Same as :meth:`imap` on the concatenation of ``chunks``, reading them
+        as blocks are needed. With ``processes=1``, memory use doesn't grow
+        with the size of the text. (A process pool reads the whole stream
+        ahead.)
+
+        Args:
+            chunks (iterable): Pieces of text, of any size.
+
+        Returns:
+            generator: Lists of tokens. Their concatenation is the list of
+            tokens for the whole text.
+
+        """
+        blocks = self.iter_stream_blocks(chunks)
+        first = next(blocks, "")
+        second = next(blocks, None)
+        if second is None:
+            # Not worth the trouble
+            yield self._run_serial(first)
+            return
+
+        blocks = itertools.chain([first, second], blocks)
+        for tokens in self._imap_blocks(blocks):
+            yield tokens
+
+    def _imap_blocks(self, blocks):
+        if self.processes == 1:
+            results = (_process_block(b, self._pipeline) for b in blocks)
+            for tokens in self._stitch(results):
+                yield tokens
+            return
+
+        pool = multiprocessing.Pool(
+            self.processes, initializer=_init_worker, initargs=self._pipeline
+        )
+        try:
+            results = pool.imap(_process_block, blocks)
+            for tokens in self._stitch(results):
+                yield tokens
+        finally:
+            pool.terminate()
+            pool.join()
+
+    def run(self, text):
+        """Tokenize ``text``.
+
+        Args:
+            text (string): The text to tokenize.
+
+        Returns:
+            list: The tokens, as returned by ``NaverTTS._tokenize``.
+
+        """
+        tokens = []
+        for block_tokens in self.imap(text):
+            tokens += block_tokens
+        return tokens
+
+    def _stitch(self, results):
+        total = 0
+        carry = ""
+        # Held back until the pre-processed text is known to be
+        # long enough to be tokenized at all (see NaverTTS._tokenize)
+        pending = []
+        shorts = []
+        for length, head, tokens, tail, short in results:
+            total += length
+            if total <= self.max_chars:
+                shorts.append(short)
+            if tokens is None:
+                carry += head
+                continue
+            pending.append(_finalize([carry + head], self.max_chars) + tokens)
+            carry = tail
+            if total > self.max_chars:
+                for p in pending:
+                    yield p
+                pending = []
+
+        if total <= self.max_chars:  # pragma: no cover
+            utils._log(log.debug, "short pre-processed text, not tokenizing")
+            yield utils._clean_tokens(["".join(shorts)])
+            return
+        for p in pending:
+            yield p
+        yield _finalize([carry], self.max_chars)
+
+    def _run_serial(self, text):
+        for pp in self.pre_processor_funcs:
+            text = pp(text)
+        if utils._len(text) <= self.max_chars:
+            return utils._clean_tokens([text])
+        return _finalize(self.tokenizer_func(text), self.max_chars)
@@ -0,0 +1,231 @@
+# -*- coding: utf-8 -*-
+from . import constants
+from . import utils
+
+import collections
+import logging
+
+from requests.utils import requote_uri
+
+__all__ = ["Plan", "PlannedPart", "estimate_seconds"]
+
+# Logger
+log = logging.getLogger(__name__)
+log.addHandler(logging.NullHandler())
+
+
+def estimate_seconds(text, lang="ko", speed=0):
+    """Estimate the duration of the audio for a part.
+
+    A rough estimate from the typical reading rate of ``lang``
+    (``constants.CHARS_PER_SECOND``), slowed down or sped up by 10% per
+    step of ``speed``.
+
+    Args:
+        text (string): The text of the part.
+        lang (string): The language it's read in.
+        speed (int): The read speed, between -5 (fast) and 5 (slow).
+
+    Returns:
+        float: The estimated duration, in seconds.
+
+    """
+    rate = constants.CHARS_PER_SECOND.get(lang, constants.DEFAULT_CHARS_PER_SECOND)
+    return utils._len(text) / rate * (1 + speed / 10.0)
+
+
+class PlannedPart:
+    """A request that a :class:`navertts.NaverTTS` would send.
+
+    Attributes:
+        index (int): Index of the part in its text.
+        text (string): Text of the part.
+        url (string): Endpoint URL, as sent (percent-encoded).
+        url_bytes (int): Size of ``url``.
+        seconds (float): Estimated duration of the audio.
+
+    """
+
+    __slots__ = ("index", "text", "url", "url_bytes", "seconds")
+
+    def __init__(self, index, text, url, seconds):
+        """Create the planned part."""
+        self.index = index
+        self.text = text
+        self.url = url
+        self.url_bytes = len(url)
+        self.seconds = seconds
+
+    def to_dict(self):
+        """Return the part as a dict (e.g. for ``json.dumps``)."""
+        return {k: getattr(self, k) for k in self.__slots__}
+
+    def __repr__(self):  # pragma: no cover
+        """Print the planned part."""
+        return "PlannedPart(index={}, url_bytes={}, seconds={:.2f})".format(
+            self.index, self.url_bytes, self.seconds
+        )
+
+
+class _Totals:
+    """Aggregates of the planned parts of a voice."""
+
+    __slots__ = ("texts", "requests", "chars", "url_bytes", "seconds")
+
+    def __init__(self):
+        self.texts = 0
+        self.requests = 0
+        self.chars = 0
+        self.url_bytes = 0
+        self.seconds = 0.0
+
+    def add(self, other):
+        for k in self.__slots__:
+            setattr(self, k, getattr(self, k) + getattr(other, k))
+
+    def to_dict(self):
+        return {k: getattr(self, k) for k in self.__slots__}
+
+
+class Plan:
+    """The upstream requests needed to read one or more texts.
+
+    Built entirely offline, from the same pre-processing, tokenizing and
+    endpoint URLs as :meth:`navertts.NaverTTS.write_to_fp`.
+
+    Args:
+        keep_parts (bool): Keep every :class:`PlannedPart` in :attr:`parts`.
+            Set to ``False`` to only keep the aggregates when planning a
+            large corpus.
+
+    Attributes:
+        parts (list): The :class:`PlannedPart` of every text, in order (when
+            ``keep_parts`` is ``True``).
+
+    Example:
+        Plan a corpus, by voice::
+
+            >>> plan = Plan(keep_parts=False)
+            >>> for doc in docs:
+            ...     plan.add(NaverTTS(doc, voice=voice))
+            >>> plan.requests, plan.url_bytes, plan.seconds
+            (52133, 9912870, 171802.3)
+
+    """
+
+    def __init__(self, keep_parts=True):
+        """Create an empty plan."""
+        self.keep_parts = keep_parts
+        self.parts = []
+        self._voices = collections.OrderedDict()
+
+    def add(self, tts):
+        """Add the parts of a text to the plan.
+
+        Args:
+            tts (:class:`navertts.NaverTTS`): The text and its voice. A
+                streamed text is consumed.
+
+        Returns:
+            Plan: ``self``.
+
+        Raises:
+            AssertionError: When there's nothing left to speak after
+                pre-processing, tokenizing and cleaning.
+
+        """
+        voice = tts.voice
+        totals = _Totals()
+        totals.texts = 1
+        for idx, text in enumerate(tts._iter_parts()):
+            url = constants.translate_endpoint(
+                text=text, speaker=voice.speaker, speed=voice.speed, tld=voice.tld
+            )
+            # As sent by requests
+            url = requote_uri(url)
+            part = PlannedPart(
+                idx, text, url, estimate_seconds(text, voice.lang, voice.speed)
+            )
+            totals.requests += 1
+            totals.chars += utils._len(text)
+            totals.url_bytes += part.url_bytes
+            totals.seconds += part.seconds
+            if self.keep_parts:
+                self.parts.append(part)
+        assert totals.requests, "No text to send to TTS API"
+
+        self._voices.setdefault(voice, _Totals()).add(totals)
+        utils._log(log.debug, "planned %i part(s) for %s", totals.requests, voice)
+        return self
+
+    @property
+    def voices(self):
+        """Aggregates by voice.
+
+        Returns:
+            dict: Maps each :class:`navertts.Voice` to a dict with its number
+            of ``texts``, ``requests``, ``chars``, ``url_bytes`` and
+            estimated audio ``seconds``.
+
+        """
+        return collections.OrderedDict(
+            (voice, totals.to_dict()) for voice, totals in self._voices.items()
+        )
+
+    def _total(self, key):
+        return sum(getattr(totals, key) for totals in self._voices.values())
+
+    @property
+    def texts(self):
+        """Number of texts in the plan."""
+        return self._total("texts")
+
+    @property
+    def requests(self):
+        """Number of upstream requests."""
+        return self._total("requests")
+
+    @property
+    def chars(self):
+        """Number of characters sent upstream."""
+        return self._total("chars")
+
+    @property
+    def url_bytes(self):
+        """Total size of the endpoint URLs."""
+        return self._total("url_bytes")
+
+    @property
+    def seconds(self):
+        """Estimated total duration of the audio."""
+        return self._total("seconds")
+
+    def to_dict(self):
+        """Return the plan as a dict (e.g. for ``json.dumps``)."""
+        voices = []
+        for voice, totals in self._voices.items():
+            d = collections.OrderedDict(
+                [
+                    ("lang", voice.lang),
+                    ("tld", voice.tld),
+                    ("speaker", voice.speaker),
+                    ("speed", voice.speed),
+                ]
+            )
+            d.update(totals.to_dict())
+            voices.append(d)
+
+        d = collections.OrderedDict(
+            (k, getattr(self, k))
+            for k in ("texts", "requests", "chars", "url_bytes", "seconds")
+        )
+        d["voices"] = voices
+        if self.keep_parts:
+            d["parts"] = [p.to_dict() for p in self.parts]
+        return d
+
+    def __repr__(self):  # pragma: no cover
+        """Print the plan."""
+        return "Plan(texts={}, requests={}, url_bytes={}, seconds={:.1f})".format(
+            self.texts, self.requests, self.url_bytes, self.seconds
+        )
@@ -0,0 +1,289 @@
+# -*- coding: utf-8 -*-
+import collections
+import cProfile
+import functools
+import io
+import threading
+import time
+
+__all__ = ["Profiler"]
+
+# When navertts started to be imported (it imports this module first)
+IMPORT_START = time.perf_counter()
+
+# Phases of a run, in order
+PHASES = (
+    "startup",
+    "pre-processing",
+    "tokenizing",
+    "connect",
+    "ttfb",
+    "body",
+    "write",
+)
+
+
+class _ProfiledResponse:
+    def __init__(self, profiler, r):
+        self._profiler = profiler
+        self._r = r
+
+    def __getattr__(self, name):
+        return getattr(self._r, name)
+
+    def iter_content(self, chunk_size):
+        # Only the time spent reading, not the time the chunks are handled
+        elapsed = 0.0
+        chunks = iter(self._r.iter_content(chunk_size))
+        try:
+            while True:
+                start = time.perf_counter()
+                try:
+                    chunk = next(chunks)
+                except StopIteration:
+                    return
+                finally:
+                    elapsed += time.perf_counter() - start
+                yield chunk
+        finally:
+            self._profiler.add("body", elapsed)
+
+
+class _ProfiledTransport:
+    def __init__(self, profiler, transport):
+        self._profiler = profiler
+        self.transport = transport
+
+    def get(self, url, headers, timeout):
+        local = self._profiler._local
+        local.connect = 0.0
+        local.requesting = True
+        start = time.perf_counter()
+        try:
+            r = self.transport.get(url, headers, timeout)
+        finally:
+            local.requesting = False
+            # Up to the response headers, but the time spent connecting
+            self._profiler.add("ttfb", time.perf_counter() - start - local.connect)
+        return _ProfiledResponse(self._profiler, r)
+
+    def close(self):
+        self.transport.close()
+
+
+class _ProfiledWriter:
+    def __init__(self, profiler, fp):
+        self._profiler = profiler
+        self._fp = fp
+
+    def __getattr__(self, name):
+        return getattr(self._fp, name)
+
+    def write(self, data):
+        start = time.perf_counter()
+        try:
+            return self._fp.write(data)
+        finally:
+            self._profiler.add("write", time.perf_counter() - start)
+
+
+class Profiler:
+    """Find out where the time of a run goes.
+
+    Wall time is measured for each phase of a run, from :meth:`start` to
+    :meth:`stop`:
+
+    - ``startup``: from the import of ``navertts`` to :meth:`start`.
+    - ``pre-processing`` and ``tokenizing``: in the pre-processors and
+      tokenizer of a :meth:`profile`'d :class:`navertts.NaverTTS`.
+    - ``connect``, ``ttfb`` and ``body``: of the requests sent by a
+      :meth:`transport`, opening new connections, waiting for the response
+      headers (less ``connect``) and reading the content. Connections are
+      timed by a :class:`navertts.transport.Urllib3Transport` (the
+      default): with other transports, ``connect`` is part of ``ttfb``.
+    - ``write``: in the ``write`` method of a :meth:`writer`.
+
+    Parts are requested in parallel, so the network phases can add up to
+    more than the run. Functions are profiled with :mod:`cProfile` in the
+    thread that calls :meth:`start`, which pre-processes, tokenizes,
+    writes, and waits for the parts. Nothing is measured until a profiler
+    is started.
+
+    Args:
+        functions (bool): Whether to profile functions too.
+
+    Example:
+        >>> with Profiler() as profiler:
+        ...     tts = profiler.profile(NaverTTS(text, transport=profiler.transport(get_transport())))
+        ...     tts.write_to_fp(profiler.writer(fp))
+        >>> print(profiler.report())
+
+    """
+
+    def __init__(self, functions=True):
+        """Create the profiler."""
+        self.functions = functions
+        self.started = None
+        self.stopped = None
+        self._phases = collections.OrderedDict((p, [0.0, 0]) for p in PHASES)
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._profile = None
+        self._hooked = []
+
+    def start(self):
+        """Start measuring.
+
+        Returns:
+            :class:`Profiler`: The profiler.
+
+        """
+        self.started = time.perf_counter()
+        self.add("startup", self.started - IMPORT_START)
+        if self.functions:
+            self._profile = cProfile.Profile()
+            self._profile.enable()
+        return self
+
+    def stop(self):
+        """Stop measuring."""
+        if self._profile is not None:
+            self._profile.disable()
+        for transport in self._hooked:
+            transport.remove_connect_hook(self._connected)
+        self._hooked = []
+        self.stopped = time.perf_counter()
+
+    def __enter__(self):
+        """Measure the block."""
+        return self.start()
+
+    def __exit__(self, *exc):
+        """Stop measuring."""
+        self.stop()
+
+    def _connected(self, seconds):
+        # A connection was opened by the transport of a profiled request,
+        # or of another request sent with the same transport: not timed
+        local = self._local
+        if getattr(local, "requesting", False):
+            local.connect += seconds
+            self.add("connect", seconds)
+
+    def add(self, phase, seconds, calls=1):
+        """Add time to a phase.
+
+        Args:
+            phase (string): The phase, one of ``PHASES``.
+            seconds (float): Time spent in it.
+            calls (int): Number of times it was entered.
+
+        """
+        with self._lock:
+            total = self._phases[phase]
+            total[0] += seconds
+            total[1] += calls
+
+    def timed(self, phase, func):
+        """Wrap ``func`` to add the time of its calls to ``phase``."""
+
+        @functools.wraps(func)
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self.add(phase, time.perf_counter() - start)
+
+        return timed
+
+    def profile(self, tts):
+        """A copy of ``tts`` whose pre-processors and tokenizer are timed.
+
+        Args:
+            tts (:class:`navertts.NaverTTS`): The object to profile.
+
+        Returns:
+            :class:`navertts.NaverTTS`: The copy.
+
+        """
+        return tts._replace(
+            pre_processor_funcs=[
+                self.timed("pre-processing", pp) for pp in tts.pre_processor_funcs
+            ],
+            tokenizer_func=self.timed("tokenizing", tts.tokenizer_func),
+        )
+
+    def transport(self, transport):
+        """Wrap ``transport`` to time its requests (connect, ttfb, body)."""
+        # The transport that opens connections, maybe under others
+        inner = transport
+        while inner is not None and not hasattr(inner, "add_connect_hook"):
+            inner = getattr(inner, "transport", None)
+        if inner is not None:
+            inner.add_connect_hook(self._connected)
+            self._hooked.append(inner)
+        return _ProfiledTransport(self, transport)
+
+    def writer(self, fp):
+        """Wrap the file-like ``fp`` to time its writes."""
+        return _ProfiledWriter(self, fp)
+
+    @property
+    def wall(self):
+        """Wall time (in seconds) from the import of ``navertts`` to :meth:`stop`."""
+        end = time.perf_counter() if self.stopped is None else self.stopped
+        return end - IMPORT_START
+
+    def to_dict(self):
+        """Return the time of each phase (e.g. for ``json.dumps``)."""
+        with self._lock:
+            phases = collections.OrderedDict(
+                (p, {"seconds": round(s, 6), "calls": n})
+                for p, (s, n) in self._phases.items()
+            )
+        return {"wall": round(self.wall, 6), "phases": phases}
+
+    def report(self, top=20):
+        """Print the time of each phase, and the ``top`` functions.
+
+        Args:
+            top (int): Number of functions to list, by cumulative time.
+
+        Returns:
+            string: The report.
+
+        """
+        timing = self.to_dict()
+        lines = [
+            "{:<16}{:>10}{:>8}".format("phase", "seconds", "calls"),
+        ]
+        for phase, total in timing["phases"].items():
+            lines.append(
+                "{:<16}{:>10.3f}{:>8}".format(phase, total["seconds"], total["calls"])
+            )
+        lines.append("{:<16}{:>10.3f}".format("wall", timing["wall"]))
+        if self._profile is not None and top:
+            # Slow to import: only when reporting
+            import pstats
+
+            out = io.StringIO()
+            stats = pstats.Stats(self._profile, stream=out)
+            stats.sort_stats("cumulative").print_stats(top)
+            lines.append(out.getvalue().rstrip())
+        return "\n".join(lines)
+
+    def dump(self, path):
+        """Write the profile of functions to ``path``, for :mod:`pstats`.
+
+        Raises:
+            ValueError: When functions weren't profiled.
+
+        """
+        if self._profile is None:
+            raise ValueError("Functions weren't profiled")
+        self._profile.dump_stats(path)
+
+    def __repr__(self):  # pragma: no cover
+        """Print the profiler."""
+        return "Profiler(wall={:.3f})".format(self.wall)
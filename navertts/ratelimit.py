@@ -0,0 +1,279 @@
+# -*- coding: utf-8 -*-
+from . import utils
+
+import logging
+import os
+import re
+import struct
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover
+    # Not on Windows: buckets are only shared between the threads of a process
+    fcntl = None
+
+__all__ = ["SharedRateLimiter", "get_rate_limiter", "set_rate_limiter"]
+
+# Logger
+log = logging.getLogger(__name__)
+log.addHandler(logging.NullHandler())
+
+# Bucket state: tokens, time of the last update
+_STATE = struct.Struct("=dd")
+
+
+class SharedRateLimiter:
+    """A token-bucket rate limiter shared by all processes of a user.
+
+    Each bucket (one per API host, i.e. per ``tld``) holds up to ``burst``
+    tokens and is refilled at ``rate`` tokens per second. Taking a token
+    before each upstream request caps the aggregate request rate of every
+    process that uses the same ``directory``. The state of a bucket lives in
+    a small file in ``directory``, read and updated under an exclusive lock
+    (``fcntl.flock``).
+
+    In blocking mode, a request waits for its token: it's reserved right
+    away (the bucket may go below zero) so that waiting requests are served
+    in order. Part requests take theirs when the
+    :class:`navertts.scheduler.Scheduler` dispatches them (see
+    :meth:`reserve`): they wait holding a slot of their priority class, not
+    a worker, so each process only reserves as many tokens ahead as it may
+    run requests at once. The tokens of requests cancelled before they're
+    sent are given back (see :meth:`release`). In fail-fast mode,
+    :meth:`acquire` returns ``False`` when there's no token available.
+
+    Args:
+        rate (float): Tokens added per second, i.e. the sustained rate.
+        burst (int, optional): Size of the bucket, i.e. how many requests
+            can be sent at once after a quiet period. Defaults to ``rate``
+            (and at least 1).
+        rates (dict, optional): ``rate`` by ``tld``, for hosts that have a
+            different quota. Their ``burst`` is scaled accordingly.
+        directory (string, optional): Where the buckets are shared. Defaults
+            to ``navertts/ratelimit`` in the user's cache directory
+            (``$XDG_CACHE_HOME``, or else ``~/.cache``). It's created, and
+            the buckets in it, only accessible to the user.
+        blocking (bool): Wait for a token (``True``) or fail fast
+            (``False``).
+        timeout (float, optional): In blocking mode, fail when the wait for a
+            token would be longer than ``timeout`` seconds.
+
+    Note:
+        All the processes sharing a ``directory`` should use the same
+        ``rate`` and ``burst``. Without ``fcntl`` (e.g. on Windows), buckets
+        are only shared by the threads of a process.
+
+    Example:
+        Keep all the workers of a host under 5 requests per second::
+
+            >>> set_rate_limiter(SharedRateLimiter(rate=5))
+            >>> NaverTTS(text).save("hello.mp3")
+
+        Or fail instead of waiting, and retry later::
+
+            >>> set_rate_limiter(SharedRateLimiter(rate=5, blocking=False))
+            >>> try:
+            ...     NaverTTS(text).save("hello.mp3")
+            ... except NaverTTSRateLimited:
+            ...     retry_later(text)
+
+    """
+
+    def __init__(
+        self,
+        rate,
+        burst=None,
+        rates=None,
+        directory=None,
+        blocking=True,
+        timeout=None,
+    ):
+        """Create the rate limiter."""
+        if rate <= 0:
+            raise ValueError("rate must be positive. Got {}".format(rate))
+        self.rate = float(rate)
+        self.burst = max(1.0, float(rate if burst is None else burst))
+        self.rates = dict(rates or {})
+        self.directory = directory or utils._cache_dir("ratelimit")
+        self.blocking = blocking
+        self.timeout = timeout
+
+        self._lock = threading.Lock()
+        self._files = {}
+        utils._makedirs_private(self.directory)
+
+    def _bucket(self, key):
+        """Rate and burst of the bucket for ``key``."""
+        rate = float(self.rates.get(key, self.rate))
+        return rate, max(1.0, self.burst * rate / self.rate)
+
+    def _file(self, key):
+        # Called with the lock held
+        f = self._files.get(key)
+        if f is None:
+            name = re.sub(r"[^\w.-]", "_", key) or "_"
+            path = os.path.join(self.directory, name + ".bucket")
+            fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+            if not utils._trusted(os.fstat(fd)):
+                os.close(fd)
+                raise IOError("{}: not the user's own".format(path))
+            f = self._files[key] = os.fdopen(fd, "r+b", buffering=0)
+        return f
+
+    def acquire(self, key="com", blocking=None, timeout=None):
+        """Take a token from the bucket for ``key``.
+
+        Args:
+            key (string): The bucket, e.g. a ``tld``.
+            blocking (bool, optional): Overrides the ``blocking`` mode.
+            timeout (float, optional): Overrides the ``timeout``.
+
+        Returns:
+            bool: ``True`` once a token was taken, ``False`` when there was
+            none (fail-fast mode) or not soon enough (``timeout``).
+
+        Raises:
+            IOError: When the bucket file isn't the user's own.
+
+        """
+        wait = self.reserve(key, blocking, timeout)
+        if wait is None:
+            return False
+        if wait:
+            utils._log(log.debug, "waiting %.3fs for a token for '%s'", wait, key)
+            time.sleep(wait)
+        return True
+
+    def reserve(self, key="com", blocking=None, timeout=None):
+        """Take a token from the bucket for ``key``, without waiting for it.
+
+        Args:
+            key (string): The bucket, e.g. a ``tld``.
+            blocking (bool, optional): Overrides the ``blocking`` mode.
+            timeout (float, optional): Overrides the ``timeout``.
+
+        Returns:
+            float: Seconds before the token taken can be used (``0`` when
+            right away), or ``None`` when there was none (fail-fast mode) or
+            not soon enough (``timeout``).
+
+        Raises:
+            IOError: When the bucket file isn't the user's own.
+
+        """
+        blocking = self.blocking if blocking is None else blocking
+        timeout = self.timeout if timeout is None else timeout
+
+        def take(tokens, rate):
+            wait = 0.0 if tokens >= 1 else (1 - tokens) / rate
+            if wait and (not blocking or (timeout is not None and wait > timeout)):
+                utils._log(log.debug, "no token for '%s' (%.3fs)", key, wait)
+                return tokens, None
+            return tokens - 1, wait
+
+        return self._update(key, take)
+
+    def release(self, key="com"):
+        """Give back a token taken with :meth:`reserve` but not used.
+
+        E.g. for a request that was cancelled before it was sent: the
+        requests waiting after it don't have to wait for its token.
+
+        Args:
+            key (string): The bucket, e.g. a ``tld``.
+
+        Raises:
+            IOError: When the bucket file isn't the user's own.
+
+        """
+        _, burst = self._bucket(key)
+        self._update(key, lambda tokens, rate: (min(burst, tokens + 1), None))
+
+    def _update(self, key, func):
+        """Update the bucket for ``key`` under its lock.
+
+        ``func`` takes the tokens in the bucket (refilled until now) and its
+        rate, and returns the new number of tokens and a result, returned.
+
+        """
+        rate, burst = self._bucket(key)
+        with self._lock:
+            f = self._file(key)
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                f.seek(0)
+                data = f.read(_STATE.size)
+                now = time.time()
+                if len(data) == _STATE.size:
+                    tokens, last = _STATE.unpack(data)
+                    # max(): the clock went backwards
+                    tokens = min(burst, tokens + max(0.0, now - last) * rate)
+                else:
+                    tokens = burst
+
+                updated, result = func(tokens, rate)
+                if updated != tokens:
+                    f.seek(0)
+                    f.write(_STATE.pack(updated, now))
+                return result
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+
+    def close(self):
+        """Close the bucket files."""
+        with self._lock:
+            for f in self._files.values():
+                f.close()
+            self._files.clear()
+
+    def __getstate__(self):
+        # Files and locks are per process
+        state = self.__dict__.copy()
+        del state["_lock"], state["_files"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+        self._files = {}
+
+    def __repr__(self):  # pragma: no cover
+        """Print the rate limiter."""
+        return "SharedRateLimiter(rate={}, burst={}, directory={!r})".format(
+            self.rate, self.burst, self.directory
+        )
+
+
+# Process-wide rate limiter, consulted before every part request
+_rate_limiter = None
+
+
+def get_rate_limiter():
+    """Get the process-wide :class:`SharedRateLimiter`.
+
+    Returns:
+        :class:`SharedRateLimiter`: The rate limiter, ``None`` (the default)
+        when requests aren't rate limited.
+
+    """
+    return _rate_limiter
+
+
+def set_rate_limiter(limiter):
+    """Replace the process-wide rate limiter.
+
+    Args:
+        limiter (:class:`SharedRateLimiter`): The new rate limiter, or
+            ``None`` to stop rate limiting.
+
+    Returns:
+        :class:`SharedRateLimiter`: The previous rate limiter (or ``None``).
+
+    """
+    global _rate_limiter
+    previous, _rate_limiter = _rate_limiter, limiter
+    return previous
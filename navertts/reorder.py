@@ -0,0 +1,244 @@
+# -*- coding: utf-8 -*-
+from . import mp3
+from . import utils
+
+import functools
+import logging
+import tempfile
+import threading
+
+__all__ = ["ReorderBuffer"]
+
+# Logger
+log = logging.getLogger(__name__)
+log.addHandler(logging.NullHandler())
+
+# Size of the reads of a spilled part
+_CHUNK_SIZE = 1 << 16
+
+
+class Part:
+    """A fetched part, held by a :class:`ReorderBuffer` until its turn.
+
+    Attributes:
+        index (int): Index of the part.
+        size (int): Size of its ``mp3`` content, in bytes.
+        latency (float): Time it took to get the content, in seconds.
+        hedge: Hedging outcome, see :class:`navertts.hedging.HedgePolicy`.
+        frames (int): Number of ``mp3`` frames.
+        duration (float): Duration, in seconds.
+        spilled (bool): Whether the content was spilled to disk.
+
+    """
+
+    __slots__ = (
+        "index",
+        "size",
+        "latency",
+        "hedge",
+        "frames",
+        "duration",
+        "body",
+        "offset",
+        "error",
+    )
+
+    def __init__(self, index):
+        """Create the part."""
+        self.index = index
+        self.size = 0
+        self.latency = 0.0
+        self.hedge = None
+        self.frames = 0
+        self.duration = 0.0
+        self.body = None
+        self.offset = None
+        self.error = None
+
+    @property
+    def spilled(self):
+        """Whether the content was spilled to disk."""
+        return self.offset is not None
+
+
+class ReorderBuffer:
+    """Hold parts fetched out of order until they can be written, in order.
+
+    Parts are added as futures of ``(body, latency, hedge)``: each one is
+    moved into the buffer as soon as it completes, so that it's only held
+    once. Parts are kept in memory up to ``max_memory`` bytes; past that,
+    parts that complete before their turn are spilled to a temporary file
+    and streamed back from it when written. The next part to be written is
+    always kept in memory.
+
+    Args:
+        max_memory (int): Maximum size of the parts held in memory, in bytes.
+        directory (string, optional): Where to create the temporary file.
+            Defaults to the system's temporary directory.
+
+    Attributes:
+        memory (int): Size of the parts in memory.
+        peak_memory (int): Largest ``memory`` so far.
+        spilled (int): Number of parts spilled to disk so far.
+
+    Example:
+        >>> buffer = ReorderBuffer(max_memory=8 << 20)
+        >>> for idx, future in enumerate(futures):
+        ...     buffer.add(idx, future)
+        >>> for idx in range(len(futures)):
+        ...     buffer.write(buffer.get(idx), fp)
+        >>> buffer.close()
+
+    """
+
+    def __init__(self, max_memory, directory=None):
+        """Create the buffer."""
+        self.max_memory = max_memory
+        self.directory = directory
+        self.memory = 0
+        self.peak_memory = 0
+        self.spilled = 0
+
+        self._cond = threading.Condition()
+        self._futures = {}
+        self._parts = {}
+        self._next = 0
+        self._file = None
+        self._file_lock = threading.Lock()
+
+    def add(self, idx, future):
+        """Add the future of part ``idx``.
+
+        Args:
+            idx (int): Index of the part.
+            future (:class:`concurrent.futures.Future`): Its
+                ``(body, latency, hedge)``.
+
+        """
+        with self._cond:
+            self._futures[idx] = future
+        future.add_done_callback(functools.partial(self._done, idx))
+
+    def futures(self):
+        """Futures of the parts that haven't completed yet."""
+        with self._cond:
+            return list(self._futures.values())
+
+    def _done(self, idx, future):
+        part = Part(idx)
+        try:
+            body, part.latency, part.hedge = future.result()
+        except BaseException as e:
+            part.error = e
+            body = None
+
+        if body is not None:
+            part.size = len(body)
+            scanner = mp3.scan(body)
+            part.frames, part.duration = scanner.frames, scanner.duration
+            if scanner.junk:
+                utils._log(log.debug, "part-%i: %i byte(s) of junk", idx, scanner.junk)
+
+            with self._cond:
+                keep = idx <= self._next or self.memory + part.size <= self.max_memory
+                if keep:
+                    self.memory += part.size
+                    self.peak_memory = max(self.peak_memory, self.memory)
+            if keep:
+                part.body = body
+            else:
+                part.offset = self._spill(body)
+                utils._log(log.debug, "part-%i spilled (%i bytes)", idx, part.size)
+
+        with self._cond:
+            self._futures.pop(idx, None)
+            if body is not None and part.offset is not None:
+                self.spilled += 1
+            self._parts[idx] = part
+            self._cond.notify_all()
+
+    def _spill(self, body):
+        with self._file_lock:
+            if self._file is None:
+                self._file = tempfile.TemporaryFile(
+                    prefix="navertts-", dir=self.directory
+                )
+            self._file.seek(0, 2)
+            offset = self._file.tell()
+            self._file.write(body)
+        return offset
+
+    def get(self, idx, token=None):
+        """Wait for part ``idx``, the next one to be written.
+
+        Args:
+            idx (int): Index of the part.
+            token (:class:`navertts.cancel.CancelToken`, optional): Stop
+                waiting when it's cancelled or past its deadline.
+
+        Returns:
+            :class:`Part`: The part, or ``None`` when ``token`` stopped
+            waiting first.
+
+        Raises:
+            Exception: What fetching the part raised.
+
+        """
+        with self._cond:
+            self._next = idx
+            future = self._futures.get(idx)
+        if future is not None and token is not None and not token.wait(future):
+            return None
+
+        with self._cond:
+            while idx not in self._parts:
+                self._cond.wait()
+            part = self._parts.pop(idx)
+            if part.body is not None:
+                self.memory -= part.size
+        if part.error is not None:
+            raise part.error
+        return part
+
+    def write(self, part, fp):
+        """Write the content of ``part`` to ``fp``.
+
+        A spilled part is streamed from disk, a chunk at a time. Each chunk
+        is a new ``bytes`` object: ``fp`` may keep the ones it's given.
+
+        Args:
+            part (:class:`Part`): The part, from :meth:`get`.
+            fp (file object): A file-like object that takes bytes.
+
+        """
+        if not part.spilled:
+            fp.write(part.body)
+            part.body = None
+            return
+
+        done = 0
+        while done < part.size:
+            with self._file_lock:
+                self._file.seek(part.offset + done)
+                chunk = self._file.read(min(_CHUNK_SIZE, part.size - done))
+            if not chunk:  # pragma: no cover
+                raise IOError("Spilled part-%i was truncated" % part.index)
+            fp.write(chunk)
+            done += len(chunk)
+
+    def close(self):
+        """Remove the temporary file and drop the parts left."""
+        with self._file_lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+        with self._cond:
+            self._parts.clear()
+            self._futures.clear()
+            self.memory = 0
+
+    def __repr__(self):  # pragma: no cover
+        """Print the buffer."""
+        return "ReorderBuffer(max_memory={}, memory={}, spilled={})".format(
+            self.max_memory, self.memory, self.spilled
+        )
@@ -0,0 +1,405 @@
+# -*- coding: utf-8 -*-
+from .concurrency import AIMDLimit
+
+from concurrent.futures import Future
+import collections
+import heapq
+import itertools
+import logging
+import threading
+import time
+
+__all__ = ["PriorityClass", "Scheduler", "get_scheduler", "set_scheduler"]
+
+# Logger
+log = logging.getLogger(__name__)
+log.addHandler(logging.NullHandler())
+
+
+class PriorityClass:
+    """Scheduling parameters of a class of work.
+
+    Args:
+        weight (int or float): Share of dispatches the class gets when other
+            classes also have queued work. A class of weight 4 is dispatched
+            4 times as often as a class of weight 1.
+        max_concurrency (int, optional): Maximum number of tasks of the class
+            running at once. Defaults to ``None`` (only bounded by the
+            number of workers of the scheduler).
+        window (int): Number of recent queue times kept for the metrics.
+
+    """
+
+    def __init__(self, weight=1, max_concurrency=None, window=1024):
+        """Create the priority class."""
+        if weight <= 0:
+            raise ValueError("weight must be positive. Got {}".format(weight))
+        self.weight = weight
+        self.max_concurrency = max_concurrency
+        self.window = window
+
+
+DEFAULT_CLASSES = {
+    "interactive": PriorityClass(weight=4),
+    "bulk": PriorityClass(weight=1, max_concurrency=4),
+}
+"""Default priority classes: latency-sensitive ``interactive`` work is
+dispatched first and can use every worker; background ``bulk`` work can
+never take more than half of the (default) workers.
+
+"""
+
+
+class _ClassState:
+    def __init__(self, pclass):
+        self.pclass = pclass
+        self.flows = collections.OrderedDict()
+        self.queued = 0
+        self.running = 0
+        self.submitted = 0
+        self.completed = 0
+        self.vtime = 0.0
+        self.queue_times = collections.deque(maxlen=pclass.window)
+
+    def runnable(self):
+        cap = self.pclass.max_concurrency
+        return self.queued and (cap is None or self.running < cap)
+
+    def pop(self):
+        # Round-robin between the flows of the class
+        flow, tasks = next(iter(self.flows.items()))
+        task = tasks.popleft()
+        if tasks:
+            self.flows.move_to_end(flow)
+        else:
+            del self.flows[flow]
+        self.queued -= 1
+        return task
+
+
+def _percentile(values, q):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    idx = min(len(values) - 1, int(round(q / 100.0 * (len(values) - 1))))
+    return values[idx]
+
+
+class Scheduler:
+    """Priority-aware scheduler for upstream requests.
+
+    Tasks are submitted with a priority class and run by a shared pool of
+    worker threads. Between classes, tasks are dispatched by weighted fair
+    queuing and each class can be capped to a number of concurrently
+    running tasks. Within a class, tasks are dispatched round-robin between
+    *flows* (e.g. one flow per :meth:`NaverTTS.write_to_fp` call), so that
+    one large job doesn't starve smaller ones of the same class.
+
+    The total number of tasks running at once is bounded by ``max_workers``
+    and, when set, by the current limit of an adaptive ``limiter`` which the
+    tasks themselves feed with the outcome of their requests.
+
+    A task can be submitted with a ``delay``: it's only queued once due,
+    and no worker waits for it in the meantime. Or with a function to
+    ``acquire`` what it needs (e.g. a rate limit token) when it's
+    dispatched: while waiting for it, the task holds its slot (so that
+    tasks can't take more than they're allowed to run at once) but not
+    a worker. What a cancelled task acquired is released.
+
+    Args:
+        max_workers (int): Maximum number of tasks running at once.
+        classes (dict, optional): ``{ '<name>': PriorityClass }``. Defaults to
+            :data:`DEFAULT_CLASSES`.
+        limiter (:class:`navertts.concurrency.AIMDLimit`, optional): Adaptive
+            concurrency limit. Defaults to ``None`` (fixed concurrency).
+
+    Example:
+        Run a function with a low priority::
+
+            >>> sched = Scheduler(max_workers=4)
+            >>> future = sched.submit(fetch, url, priority="bulk")
+            >>> body = future.result()
+
+    """
+
+    def __init__(self, max_workers=8, classes=None, limiter=None):
+        """Create the scheduler."""
+        if max_workers < 1:
+            raise ValueError("max_workers must be at least 1")
+        self.max_workers = max_workers
+        self.limiter = limiter
+        self._cond = threading.Condition()
+        self._classes = collections.OrderedDict(
+            (name, _ClassState(pclass))
+            for name, pclass in (classes or DEFAULT_CLASSES).items()
+        )
+        self._vtime = 0.0
+        self._delayed = []
+        # Dispatched tasks that acquired what they needed: run first
+        self._ready = collections.deque()
+        self._seq = itertools.count()
+        self._workers = []
+        self._idle = 0
+        self._shutdown = False
+
+    @property
+    def limit(self):
+        """Current maximum number of tasks running at once."""
+        if self.limiter is None:
+            return self.max_workers
+        return min(self.max_workers, self.limiter.limit)
+
+    @property
+    def classes(self):
+        """Names of the priority classes."""
+        return list(self._classes)
+
+    def submit(self, func, *args, **kwargs):
+        """Schedule ``func(*args, **kwargs)``.
+
+        Args:
+            func (callable): The function to run.
+            priority (string): Keyword-only. Name of the priority class.
+                Defaults to the first class (``interactive``).
+            flow (hashable): Keyword-only. Flow the task belongs to, for
+                round-robin within its class. Defaults to a flow of its own.
+            delay (float): Keyword-only. Seconds before the task is queued.
+            acquire (callable): Keyword-only. Called without arguments when
+                the task is dispatched, before it runs: returns the seconds
+                before it may run. An exception fails the task.
+            release (callable): Keyword-only. Called without arguments when
+                the task is cancelled after ``acquire`` returned.
+
+        Returns:
+            :class:`concurrent.futures.Future`: The future result of ``func``.
+
+        Raises:
+            ValueError: When ``priority`` is not a class of the scheduler.
+            RuntimeError: When the scheduler was shut down.
+
+        """
+        priority = kwargs.pop("priority", None) or next(iter(self._classes))
+        flow = kwargs.pop("flow", None)
+        delay = kwargs.pop("delay", None)
+        acquire = kwargs.pop("acquire", None)
+        release = kwargs.pop("release", None)
+        try:
+            state = self._classes[priority]
+        except KeyError:
+            raise ValueError(
+                "Unknown priority class '{}'. Choose from {}".format(
+                    priority, list(self._classes)
+                )
+            )
+
+        future = Future()
+        if flow is None:
+            flow = object()
+        due = time.perf_counter() + (delay or 0.0)
+        task = (future, func, args, kwargs, due, acquire, release)
+        with self._cond:
+            if self._shutdown:
+                raise RuntimeError("Cannot submit to a scheduler that was shut down")
+            state.submitted += 1
+            if delay:
+                heapq.heappush(self._delayed, (due, next(self._seq), state, flow, task))
+            else:
+                self._queue(state, flow, task)
+            self._spawn_worker()
+            self._cond.notify()
+        return future
+
+    def _queue(self, state, flow, task):
+        # Called with the lock held
+        if not state.queued and not state.running:
+            # (Re)activated class: no credit for the time it was idle
+            state.vtime = max(state.vtime, self._vtime)
+        tasks = state.flows.get(flow)
+        if tasks is None:
+            tasks = state.flows[flow] = collections.deque()
+        tasks.append(task)
+        state.queued += 1
+
+    def _queue_due(self):
+        # Called with the lock held. Returns the seconds before the next
+        # delayed task is due (None without any)
+        now = time.perf_counter()
+        while self._delayed and self._delayed[0][0] <= now:
+            _, _, state, flow, task = heapq.heappop(self._delayed)
+            if flow is None:
+                # Dispatched already, holding its slot
+                self._ready.append((state, task))
+            else:
+                self._queue(state, flow, task)
+        if self._delayed:
+            return self._delayed[0][0] - now
+        return None
+
+    def metrics(self):
+        """Per-class counters and queue times (in seconds).
+
+        Returns:
+            dict: ``{ '<class>': {'queued', 'running', 'submitted',
+            'completed', 'queue_time_p50', 'queue_time_p99',
+            'queue_time_max'} }``
+
+        """
+        out = {}
+        with self._cond:
+            for name, state in self._classes.items():
+                times = list(state.queue_times)
+                out[name] = {
+                    "queued": state.queued,
+                    "running": state.running,
+                    "submitted": state.submitted,
+                    "completed": state.completed,
+                    "queue_time_p50": _percentile(times, 50),
+                    "queue_time_p99": _percentile(times, 99),
+                    "queue_time_max": max(times) if times else 0.0,
+                }
+        return out
+
+    def shutdown(self, wait=True):
+        """Stop the workers once the queued tasks are done.
+
+        Args:
+            wait (bool): Wait for the workers to exit.
+
+        """
+        with self._cond:
+            self._shutdown = True
+            self._cond.notify_all()
+            workers = list(self._workers)
+        if wait:
+            for w in workers:
+                w.join()
+
+    def _spawn_worker(self):
+        # Called with the lock held
+        queued = sum(state.queued for state in self._classes.values())
+        queued += len(self._delayed) + len(self._ready)
+        if queued <= self._idle or len(self._workers) >= self.max_workers:
+            return
+        w = threading.Thread(
+            target=self._work, name="navertts-scheduler-%d" % len(self._workers)
+        )
+        w.daemon = True
+        self._workers.append(w)
+        w.start()
+
+    def _running(self):
+        return sum(state.running for state in self._classes.values())
+
+    def _next(self):
+        # Called with the lock held. Weighted fair queuing between the
+        # runnable classes: lowest virtual time first. Returns the class
+        # and task, counted as running
+        self._queue_due()
+        if self._ready:
+            return self._ready.popleft()
+        if self._running() >= self.limit:
+            return None, None
+        best = None
+        for state in self._classes.values():
+            if state.runnable() and (best is None or state.vtime < best.vtime):
+                best = state
+        if best is None:
+            return None, None
+        self._vtime = best.vtime
+        best.vtime += 1.0 / best.pclass.weight
+        best.running += 1
+        task = best.pop()
+        best.queue_times.append(time.perf_counter() - task[4])
+        return best, task
+
+    def _work(self):
+        while True:
+            with self._cond:
+                state, task = self._next()
+                while task is None:
+                    if (
+                        self._shutdown
+                        and not self._delayed
+                        and not self._ready
+                        and not any(s.queued for s in self._classes.values())
+                    ):
+                        return
+                    self._idle += 1
+                    # Until notified, or the next delayed task is due
+                    self._cond.wait(self._queue_due())
+                    self._idle -= 1
+                    state, task = self._next()
+                future, func, args, kwargs, queued, acquire, release = task
+
+            if acquire is not None and not future.cancelled():
+                try:
+                    wait = acquire()
+                except BaseException as e:
+                    if future.set_running_or_notify_cancel():
+                        future.set_exception(e)
+                    self._done(state)
+                    continue
+                if release is not None:
+                    future.add_done_callback(lambda f: f.cancelled() and release())
+                if wait:
+                    # Until then, the task holds its slot but not a worker
+                    due = time.perf_counter() + wait
+                    task = (future, func, args, kwargs, queued, None, None)
+                    with self._cond:
+                        entry = (due, next(self._seq), state, None, task)
+                        heapq.heappush(self._delayed, entry)
+                    continue
+
+            try:
+                if future.set_running_or_notify_cancel():
+                    try:
+                        result = func(*args, **kwargs)
+                    except BaseException as e:
+                        future.set_exception(e)
+                    else:
+                        future.set_result(result)
+            finally:
+                self._done(state)
+
+    def _done(self, state):
+        with self._cond:
+            state.running -= 1
+            state.completed += 1
+            # A slot was freed: a capped class may be runnable again
+            self._cond.notify_all()
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler():
+    """Get the process-wide :class:`Scheduler`, creating it if needed.
+
+    The default scheduler has the :data:`DEFAULT_CLASSES` and adapts its
+    concurrency (up to 8 requests at once) with an
+    :class:`navertts.concurrency.AIMDLimit`.
+
+    """
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = Scheduler(limiter=AIMDLimit(initial=4, max_limit=8))
+        return _scheduler
+
+
+def set_scheduler(scheduler):
+    """Replace the process-wide :class:`Scheduler`.
+
+    Args:
+        scheduler (:class:`Scheduler`): The new scheduler. The previous one
+            is not shut down.
+
+    Returns:
+        :class:`Scheduler`: The previous scheduler (or ``None``).
+
+    """
+    global _scheduler
+    with _scheduler_lock:
+        previous, _scheduler = _scheduler, scheduler
+        return previous
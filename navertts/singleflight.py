@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+import threading
+
+__all__ = ["SingleFlight"]
+
+
+class SingleFlight:
+    """Coalesce identical concurrent calls into a single execution.
+
+    The first caller for a given ``key`` starts the work. Callers arriving
+    with the same ``key`` while it's still in flight get the same future,
+    and share its result (or its exception) instead of starting the work
+    again. Once the future is done, the ``key`` is forgotten: later calls
+    start the work anew.
+
+    Example:
+        Fetch a URL once, no matter how many threads ask for it at the
+        same time::
+
+            >>> group = SingleFlight()
+            >>> body = group.future(url, lambda: pool.submit(fetch, url)).result()
+
+    """
+
+    def __init__(self):
+        """Create the group."""
+        self._lock = threading.Lock()
+        self._futures = {}
+
+    def future(self, key, submit):
+        """Get the future for ``key``, submitting it if none is in flight.
+
+        Args:
+            key (hashable): Identity of the call.
+            submit (callable): Function taking no argument that starts the
+                work and returns its :class:`concurrent.futures.Future`.
+                It's only called when no future for ``key`` is in flight.
+
+        Returns:
+            :class:`concurrent.futures.Future`: A future shared by all
+            concurrent callers for ``key``.
+
+        """
+        with self._lock:
+            future = self._futures.get(key)
+            if future is not None:
+                return future
+            future = self._futures[key] = submit()
+        future.add_done_callback(lambda f: self._forget(key, f))
+        return future
+
+    def _forget(self, key, future):
+        with self._lock:
+            if self._futures.get(key) is future:
+                del self._futures[key]
+
+    def in_flight(self):
+        """Number of distinct keys currently being executed."""
+        with self._lock:
+            return len(self._futures)
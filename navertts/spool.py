@@ -0,0 +1,547 @@
+# -*- coding: utf-8 -*-
+from . import utils
+from .streaming import iter_chunks
+from .tts import NaverTTS, NaverTTSError, Voice
+
+from concurrent.futures import ThreadPoolExecutor, wait
+import io
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+
+__all__ = ["SpoolDaemon", "SpoolQueue"]
+
+# Logger
+log = logging.getLogger(__name__)
+log.addHandler(logging.NullHandler())
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE,
+    size INTEGER NOT NULL,
+    mtime REAL NOT NULL,
+    state TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    enqueued REAL NOT NULL,
+    started REAL,
+    finished REAL,
+    owner TEXT,
+    lease REAL,
+    not_before REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_state ON jobs (state, id);
+"""
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+STATES = (QUEUED, RUNNING, DONE, FAILED)
+
+# Columns added since the first schema: (name, type)
+_NEW_COLUMNS = (("owner", "TEXT"), ("lease", "REAL"), ("not_before", "REAL"))
+
+# Max seconds a failed job waits before it's retried
+MAX_BACKOFF = 300.0
+
+
+class SpoolQueue:
+    """A durable queue of synthesis jobs, in a SQLite database.
+
+    A job is an input file of the spool directory, by ``name``. It goes
+    from ``queued`` to ``running`` when claimed, then to ``done`` or
+    ``failed`` (or back to ``queued`` to be retried). State changes are
+    committed before they're acted upon, so that jobs survive restarts:
+    ``done`` jobs are never processed again (unless their input file
+    changes).
+
+    A claimed job is leased to its ``owner`` (``<pid>@<host>``) for
+    ``lease`` seconds, to be extended with :meth:`renew` while it's being
+    processed. When a process stops, the jobs it was running are queued
+    again by :meth:`recover` once their lease expired, while the jobs of
+    the other processes sharing the queue are left alone.
+
+    A job queued again to be retried isn't claimed before ``backoff``
+    seconds, doubled at each attempt (up to :data:`MAX_BACKOFF`), so that a
+    failing upstream isn't hit in a tight loop.
+
+    Args:
+        path (string): The database file.
+        lease (float): Seconds a claimed job is owned for, unless renewed.
+        backoff (float): Seconds before the first retry of a job.
+
+    """
+
+    def __init__(self, path, lease=60.0, backoff=1.0):
+        """Open (or create) the queue."""
+        self.path = path
+        self.lease = lease
+        self.backoff = backoff
+        self.owner = "{}@{}".format(os.getpid(), socket.gethostname())
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(_SCHEMA)
+        self._transaction(self._migrate)
+
+    def _migrate(self):
+        # Queues created by an older version
+        columns = [row["name"] for row in self._db.execute("PRAGMA table_info(jobs)")]
+        for name, type_ in _NEW_COLUMNS:
+            if name not in columns:
+                self._db.execute(
+                    "ALTER TABLE jobs ADD COLUMN {} {}".format(name, type_)
+                )
+
+    def _transaction(self, func, *args):
+        with self._lock:
+            # Immediate: claims are atomic across processes too
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                result = func(*args)
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+            self._db.execute("COMMIT")
+            return result
+
+    def add(self, name, size, mtime):
+        """Queue the job of an input file, unless it's already known.
+
+        Args:
+            name (string): Name of the input file.
+            size (int): Its size, in bytes.
+            mtime (float): Its modification time.
+
+        Returns:
+            bool: Whether the job was queued (a new file, or a file that
+            changed since it was processed). A job that is ``running`` isn't
+            queued again: its file is seen as changed once it's processed.
+
+        """
+        return self._transaction(self._add, name, size, mtime)
+
+    def _add(self, name, size, mtime):
+        row = self._db.execute(
+            "SELECT size, mtime, state FROM jobs WHERE name = ?", (name,)
+        ).fetchone()
+        if row is None:
+            self._db.execute(
+                "INSERT INTO jobs (name, size, mtime, state, enqueued) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (name, size, mtime, QUEUED, time.time()),
+            )
+            return True
+        if (row["size"], row["mtime"]) == (size, mtime) or row["state"] == RUNNING:
+            return False
+        self._db.execute(
+            "UPDATE jobs SET size = ?, mtime = ?, state = ?, attempts = 0, "
+            "error = NULL, enqueued = ?, started = NULL, finished = NULL, "
+            "not_before = NULL WHERE name = ?",
+            (size, mtime, QUEUED, time.time(), name),
+        )
+        return True
+
+    def claim(self):
+        """Take the oldest queued job that is due.
+
+        Returns:
+            sqlite3.Row: The job (``id``, ``name``, ``size``, ``attempts``...),
+            now ``running`` and leased to :attr:`owner`, or ``None`` when no
+            queued job is due (see :meth:`next_due`).
+
+        """
+        return self._transaction(self._claim)
+
+    def _claim(self):
+        now = time.time()
+        row = self._db.execute(
+            "SELECT id FROM jobs WHERE state = ? "
+            "AND (not_before IS NULL OR not_before <= ?) ORDER BY id LIMIT 1",
+            (QUEUED, now),
+        ).fetchone()
+        if row is None:
+            return None
+        self._db.execute(
+            "UPDATE jobs SET state = ?, attempts = attempts + 1, started = ?, "
+            "owner = ?, lease = ? WHERE id = ?",
+            (RUNNING, now, self.owner, now + self.lease, row["id"]),
+        )
+        return self._db.execute(
+            "SELECT * FROM jobs WHERE id = ?", (row["id"],)
+        ).fetchone()
+
+    def next_due(self):
+        """When the next queued job is due.
+
+        Returns:
+            float: The time (as of :func:`time.time`) the next queued job can
+            be claimed from (maybe already passed), or ``None`` when the
+            queue is empty.
+
+        """
+        with self._lock:
+            row = self._db.execute(
+                "SELECT MIN(COALESCE(not_before, 0)) FROM jobs WHERE state = ?",
+                (QUEUED,),
+            ).fetchone()
+        return row[0]
+
+    def _finish(self, job_id, state, error=None):
+        self._db.execute(
+            "UPDATE jobs SET state = ?, error = ?, finished = ? WHERE id = ?",
+            (state, error, time.time(), job_id),
+        )
+
+    def _retry(self, job_id, error):
+        # Exponential backoff on the attempts made so far
+        row = self._db.execute(
+            "SELECT attempts FROM jobs WHERE id = ?", (job_id,)
+        ).fetchone()
+        delay = min(self.backoff * 2 ** max(row["attempts"] - 1, 0), MAX_BACKOFF)
+        self._finish(job_id, QUEUED, error)
+        self._db.execute(
+            "UPDATE jobs SET not_before = ? WHERE id = ?", (time.time() + delay, job_id)
+        )
+
+    def done(self, job_id):
+        """Mark a job as done."""
+        self._transaction(self._finish, job_id, DONE)
+
+    def failed(self, job_id, error, retry=False):
+        """Mark a job as failed.
+
+        Args:
+            job_id (int): The job.
+            error (string): Why it failed.
+            retry (bool): Queue it again instead, to be claimed after a
+                backoff.
+
+        """
+        if retry:
+            self._transaction(self._retry, job_id, error)
+        else:
+            self._transaction(self._finish, job_id, FAILED, error)
+
+    def renew(self):
+        """Extend the lease of the jobs :attr:`owner` is running.
+
+        Returns:
+            int: The number of jobs renewed.
+
+        """
+        return self._transaction(
+            lambda: self._db.execute(
+                "UPDATE jobs SET lease = ? WHERE state = ? AND owner = ?",
+                (time.time() + self.lease, RUNNING, self.owner),
+            ).rowcount
+        )
+
+    def recover(self):
+        """Queue the running jobs whose lease expired (their owner stopped).
+
+        Returns:
+            int: The number of jobs queued again.
+
+        """
+        return self._transaction(
+            lambda: self._db.execute(
+                "UPDATE jobs SET state = ?, owner = NULL, lease = NULL "
+                "WHERE state = ? AND (lease IS NULL OR lease < ?)",
+                (QUEUED, RUNNING, time.time()),
+            ).rowcount
+        )
+
+    def depth(self):
+        """Number of jobs in each state.
+
+        Returns:
+            dict: ``{state: count}``, for every state.
+
+        """
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT state, COUNT(*) FROM jobs GROUP BY state"
+            ).fetchall()
+        counts = dict.fromkeys(STATES, 0)
+        counts.update((state, n) for state, n in rows)
+        return counts
+
+    def jobs(self, state=None):
+        """List the jobs (in a ``state``), oldest first."""
+        with self._lock:
+            if state is None:
+                return self._db.execute("SELECT * FROM jobs ORDER BY id").fetchall()
+            return self._db.execute(
+                "SELECT * FROM jobs WHERE state = ? ORDER BY id", (state,)
+            ).fetchall()
+
+    def close(self):
+        """Close the database."""
+        with self._lock:
+            self._db.close()
+
+
+class SpoolDaemon:
+    """Synthesize the text files dropped into a spool directory.
+
+    The spool directory is polled for new (or changed) ``*.txt`` files,
+    recorded as jobs of a :class:`SpoolQueue`. Up to ``jobs`` of them are
+    processed at once by a pool of threads, all sharing the process-wide
+    :class:`navertts.scheduler.Scheduler` (in its ``bulk`` class) for
+    their upstream requests. Each input is streamed (see
+    :func:`navertts.streaming.iter_chunks`) and saved with
+    ``NaverTTS.save(..., resume=True)``: the ``mp3`` only appears in the
+    output directory once complete, and a job interrupted by a restart
+    continues from its last written part.
+
+    Producers should drop files atomically (write them elsewhere, or under a
+    name starting with ``.``, then rename them): hidden files are ignored.
+
+    Args:
+        spool_dir (string): The directory to watch.
+        output_dir (string, optional): Where to write the ``mp3`` files.
+            Defaults to ``spool_dir``.
+        voice (:class:`navertts.Voice`, optional): The voice to read with.
+        db (string, optional): The queue database. Defaults to
+            ``.navertts-spool.db`` in ``spool_dir``.
+        jobs (int): Number of jobs processed at once.
+        max_attempts (int): Attempts of a job before it's marked as failed
+            (on API errors, other errors aren't retried).
+        lease (float): Seconds a job is owned for without being renewed:
+            how soon the jobs of a daemon that was killed are processed
+            again, by another (or a restart).
+        backoff (float): Seconds before the first retry of a failed job,
+            doubled at each attempt.
+        poll (float): Seconds between scans of ``spool_dir``.
+        extension (string): Extension of the input files.
+
+    Example:
+        Run until interrupted, logging the queue depth every minute::
+
+            >>> daemon = SpoolDaemon("/var/spool/tts", voice=Voice(lang="en"))
+            >>> daemon.run(report=60)
+
+    """
+
+    def __init__(
+        self,
+        spool_dir,
+        output_dir=None,
+        voice=None,
+        db=None,
+        jobs=4,
+        max_attempts=3,
+        poll=1.0,
+        extension=".txt",
+        lease=60.0,
+        backoff=1.0,
+    ):
+        """Create the daemon."""
+        self.spool_dir = spool_dir
+        self.output_dir = output_dir or spool_dir
+        self.voice = voice or Voice()
+        self.queue = SpoolQueue(
+            db or os.path.join(spool_dir, ".navertts-spool.db"),
+            lease=lease,
+            backoff=backoff,
+        )
+        self.jobs = jobs
+        self.max_attempts = max_attempts
+        self.poll = poll
+        self.extension = extension
+
+        self._stop = threading.Event()
+        self._stats_lock = threading.Lock()
+        self._started = time.time()
+        self._completed = 0
+        self._bytes = 0
+        if not os.path.isdir(self.output_dir):
+            os.makedirs(self.output_dir)
+
+    def scan(self):
+        """Queue the new (or changed) input files of the spool directory.
+
+        Returns:
+            int: The number of jobs queued.
+
+        """
+        queued = 0
+        for name in sorted(os.listdir(self.spool_dir)):
+            if name.startswith(".") or not name.endswith(self.extension):
+                continue
+            try:
+                st = os.stat(os.path.join(self.spool_dir, name))
+            except OSError:
+                # Removed since listed
+                continue
+            if self.queue.add(name, st.st_size, st.st_mtime):
+                utils._log(log.debug, "queued %s", name)
+                queued += 1
+        return queued
+
+    def output_path(self, name):
+        """Path of the ``mp3`` of the input file ``name``."""
+        stem = name[: -len(self.extension)] if self.extension else name
+        return os.path.join(self.output_dir, stem + ".mp3")
+
+    def process(self, job):
+        """Synthesize a claimed job, and record its outcome.
+
+        Args:
+            job (sqlite3.Row): The job, from :meth:`SpoolQueue.claim`.
+
+        Returns:
+            bool: Whether the job is done.
+
+        """
+        name = job["name"]
+        start = time.time()
+        try:
+            with io.open(os.path.join(self.spool_dir, name), encoding="utf-8") as f:
+                tts = NaverTTS(text=iter_chunks(f), voice=self.voice, priority="bulk")
+                tts.save(self.output_path(name), resume=True)
+        except NaverTTSError as e:
+            retry = job["attempts"] < self.max_attempts
+            utils._log(
+                log.warning,
+                "%s: %s (attempt %i of %i)",
+                name,
+                e,
+                job["attempts"],
+                self.max_attempts,
+            )
+            self.queue.failed(job["id"], str(e), retry=retry)
+            return False
+        except (AssertionError, ValueError, IOError, OSError) as e:
+            # No text, not UTF-8, removed...: retrying won't help
+            utils._log(log.warning, "%s: %s", name, e)
+            self.queue.failed(job["id"], str(e) or type(e).__name__)
+            return False
+        except Exception as e:
+            # A bug: don't leave the job running forever
+            log.exception("%s: unexpected error", name)
+            self.queue.failed(job["id"], "{}: {}".format(type(e).__name__, e))
+            return False
+
+        self.queue.done(job["id"])
+        with self._stats_lock:
+            self._completed += 1
+            self._bytes += job["size"]
+        utils._log(log.debug, "%s done in %.2fs", name, time.time() - start)
+        return True
+
+    def run_once(self):
+        """Scan the spool directory and process every queued job.
+
+        Jobs left ``running`` by a previous run are processed again, once
+        their lease expired. Failed jobs are retried after their backoff.
+
+        Returns:
+            int: The number of jobs done.
+
+        """
+        self._recover()
+        self.scan()
+        return sum(self._drain())
+
+    def _recover(self):
+        recovered = self.queue.recover()
+        if recovered:
+            utils._log(log.info, "%i interrupted job(s) queued again", recovered)
+
+    def _drain(self):
+        with ThreadPoolExecutor(max_workers=self.jobs) as pool:
+            futures = [pool.submit(self._work) for _ in range(self.jobs)]
+            while wait(futures, timeout=self.queue.lease / 3)[1]:
+                self.queue.renew()
+        return [f.result() for f in futures]
+
+    def _work(self):
+        """Process queued jobs until there are none left (or stopped)."""
+        done = 0
+        while not self._stop.is_set():
+            job = self.queue.claim()
+            if job is None:
+                due = self.queue.next_due()
+                if due is None:
+                    break
+                # Retried later: new jobs are claimed in the meantime
+                self._stop.wait(min(max(due - time.time(), 0), self.poll))
+                continue
+            done += self.process(job)
+        return done
+
+    def run(self, report=None, on_report=None):
+        """Watch the spool directory until :meth:`stop` is called.
+
+        Jobs left ``running`` by a stopped daemon are processed again, once
+        their lease expired.
+
+        Args:
+            report (float, optional): Seconds between reports of
+                :meth:`stats` (logged at the ``INFO`` level).
+            on_report (callable, optional): Called with :meth:`stats` at
+                each report, instead of logging it.
+
+        """
+        self._recover()
+        last_report = last_renew = time.time()
+        with ThreadPoolExecutor(max_workers=self.jobs) as pool:
+            running = set()
+            try:
+                while not self._stop.is_set():
+                    if time.time() - last_renew >= self.queue.lease / 3:
+                        last_renew = time.time()
+                        self.queue.renew()
+                        self._recover()
+                    self.scan()
+                    for f in running:
+                        if f.done() and f.exception() is not None:
+                            utils._log(log.error, "spool worker: %r", f.exception())
+                    running = {f for f in running if not f.done()}
+                    for _ in range(self.jobs - len(running)):
+                        running.add(pool.submit(self._work))
+
+                    if report is not None and time.time() - last_report >= report:
+                        last_report = time.time()
+                        stats = self.stats()
+                        if on_report is not None:
+                            on_report(stats)
+                        else:
+                            utils._log(log.info, "spool: %s", stats)
+                    self._stop.wait(self.poll)
+            finally:
+                # e.g. on KeyboardInterrupt: finish the jobs being processed
+                self._stop.set()
+
+    def stop(self):
+        """Stop :meth:`run` once the jobs being processed are done."""
+        self._stop.set()
+
+    def stats(self):
+        """Queue depth and throughput.
+
+        Returns:
+            dict: The number of ``queued``, ``running``, ``done`` and
+            ``failed`` jobs, and the ``jobs_per_second`` and
+            ``bytes_per_second`` (of input) processed since the daemon
+            started.
+
+        """
+        stats = self.queue.depth()
+        elapsed = max(time.time() - self._started, 1e-9)
+        with self._stats_lock:
+            stats["jobs_per_second"] = self._completed / elapsed
+            stats["bytes_per_second"] = self._bytes / elapsed
+        return stats
+
+    def close(self):
+        """Close the queue."""
+        self.queue.close()
@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+from . import utils
+
+import codecs
+import io
+import logging
+import mmap
+import os
+import stat
+
+__all__ = ["iter_chunks"]
+
+# Logger
+log = logging.getLogger(__name__)
+log.addHandler(logging.NullHandler())
+
+CHUNK_SIZE = 1 << 16
+
+
+def iter_chunks(fp, chunk_size=CHUNK_SIZE):
+    """Read a text file in chunks.
+
+    A regular file is memory-mapped and decoded incrementally, so that only
+    the pages being decoded are resident. Any other file (a pipe, standard
+    input, a ``StringIO``...) is read with ``fp.read(chunk_size)``. Either
+    way, newlines are translated to ``"\\n"``, as in text mode.
+
+    Args:
+        fp (file object): A text file, opened for reading.
+        chunk_size (int): Approximate size of a chunk.
+
+    Returns:
+        generator: The text of ``fp``, in chunks of about ``chunk_size``.
+
+    Example:
+        Read a book with a constant memory use::
+
+            >>> with open("book.txt", encoding="utf-8") as f:
+            ...     tts = NaverTTS(text=iter_chunks(f))
+            ...     for part in tts.stream_to_fp(out):
+            ...         pass
+
+    """
+    fd = _mappable_fileno(fp)
+    if fd is None:
+        utils._log(log.debug, "reading %s in chunks", fp)
+        return iter(lambda: fp.read(chunk_size), "")
+    utils._log(log.debug, "memory-mapping %s", fp)
+    return _iter_mmap(fd, fp.encoding, fp.errors, chunk_size)
+
+
+def _mappable_fileno(fp):
+    """File descriptor of ``fp`` if it's a regular file at its start."""
+    try:
+        fd = fp.fileno()
+        if not stat.S_ISREG(os.fstat(fd).st_mode) or fp.tell() != 0:
+            return None
+        fp.encoding
+    except (AttributeError, OSError, ValueError):
+        return None
+    return fd
+
+
+def _iter_mmap(fd, encoding, errors, chunk_size):
+    size = os.fstat(fd).st_size
+    if not size:
+        return
+
+    decoder = io.IncrementalNewlineDecoder(
+        codecs.getincrementaldecoder(encoding)(errors=errors or "strict"),
+        translate=True,
+    )
+    # Drop pages once decoded (when supported), so they don't count as
+    # resident memory until the whole file is read
+    release = hasattr(mmap, "MADV_DONTNEED") and hasattr(mmap.mmap, "madvise")
+    chunk_size = max(mmap.PAGESIZE, chunk_size - chunk_size % mmap.PAGESIZE)
+
+    mm = mmap.mmap(fd, size, access=mmap.ACCESS_READ)
+    try:
+        for start in range(0, size, chunk_size):
+            end = min(start + chunk_size, size)
+            text = decoder.decode(mm[start:end], final=end == size)
+            if release:
+                mm.madvise(mmap.MADV_DONTNEED, start, end - start)
+            if text:
+                yield text
+    finally:
+        mm.close()
@@ -0,0 +1,192 @@
+# -*- coding: utf-8 -*-
+import collections
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+from urllib.parse import parse_qs, urlsplit
+
+import pytest
+
+from navertts import constants
+from navertts.scheduler import Scheduler, set_scheduler
+from navertts.transport import Transport, set_transport
+
+# MPEG-1 Layer III, 128 kbps, 44.1 kHz, no padding, no CRC: 417-byte frames
+MP3_FRAME_HEADER = b"\xff\xfb\x90\x64"
+MP3_FRAME_SIZE = 417
+
+
+def fake_mp3(text="", frames=4):
+    """Build a small, structurally valid mp3 tagged with ``text``.
+
+    The ID3v2 tag carries ``text`` so that tests can check which part
+    ended up where in the output.
+
+    """
+    payload = text.encode("utf-8")
+    size = len(payload)
+    syncsafe = bytes(
+        [(size >> 21) & 0x7F, (size >> 14) & 0x7F, (size >> 7) & 0x7F, size & 0x7F]
+    )
+    tag = b"ID3\x03\x00\x00" + syncsafe + payload
+    frame = MP3_FRAME_HEADER + b"\x00" * (MP3_FRAME_SIZE - 4)
+    return tag + frame * frames
+
+
+def part_texts(mp3_bytes):
+    """Read back the ``text`` of every :func:`fake_mp3` in ``mp3_bytes``."""
+    texts = []
+    pos = 0
+    while True:
+        pos = mp3_bytes.find(b"ID3\x03\x00\x00", pos)
+        if pos < 0:
+            return texts
+        b = mp3_bytes[pos + 6 : pos + 10]
+        size = (b[0] << 21) | (b[1] << 14) | (b[2] << 7) | b[3]
+        texts.append(mp3_bytes[pos + 10 : pos + 10 + size].decode("utf-8"))
+        pos += 10 + size
+
+
+class _ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+    request_queue_size = 128
+
+    def handle_error(self, request, client_address):
+        # Clients drop the responses they don't want to read to the end
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        server = self.server.mock
+        query = {k: v[0] for k, v in parse_qs(urlsplit(self.path).query).items()}
+        with server.lock:
+            server.hits[self.path] += 1
+            server.active += 1
+            server.max_active = max(server.max_active, server.active)
+        try:
+            delay = server.delay(query) if callable(server.delay) else server.delay
+            if delay:
+                time.sleep(delay)
+            status = server.status(query) if callable(server.status) else server.status
+            if status != 200:
+                self.send_response(status)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            body = server.body(query)
+            content_type = (
+                server.content_type(query)
+                if callable(server.content_type)
+                else server.content_type
+            )
+            self.send_response(200)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        finally:
+            with server.lock:
+                server.active -= 1
+
+
+class MockNaverServer:
+    """Local stand-in for the NAVER TTS endpoint.
+
+    Attributes:
+        hits (collections.Counter): Number of requests per request path.
+        delay (float or callable): Seconds to wait before answering,
+            or a function of the query dict returning it.
+        status (int or callable): HTTP status to answer with,
+            or a function of the query dict returning it.
+        body (callable): Function of the query dict returning the body.
+        content_type (string or callable): Content type of the body,
+            or a function of the query dict returning it.
+        max_active (int): Highest number of concurrently served requests.
+
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.hits = collections.Counter()
+        self.delay = 0
+        self.status = 200
+        self.body = lambda query: fake_mp3(query.get("text", ""))
+        self.content_type = "audio/mpeg"
+        self.active = 0
+        self.max_active = 0
+
+        self.httpd = _ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+        self.httpd.mock = self
+        self.port = self.httpd.server_address[1]
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+
+    @property
+    def endpoint(self):
+        return "http://127.0.0.1:%d/api/nvoice" % self.port
+
+    @property
+    def total_hits(self):
+        with self.lock:
+            return sum(self.hits.values())
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+@pytest.fixture
+def mock_server(monkeypatch):
+    """Run a :class:`MockNaverServer` and point the TTS endpoint at it."""
+    server = MockNaverServer()
+    monkeypatch.setattr(constants, "TRANSLATE_ENDPOINT", server.endpoint)
+    yield server
+    server.close()
+
+
+class OfflineTransport(Transport):
+    """A transport that fails the request, and records its URL.
+
+    Attributes:
+        urls (list): The URL of each request.
+
+    """
+
+    def __init__(self):
+        self.urls = []
+
+    def get(self, url, headers, timeout):
+        self.urls.append(url)
+        raise AssertionError("no request must be sent: {}".format(url))
+
+
+@pytest.fixture
+def offline():
+    """Replace the process-wide transport with an :class:`OfflineTransport`."""
+    transport = OfflineTransport()
+    previous = set_transport(transport)
+    yield transport
+    set_transport(previous)
+
+
+@pytest.fixture
+def scheduler(request):
+    """A process-wide scheduler of its own, with 4 workers.
+
+    Parametrize indirectly for another number of workers, e.g.
+    ``@pytest.mark.parametrize("scheduler", [16], indirect=True)``.
+
+    """
+    sched = Scheduler(max_workers=getattr(request, "param", 4))
+    previous = set_scheduler(sched)
+    yield sched
+    set_scheduler(previous)
+    sched.shutdown()
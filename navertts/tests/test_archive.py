@@ -0,0 +1,141 @@
+# -*- coding: utf-8 -*-
+import io
+import json
+import tarfile
+import zipfile
+
+import pytest
+from click.testing import CliRunner
+
+from navertts.archive import INDEX_NAME, ArchiveWriter, write_archive
+from navertts.cli import archive_cli
+from navertts.transport import FakeTransport
+from navertts.tts import NaverTTS, NaverTTSError, Voice
+from .conftest import fake_mp3, part_texts
+
+TEXTS = ["Item number %d is read out loud right here." % i for i in range(12)]
+
+
+class Pipe:
+    """A sink that can only be written to, like stdout"""
+
+    def __init__(self):
+        self._buf = io.BytesIO()
+
+    def write(self, data):
+        return self._buf.write(data)
+
+    def getvalue(self):
+        return self._buf.getvalue()
+
+
+def members(data, format):
+    """The content of each member of an archive, by name"""
+    if format == "tar":
+        with tarfile.open(fileobj=io.BytesIO(data)) as tar:
+            return {m.name: tar.extractfile(m).read() for m in tar.getmembers()}
+    with zipfile.ZipFile(io.BytesIO(data)) as z:
+        assert z.testzip() is None
+        return {name: z.read(name) for name in z.namelist()}
+
+
+@pytest.fixture
+def fake():
+    return FakeTransport(body=lambda query: fake_mp3(query["text"]))
+
+
+def items(texts, transport):
+    voice = Voice(lang="en")
+    for i, text in enumerate(texts):
+        yield "%d.mp3" % i, NaverTTS(text=text, voice=voice, transport=transport)
+
+
+@pytest.mark.parametrize("format", ["tar", "zip"])
+def test_write_archive(fake, format):
+    sink = Pipe()
+    entries = write_archive(sink, items(TEXTS, fake), format=format, jobs=3)
+    data = sink.getvalue()
+
+    content = members(data, format)
+    assert list(content)[-1] == INDEX_NAME
+    index = json.loads(content.pop(INDEX_NAME).decode("utf-8"))
+    assert index["format"] == format
+    assert index["entries"] == entries
+    assert sorted(content) == sorted("%d.mp3" % i for i in range(len(TEXTS)))
+    for entry in entries:
+        # Straight from the archive, at its offset
+        mp3 = data[entry["offset"] : entry["offset"] + entry["size"]]
+        assert mp3 == content[entry["name"]]
+        assert part_texts(mp3) == [TEXTS[int(entry["name"][:-4])]]
+        assert entry["parts"] == 1 and entry["duration"] > 0
+    assert index["size"] == sum(e["size"] for e in entries)
+
+
+@pytest.mark.parametrize("scheduler", [8], indirect=True)
+def test_completion_order(mock_server, scheduler):
+    """Entries are written as soon as they're complete"""
+    mock_server.delay = lambda query: 0.3 if query["text"] == TEXTS[0] else 0
+    fp = io.BytesIO()
+    entries = write_archive(fp, items(TEXTS[:4], None), jobs=4)
+    assert [e["name"] for e in entries][-1] == "0.mp3"
+
+
+def test_failure(mock_server):
+    """A failed item leaves the archive ended, with the others"""
+    mock_server.status = lambda query: 500 if query["text"] == TEXTS[2] else 200
+    fp = io.BytesIO()
+    with pytest.raises(NaverTTSError):
+        write_archive(fp, items(TEXTS[:4], None), jobs=1)
+    content = members(fp.getvalue(), "tar")
+    index = json.loads(content[INDEX_NAME].decode("utf-8"))
+    assert [e["name"] for e in index["entries"]] == ["0.mp3", "1.mp3"]
+
+
+def test_errors():
+    with pytest.raises(ValueError):
+        ArchiveWriter(io.BytesIO(), format="rar")
+
+    archive = ArchiveWriter(io.BytesIO(), index=False)
+    archive.write("a.mp3", b"mp3")
+    with pytest.raises(ValueError):
+        archive.write("a.mp3", b"mp3")
+    with pytest.raises(ValueError):
+        archive.write(INDEX_NAME, b"{}")
+    archive.close()
+    with pytest.raises(ValueError):
+        archive.write("b.mp3", b"mp3")
+
+
+def test_cli(tmp_path, mock_server):
+    paths = []
+    for i, text in enumerate(TEXTS[:3]):
+        path = tmp_path / ("item%d.txt" % i)
+        path.write_text(text, encoding="utf-8")
+        paths.append(str(path))
+    out = tmp_path / "items.zip"
+    index = tmp_path / "items.json"
+
+    result = CliRunner().invoke(
+        archive_cli, paths + ["--lang", "en", "-o", str(out), "--index", str(index)]
+    )
+    assert result.exit_code == 0, result.output
+    content = members(out.read_bytes(), "zip")
+    assert part_texts(content["item1.mp3"]) == [TEXTS[1]]
+    assert json.loads(index.read_text(encoding="utf-8"))["format"] == "zip"
+
+    # Lines of stdin, to stdout
+    result = CliRunner().invoke(
+        archive_cli, ["--lang", "en"], input="\n".join(TEXTS[:3]) + "\n\n"
+    )
+    assert result.exit_code == 0, result.output
+    content = members(result.stdout_bytes, "tar")
+    assert sorted(content) == ["000000.mp3", "000001.mp3", "000002.mp3", INDEX_NAME]
+    assert part_texts(content["000002.mp3"]) == [TEXTS[2]]
+
+    result = CliRunner().invoke(archive_cli, [paths[0], paths[0]])
+    assert "different names" in result.output
+    assert result.exit_code != 0
+
+
+if __name__ == "__main__":
+    pytest.main(["-x", __file__])
@@ -0,0 +1,172 @@
+# -*- coding: utf-8 -*-
+import io
+import threading
+import time
+from concurrent.futures import Future
+
+import pytest
+
+from navertts.cancel import CancelToken
+from navertts.tts import NaverTTS, NaverTTSCancelled, NaverTTSError, NaverTTSTimeout
+from .conftest import part_texts
+
+TEXT = (
+    "The first part of the text is long enough to be cut in a few parts. "
+    "Then comes the second part. And at last the third part!"
+)
+
+
+def test_token():
+    parent = CancelToken()
+    child = CancelToken(timeout=60, parent=parent)
+    assert not child.cancelled and not child.expired
+    assert parent.remaining() is None
+    assert 59 < child.remaining() <= 60
+
+    parent.cancel("Going away")
+    assert child.cancelled
+    assert child.reason == "Going away"
+
+    assert CancelToken(timeout=0).expired
+    assert CancelToken(parent=CancelToken(timeout=0)).expired
+
+
+def test_wait():
+    token = CancelToken()
+    future = Future()
+    threading.Timer(0.05, future.set_result, (1,)).start()
+    assert token.wait(future)
+
+    future = Future()
+    threading.Timer(0.05, token.cancel).start()
+    start = time.time()
+    assert not token.wait(future)
+    assert time.time() - start < 1
+
+    # Woken up by a parent
+    parent = CancelToken()
+    child = CancelToken(parent=parent)
+    threading.Timer(0.05, parent.cancel).start()
+    assert not child.wait(Future())
+
+    assert not CancelToken(timeout=0.05).wait(Future())
+
+
+def test_wait_leaves_nothing():
+    """Waiting on the same future again and again registers nothing on it"""
+    token = CancelToken(timeout=60)
+    future = Future()
+    for _ in range(100):
+        assert not CancelToken(timeout=0, parent=token).wait(future)
+    threading.Timer(0.05, future.set_result, (1,)).start()
+    assert token.wait(future)
+    assert not future._done_callbacks
+    assert not future._waiters
+
+    # Children made after the parent is cancelled are woken up too
+    token.cancel()
+    assert not CancelToken(parent=token).wait(Future())
+
+
+def test_errors():
+    assert issubclass(NaverTTSTimeout, NaverTTSError)
+    assert issubclass(NaverTTSCancelled, NaverTTSError)
+
+
+def test_read_timeout(mock_server):
+    mock_server.delay = 2
+    start = time.time()
+    with pytest.raises(NaverTTSTimeout):
+        NaverTTS(text="hello", lang="en", timeout=0.2).write_to_fp(io.BytesIO())
+    assert time.time() - start < 1.5
+
+
+def test_timeout_tuple():
+    assert NaverTTS(text="hello").timeout == NaverTTS.NAVER_TTS_TIMEOUT
+    assert NaverTTS(text="hello", timeout=3).timeout == (3, 3)
+    assert NaverTTS(text="hello", timeout=(1, 2)).timeout == (1, 2)
+
+
+def test_deadline(mock_server):
+    mock_server.delay = 0.5
+    start = time.time()
+    with pytest.raises(NaverTTSTimeout):
+        NaverTTS(text=TEXT, lang="en").write_to_fp(io.BytesIO(), deadline=0.2)
+    assert time.time() - start < 0.45
+
+
+def test_deadline_met(mock_server):
+    fp = io.BytesIO()
+    tts = NaverTTS(text=TEXT, lang="en")
+    tts.write_to_fp(fp, deadline=10, cancel=CancelToken())
+    assert part_texts(fp.getvalue()) == tts._tokenize(TEXT)
+
+
+@pytest.mark.parametrize("scheduler", [1], indirect=True)
+def test_cancel(mock_server, scheduler):
+    """Cancelling stops the request in flight and drops the queued ones"""
+    mock_server.delay = 0.5
+    token = CancelToken()
+    threading.Timer(0.1, token.cancel).start()
+    start = time.time()
+    with pytest.raises(NaverTTSCancelled):
+        NaverTTS(text=TEXT, lang="en").write_to_fp(io.BytesIO(), cancel=token)
+    assert time.time() - start < 0.4
+
+    # One worker: only the first part was sent
+    time.sleep(0.6)
+    assert mock_server.total_hits == 1
+    assert scheduler.metrics()["interactive"]["queued"] == 0
+
+
+def test_cancelled_before(mock_server):
+    token = CancelToken()
+    token.cancel()
+    with pytest.raises(NaverTTSCancelled):
+        NaverTTS(text=TEXT, lang="en").write_to_fp(io.BytesIO(), cancel=token)
+    assert mock_server.total_hits == 0
+
+
+def test_cancel_save(mock_server, tmp_path):
+    mock_server.delay = 0.5
+    savefile = str(tmp_path / "out.mp3")
+    token = CancelToken()
+    token.cancel()
+    with pytest.raises(NaverTTSCancelled):
+        NaverTTS(text=TEXT, lang="en").save(savefile, cancel=token)
+    assert not (tmp_path / "out.mp3").exists()
+
+    with pytest.raises(NaverTTSTimeout):
+        NaverTTS(text=TEXT, lang="en").save(savefile, resume=True, deadline=0.1)
+    # Kept to be resumed
+    assert (tmp_path / "out.mp3.part").exists()
+
+
+def test_cancel_not_shared(mock_server):
+    """Cancelling a call doesn't fail another call reading the same text"""
+    mock_server.delay = 0.3
+    token = CancelToken()
+    outcome = {}
+
+    def read(key, cancel):
+        try:
+            NaverTTS(text=TEXT, lang="en").write_to_fp(io.BytesIO(), cancel=cancel)
+            outcome[key] = "done"
+        except NaverTTSCancelled:
+            outcome[key] = "cancelled"
+
+    threads = [
+        threading.Thread(target=read, args=("cancelled", token)),
+        threading.Thread(target=read, args=("other", None)),
+    ]
+    for t in threads:
+        t.start()
+    time.sleep(0.1)
+    token.cancel()
+    for t in threads:
+        t.join()
+    assert outcome == {"cancelled": "cancelled", "other": "done"}
+
+
+if __name__ == "__main__":
+    pytest.main(["-x", __file__])
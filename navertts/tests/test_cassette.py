@@ -0,0 +1,207 @@
+# -*- coding: utf-8 -*-
+import io
+import socket
+import time
+
+import pytest
+
+from navertts import constants
+from navertts.cassette import RecordingTransport, ReplayTransport, read_cassette
+from navertts.transport import ConnectTimeout, FakeTransport, TransportTimeout
+from navertts.tts import NaverTTS, NaverTTSError, NaverTTSTimeout
+from .conftest import fake_mp3, part_texts
+
+TEXT = (
+    "The first part of the text is long enough to be cut in a few parts. "
+    "Then comes the second part. And at last the third part!"
+)
+
+
+def record(path, text=TEXT, **kwargs):
+    """Read ``text`` while recording, return the output"""
+    fp = io.BytesIO()
+    with RecordingTransport(str(path), **kwargs) as recorder:
+        NaverTTS(text=text, lang="en", transport=recorder).write_to_fp(fp)
+    return fp.getvalue()
+
+
+def test_record_replay(tmp_path, mock_server):
+    cassette = tmp_path / "run.cassette"
+    recorded = record(cassette)
+    parts = NaverTTS(text=TEXT, lang="en")._tokenize(TEXT)
+    assert part_texts(recorded) == parts
+    hits = mock_server.total_hits
+
+    interactions = read_cassette(str(cassette))
+    assert len(interactions) == len(parts)
+    # In the order the responses came in
+    assert sorted(b for _, b in interactions) == sorted(fake_mp3(p) for p in parts)
+    for entry, body in interactions:
+        assert entry["status"] == 200
+        assert entry["content_type"] == "audio/mpeg"
+        assert entry["size"] == len(body)
+        assert "speaker=danna" in entry["query"]
+        assert entry["latency"] > 0
+    # Compact: the bodies, plus a line per interaction
+    overhead = cassette.stat().st_size - sum(len(b) for _, b in interactions)
+    assert overhead < 250 * (len(parts) + 1)
+
+    mock_server.close()
+    replay = ReplayTransport(str(cassette), latency=0)
+    assert len(replay) == len(parts)
+    fp = io.BytesIO()
+    NaverTTS(text=TEXT, lang="en", transport=replay).write_to_fp(fp)
+    assert fp.getvalue() == recorded
+    assert mock_server.total_hits == hits
+    assert replay.misses == 0
+
+
+@pytest.mark.parametrize("latency", [0, 0.5, 1])
+def test_replay_latency(tmp_path, mock_server, latency):
+    cassette = tmp_path / "run.cassette"
+    mock_server.delay = 0.3
+    record(cassette, text="test")
+
+    replay = ReplayTransport(str(cassette), latency=latency)
+    start = time.perf_counter()
+    NaverTTS(text="test", lang="en", transport=replay).write_to_fp(io.BytesIO())
+    elapsed = time.perf_counter() - start
+    assert 0.3 * latency <= elapsed < 0.3 * latency + 0.1
+
+
+def test_replay_latency_over_timeout(tmp_path, mock_server):
+    """A recorded latency over the read timeout is replayed as a timeout"""
+    cassette = tmp_path / "run.cassette"
+    mock_server.delay = 0.5
+    record(cassette, text="test")
+
+    replay = ReplayTransport(str(cassette), latency=1)
+    start = time.perf_counter()
+    with pytest.raises(NaverTTSTimeout):
+        tts = NaverTTS(text="test", lang="en", timeout=0.1, transport=replay)
+        tts.write_to_fp(io.BytesIO())
+    assert time.perf_counter() - start < 0.4
+
+    # Within the timeout, or at a lower latency, it's served
+    for latency, timeout in ((1, 5), (0.1, 0.1)):
+        replay = ReplayTransport(str(cassette), latency=latency)
+        tts = NaverTTS(text="test", lang="en", timeout=timeout, transport=replay)
+        fp = io.BytesIO()
+        tts.write_to_fp(fp)
+        assert part_texts(fp.getvalue()) == ["test"]
+
+
+def test_replay_in_order(tmp_path):
+    """The same request recorded twice is replayed in order, then the last"""
+    cassette = tmp_path / "run.cassette"
+    bodies = iter([fake_mp3("first"), fake_mp3("second")])
+    fake = FakeTransport(body=lambda query: next(bodies))
+    with RecordingTransport(str(cassette), transport=fake) as recorder:
+        for _ in range(2):
+            NaverTTS(text="test", transport=recorder).write_to_fp(io.BytesIO())
+
+    replay = ReplayTransport(str(cassette), latency=0)
+    texts = []
+    for _ in range(3):
+        fp = io.BytesIO()
+        NaverTTS(text="test", transport=replay).write_to_fp(fp)
+        texts += part_texts(fp.getvalue())
+    assert texts == ["first", "second", "second"]
+
+
+def test_replay_errors(tmp_path, mock_server, monkeypatch):
+    cassette = tmp_path / "run.cassette"
+    mock_server.status = 503
+    with pytest.raises(NaverTTSError):
+        record(cassette, text="test")
+
+    s = socket.socket()
+    s.bind(("127.0.0.1", 0))
+    dead = "http://127.0.0.1:%d/api/nvoice" % s.getsockname()[1]
+    s.close()
+    monkeypatch.setattr(constants, "TRANSLATE_ENDPOINT", dead)
+    with RecordingTransport(str(cassette)) as recorder:
+        with pytest.raises(NaverTTSError):
+            NaverTTS(text="other", transport=recorder).write_to_fp(io.BytesIO())
+    ((entry, body),) = read_cassette(str(cassette))
+    assert entry["error"] == "connect" and body == b""
+
+    replay = ReplayTransport(str(cassette), latency=0)
+    with pytest.raises(NaverTTSError) as e:
+        NaverTTS(text="other", transport=replay).write_to_fp(io.BytesIO())
+    assert "Failed to connect" in str(e.value)
+
+
+def test_replay_timeout(tmp_path):
+    cassette = tmp_path / "run.cassette"
+
+    class Timeouts(FakeTransport):
+        def get(self, *args):
+            raise TransportTimeout("Read timed out")
+
+    with RecordingTransport(str(cassette), transport=Timeouts()) as recorder:
+        with pytest.raises(NaverTTSError):
+            NaverTTS(text="test", transport=recorder).write_to_fp(io.BytesIO())
+    with pytest.raises(NaverTTSError) as e:
+        replay = ReplayTransport(str(cassette), latency=0)
+        NaverTTS(text="test", transport=replay).write_to_fp(io.BytesIO())
+    assert "timed out" in str(e.value)
+
+
+def test_replay_connect_timeout(tmp_path):
+    """A connect timeout is replayed as such, not as a connection error"""
+    cassette = tmp_path / "run.cassette"
+
+    class Timeouts(FakeTransport):
+        def get(self, *args):
+            raise ConnectTimeout("Connection timed out")
+
+    with RecordingTransport(str(cassette), transport=Timeouts()) as recorder:
+        with pytest.raises(NaverTTSTimeout):
+            NaverTTS(text="test", transport=recorder).write_to_fp(io.BytesIO())
+    ((entry, body),) = read_cassette(str(cassette))
+    assert entry["error"] == "connect_timeout"
+
+    replay = ReplayTransport(str(cassette), latency=0)
+    with pytest.raises(ConnectTimeout):
+        replay.get(constants.TRANSLATE_ENDPOINT + "?" + entry["query"], {}, 1)
+    replay = ReplayTransport(str(cassette), latency=0)
+    with pytest.raises(NaverTTSTimeout) as e:
+        NaverTTS(text="test", transport=replay).write_to_fp(io.BytesIO())
+    assert "timed out" in str(e.value)
+
+
+def test_replay_miss(tmp_path):
+    cassette = tmp_path / "run.cassette"
+    with RecordingTransport(str(cassette), transport=FakeTransport()) as recorder:
+        NaverTTS(text="test", transport=recorder).write_to_fp(io.BytesIO())
+
+    replay = ReplayTransport(str(cassette), latency=0)
+    with pytest.raises(NaverTTSError) as e:
+        NaverTTS(text="other", transport=replay).write_to_fp(io.BytesIO())
+    assert "404 (Not in cassette)" in str(e.value)
+    assert replay.misses == 1
+
+
+def test_bad_cassette(tmp_path):
+    path = tmp_path / "not.cassette"
+    path.write_bytes(b"ID3\x03\x00")
+    with pytest.raises(ValueError):
+        ReplayTransport(str(path))
+    with pytest.raises(ValueError):
+        ReplayTransport(str(path), latency=-1)
+
+
+def test_truncated(tmp_path):
+    """Interactions cut short (e.g. a killed recording) are left out"""
+    cassette = tmp_path / "run.cassette"
+    with RecordingTransport(str(cassette), transport=FakeTransport()) as recorder:
+        for text in ("one", "two"):
+            NaverTTS(text=text, transport=recorder).write_to_fp(io.BytesIO())
+    data = cassette.read_bytes()
+    cassette.write_bytes(data[:-10])
+    assert len(read_cassette(str(cassette))) == 1
+
+
+if __name__ == "__main__":
+    pytest.main(["-x", __file__])
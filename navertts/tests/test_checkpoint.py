@@ -0,0 +1,153 @@
+# -*- coding: utf-8 -*-
+import io
+import json
+import os
+
+import pytest
+
+from navertts.tts import NaverTTS, NaverTTSError
+from .conftest import part_texts
+
+TEXT = (
+    "This is the first part of the text and it is long enough to be cut. "
+    "The second part comes next. The third part is the one that fails! "
+    "The fourth part is after it. And the fifth part is the last one."
+)
+
+
+def fail_on(mock_server, word):
+    """Answer 500 to parts containing ``word``"""
+    mock_server.status = lambda query: 500 if word in query["text"] else 200
+
+
+def hits_by_text(mock_server, text):
+    return sum(n for path, n in mock_server.hits.items() if text in path)
+
+
+@pytest.fixture
+def savefile(tmp_path):
+    return str(tmp_path / "out.mp3")
+
+
+def test_resume_after_failure(mock_server, savefile):
+    tts = NaverTTS(text=TEXT, lang="en")
+    expected = tts._tokenize(TEXT)
+    assert len(expected) == 5
+
+    fail_on(mock_server, "third")
+    with pytest.raises(NaverTTSError):
+        tts.save(savefile, resume=True)
+    # Partial output kept, nothing at savefile
+    assert not os.path.exists(savefile)
+    assert part_texts(open(savefile + ".part", "rb").read()) == expected[:2]
+    assert os.path.exists(savefile + ".manifest")
+
+    mock_server.status = 200
+    hits = dict(mock_server.hits)
+    tts.save(savefile, resume=True)
+
+    assert part_texts(open(savefile, "rb").read()) == expected
+    assert not os.path.exists(savefile + ".part")
+    assert not os.path.exists(savefile + ".manifest")
+    # The first two parts weren't fetched again
+    for path in hits:
+        if "first" in path or "second" in path:
+            assert mock_server.hits[path] == hits[path]
+
+
+def test_same_as_write_to_fp(mock_server, savefile):
+    tts = NaverTTS(text=TEXT, lang="en")
+    fp = io.BytesIO()
+    tts.write_to_fp(fp)
+    tts.save(savefile, resume=True)
+    assert open(savefile, "rb").read() == fp.getvalue()
+
+
+def test_changed_text(mock_server, savefile):
+    """Resumes from the first part that changed"""
+    fail_on(mock_server, "fifth")
+    with pytest.raises(NaverTTSError):
+        NaverTTS(text=TEXT, lang="en").save(savefile, resume=True)
+
+    mock_server.status = 200
+    text = TEXT.replace("third", "3rd")
+    tts = NaverTTS(text=text, lang="en")
+    tts.save(savefile, resume=True)
+
+    assert part_texts(open(savefile, "rb").read()) == tts._tokenize(text)
+    assert hits_by_text(mock_server, "first") == 1
+    assert hits_by_text(mock_server, "second") == 1
+    assert hits_by_text(mock_server, "3rd") == 1
+
+
+def test_other_voice(mock_server, savefile):
+    """Starts over with another voice"""
+    fail_on(mock_server, "fifth")
+    with pytest.raises(NaverTTSError):
+        NaverTTS(text=TEXT, lang="en").save(savefile, resume=True)
+
+    mock_server.status = 200
+    NaverTTS(text=TEXT, lang="en", speed="slow").save(savefile, resume=True)
+    assert hits_by_text(mock_server, "first") == 2
+
+
+def test_truncated_partial_and_manifest(mock_server, savefile):
+    """Parts missing from the partial output, or half-recorded, are fetched again"""
+    fail_on(mock_server, "fifth")
+    tts = NaverTTS(text=TEXT, lang="en")
+    with pytest.raises(NaverTTSError):
+        tts.save(savefile, resume=True)
+
+    # Lose the end of the partial output, and half a manifest line
+    with open(savefile + ".part", "r+b") as f:
+        f.truncate(os.path.getsize(savefile + ".part") - 10)
+    with open(savefile + ".manifest", "a") as f:
+        f.write('{"size": 12')
+
+    mock_server.status = 200
+    tts.save(savefile, resume=True)
+    assert part_texts(open(savefile, "rb").read()) == tts._tokenize(TEXT)
+    assert hits_by_text(mock_server, "first") == 1
+    assert hits_by_text(mock_server, "fourth") == 2
+
+
+def test_streamed_text(mock_server, savefile):
+    fail_on(mock_server, "third")
+    with pytest.raises(NaverTTSError):
+        NaverTTS(text=iter([TEXT[:80], TEXT[80:]]), lang="en").save(
+            savefile, resume=True
+        )
+
+    mock_server.status = 200
+    NaverTTS(text=iter([TEXT]), lang="en").save(savefile, resume=True)
+    expected = NaverTTS(text=TEXT, lang="en")._tokenize(TEXT)
+    assert part_texts(open(savefile, "rb").read()) == expected
+    assert hits_by_text(mock_server, "first") == 1
+
+
+def test_resumed_index(mock_server, savefile, tmp_path):
+    """The index of a resumed save covers the parts of previous runs"""
+    expected = NaverTTS(text=TEXT, lang="en").save(str(tmp_path / "expected.mp3"))
+
+    fail_on(mock_server, "third")
+    tts = NaverTTS(text=TEXT, lang="en")
+    with pytest.raises(NaverTTSError):
+        tts.save(savefile, resume=True)
+    mock_server.status = 200
+    index = str(tmp_path / "index.json")
+    parts = tts.save(savefile, resume=True, index=index)
+
+    assert parts == expected
+    with open(index, encoding="utf-8") as f:
+        assert json.load(f)["parts"] == expected
+    assert hits_by_text(mock_server, "first") == 2
+
+
+def test_no_text(savefile):
+    with pytest.raises(AssertionError):
+        NaverTTS(text=" ... ").save(savefile, resume=True)
+    assert not os.listdir(os.path.dirname(savefile))
+
+
+if __name__ == "__main__":
+    pytest.main(["-x", __file__])
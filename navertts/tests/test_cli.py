@@ -1,4 +1,5 @@
 # -*- coding: utf-8 -*-
+import json
 import pytest
 import re
 import os
@@ -244,5 +245,169 @@ def test_file(tmp_path):
     assert result.exit_code == 0
 
 
+def test_stream(tmp_path, mock_server):
+    """--stream reads <file> or stdin in chunks, with the same result"""
+    filename = tmp_path / "out.mp3"
+    result = runner(["--file", textfile_utf8, "--output", str(filename)])
+    assert result.exit_code == 0
+    expected = filename.read_bytes()
+
+    result = runner(["--stream", "--file", textfile_utf8, "--output", str(filename)])
+    assert result.exit_code == 0
+    assert filename.read_bytes() == expected
+
+    with open(textfile_utf8, encoding="utf-8") as f:
+        result = runner(["--stream", "--output", str(filename)], f.read())
+    assert result.exit_code == 0
+    assert filename.read_bytes() == expected
+
+
+def test_stream_empty(tmp_path):
+    filename = tmp_path / "text_empty.txt"
+    filename.touch()
+
+    result = runner(["--stream", "--file", str(filename)])
+
+    assert "No text to send" in result.output
+    assert result.exit_code != 0
+
+
+def test_index(tmp_path, mock_server):
+    """--index writes the offset of each part in <output>"""
+    filename = tmp_path / "out.mp3"
+    index = tmp_path / "out.json"
+    result = runner(
+        ["--file", textfile_utf8, "--output", str(filename), "--index", str(index)]
+    )
+    assert result.exit_code == 0
+
+    parts = json.loads(index.read_text(encoding="utf-8"))["parts"]
+    assert len(parts) > 0
+    assert sum(p["size"] for p in parts) == filename.stat().st_size
+    assert [p["offset"] for p in parts[1:]] == [
+        p["offset"] + p["size"] for p in parts[:-1]
+    ]
+
+
+def test_variants(tmp_path, mock_server):
+    """--variant writes each voice to its own file, and prints its timing"""
+    female = str(tmp_path / "f.mp3")
+    male = str(tmp_path / "m.mp3")
+    result = runner(
+        [
+            "--file",
+            textfile_utf8,
+            "--variant",
+            "f=" + female,
+            "--variant",
+            "m:slow=" + male,
+        ]
+    )
+    assert result.exit_code == 0
+
+    timings = [json.loads(line) for line in result.output.splitlines()]
+    assert [t["output"] for t in timings] == [female, male]
+    assert [t["speaker"] for t in timings] == ["kyuri", "jinho"]
+    assert [t["speed"] for t in timings] == [0, 5]
+    for t in timings:
+        assert os.path.getsize(t["output"]) == t["size"] > 0
+
+
+def test_variants_bad_usage(tmp_path):
+    result = runner(["--variant", "m:slow", "test"])
+    assert "<gender>[:<speed>]=<file>" in result.output
+    assert result.exit_code != 0
+
+    result = runner(["--variant", "m=out.mp3", "--plan", "test"])
+    assert "--variant can't be used together" in result.output
+    assert result.exit_code != 0
+
+
+@pytest.mark.parametrize("args", [["--variant", "m:foo=out.mp3"], ["--speed", "foo"]])
+def test_bad_speed(args):
+    """A speed that's not a number is a usage error, not a crash"""
+    result = runner(args + ["test"])
+    assert result.exit_code == 2
+    assert "'foo' not in list of supported speeds" in result.output
+    assert "Traceback" not in result.output
+    assert not isinstance(result.exception, ValueError)
+
+
+def test_plan(offline):
+    """--plan prints the requests as JSON, without sending them"""
+    result = runner(["--plan", "--file", textfile_utf8])
+    assert result.exit_code == 0
+
+    plan = json.loads(result.output)
+    assert plan["requests"] == len(plan["parts"]) > 0
+    assert plan["voices"][0]["lang"] == "ko"
+    assert all(p["url"].startswith("https://") for p in plan["parts"])
+    assert offline.urls == []
+
+    # Without --plan, the same run goes through the offline transport
+    result = runner(["--file", textfile_utf8, "--output", os.devnull])
+    assert result.exit_code != 0
+    assert offline.urls
+
+
+def test_record_replay(tmp_path, mock_server):
+    """--replay reads from a cassette made with --record, offline"""
+    cassette = str(tmp_path / "run.cassette")
+    recorded = tmp_path / "recorded.mp3"
+    replayed = tmp_path / "replayed.mp3"
+    result = runner(
+        ["--file", textfile_utf8, "--output", str(recorded), "--record", cassette]
+    )
+    assert result.exit_code == 0
+    hits = mock_server.total_hits
+
+    result = runner(
+        [
+            "--file",
+            textfile_utf8,
+            "--output",
+            str(replayed),
+            "--replay",
+            cassette,
+            "--replay-latency",
+            "0",
+        ]
+    )
+    assert result.exit_code == 0
+    assert replayed.read_bytes() == recorded.read_bytes()
+    assert mock_server.total_hits == hits
+
+
+def test_record_replay_bad_usage(tmp_path):
+    cassette = tmp_path / "run.cassette"
+    cassette.write_bytes(b"not a cassette")
+    result = runner(["--record", str(tmp_path / "x"), "--replay", str(cassette), "hi"])
+    assert "can't be used together" in result.output
+    assert result.exit_code != 0
+
+    result = runner(["--replay", str(cassette), "hi"])
+    assert "is not a cassette" in result.output
+    assert result.exit_code != 0
+
+
+def test_profile(tmp_path, mock_server):
+    """--profile prints where the time went, on stderr"""
+    output = tmp_path / "out.mp3"
+    stats = str(tmp_path / "run.pstats")
+    result = runner(
+        ["--file", textfile_utf8, "--output", str(output), "--profile-output", stats]
+    )
+    assert result.exit_code == 0
+    for phase in ["startup", "pre-processing", "tokenizing", "ttfb", "body", "write"]:
+        assert re.search(r"^%s +[0-9.]+ +[0-9]+$" % phase, result.output, re.M)
+    assert "cumulative" in result.output
+    assert os.path.getsize(stats) > 0
+
+    # Nothing without it
+    result = runner(["--file", textfile_utf8, "--output", str(output)])
+    assert result.exit_code == 0
+    assert "tokenizing" not in result.output
+
+
 if __name__ == "__main__":
     pytest.main(["-x", __file__])
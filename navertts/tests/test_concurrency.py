@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+import pytest
+
+from navertts import constants
+from navertts.concurrency import AIMDLimit
+from navertts.scheduler import Scheduler
+from navertts.tts import NaverTTS, NaverTTSError
+
+
+def _success(limit, latency):
+    start = limit.start()
+    limit.on_success(start - latency)
+
+
+def _window(limit, latency):
+    """As many concurrent successes as the limit allows"""
+    starts = [limit.start() for _ in range(limit.limit)]
+    for start in starts:
+        limit.on_success(start - latency)
+
+
+def test_additive_increase():
+    """The limit grows while fully used with a stable latency"""
+    limit = AIMDLimit(initial=4, max_limit=10)
+    _window(limit, 0.01)
+    assert limit.limit == 4
+    for _ in range(10):
+        _window(limit, 0.01)
+    assert 6 <= limit.limit <= 10
+
+
+def test_no_increase_when_unused():
+    """The limit doesn't grow while far fewer requests are in flight"""
+    limit = AIMDLimit(initial=10, max_limit=20)
+    for _ in range(100):
+        _success(limit, 0.01)
+    assert limit.limit == 10
+
+
+def test_max_limit():
+    limit = AIMDLimit(initial=1, max_limit=3)
+    for _ in range(100):
+        _window(limit, 0.01)
+    assert limit.limit == 3
+
+
+def test_multiplicative_decrease_on_drop():
+    """Drops halve the limit, once per round-trip"""
+    limit = AIMDLimit(initial=16, min_limit=2)
+    _success(limit, 10)
+    limit.on_drop(limit.start())
+    assert limit.limit == 8
+    # Same window: ignored
+    limit.on_drop(limit.start())
+    assert limit.limit == 8
+    assert limit.drops == 2
+    assert limit.inflight == 0
+
+
+def test_min_limit():
+    limit = AIMDLimit(initial=4, min_limit=2)
+    for _ in range(5):
+        limit.on_drop(limit.start())
+    assert limit.limit == 2
+
+
+def test_decrease_on_latency_spike():
+    limit = AIMDLimit(initial=8, tolerance=2.0)
+    _success(limit, 0.01)
+    _success(limit, 0.05)
+    assert limit.limit == 4
+    assert limit.spikes == 1
+
+
+def test_bad_params():
+    with pytest.raises(ValueError):
+        AIMDLimit(backoff=1)
+    with pytest.raises(ValueError):
+        AIMDLimit(initial=0, min_limit=1)
+
+
+def _load(mock_server, limiter, n):
+    """Fetch ``n`` distinct parts through a scheduler driven by ``limiter``"""
+    sched = Scheduler(max_workers=32, limiter=limiter)
+    tts = NaverTTS(text="load")
+    futures = []
+    for i in range(n):
+        url = constants.translate_endpoint(text="part %d" % i, speaker=tts.speaker)
+        futures.append(sched.submit(tts._request_part, i, url, limiter))
+    errors = 0
+    for f in futures:
+        try:
+            f.result()
+        except NaverTTSError:
+            errors += 1
+    sched.shutdown()
+    return errors
+
+
+def test_grows_while_latency_is_stable(mock_server):
+    """With a fast, stable upstream the limit climbs to its maximum"""
+    mock_server.delay = 0.01
+    limiter = AIMDLimit(initial=1, max_limit=16)
+    assert _load(mock_server, limiter, 400) == 0
+    assert limiter.limit == 16
+    assert mock_server.max_active > 8
+
+
+def test_backs_off_when_throttled(mock_server):
+    """The limit settles around the capacity of a throttling upstream"""
+    capacity = 4
+
+    def delay(query):
+        # Latency rises with load
+        return 0.01 * mock_server.active
+
+    def status(query):
+        return 429 if mock_server.active > capacity else 200
+
+    mock_server.delay = delay
+    mock_server.status = status
+    limiter = AIMDLimit(initial=1, max_limit=32)
+    errors = _load(mock_server, limiter, 400)
+
+    assert 1 < limiter.limit <= 2 * capacity
+    assert limiter.drops + limiter.spikes > 0
+    assert errors < 400 * 0.2
+
+
+if __name__ == "__main__":
+    pytest.main(["-x", __file__])
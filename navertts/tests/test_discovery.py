@@ -0,0 +1,175 @@
+# -*- coding: utf-8 -*-
+import json
+import os
+import time
+
+import pytest
+from click.testing import CliRunner
+
+from navertts import constants
+from navertts.cli import tts_cli
+from navertts.discovery import BUILTIN, Discovery, get_discovery, set_discovery
+from navertts.lang import tts_langs, tts_speakers
+from navertts.tts import Voice
+from .conftest import MockNaverServer
+
+VOICES = {
+    "languages": {"fr": "French", "en": "English (US)"},
+    "speakers": {"fr": {"f": "amelie", "m": "louis"}, "en": {"f": "clara"}},
+}
+
+
+@pytest.fixture
+def stub(monkeypatch):
+    """A local discovery endpoint"""
+    server = MockNaverServer()
+    server.body = lambda query: json.dumps(VOICES).encode("utf-8")
+    monkeypatch.setattr(
+        constants,
+        "DISCOVERY_ENDPOINT",
+        "http://127.0.0.1:%d/voices?tld={tld}" % server.port,
+    )
+    yield server
+    server.close()
+
+
+@pytest.fixture
+def discovery(tmp_path):
+    discovery = Discovery(directory=str(tmp_path))
+    previous = set_discovery(discovery)
+    yield discovery
+    discovery.join()
+    set_discovery(previous)
+
+
+def test_disabled(discovery):
+    """Without an endpoint, only the built-in tables are used"""
+    assert constants.DISCOVERY_ENDPOINT is None
+    assert discovery.tables("com") is BUILTIN
+    assert tts_langs() == constants.LANGUAGES
+    assert tts_speakers() == constants.SPEAKERS
+    assert discovery.refresh("com") is BUILTIN
+
+
+def test_background_refresh(stub, discovery):
+    """Lookups don't wait for discovery"""
+    stub.delay = 0.5
+    start = time.time()
+    assert "fr" not in tts_langs()
+    assert time.time() - start < 0.25
+    discovery.join()
+
+    langs = tts_langs()
+    assert langs["fr"] == "French"
+    assert langs["en"] == "English (US)"
+    # Built-in languages are kept
+    assert langs["ko"] == "Korean"
+    assert stub.total_hits == 1
+
+    voice = Voice(lang="fr", gender="m")
+    assert voice.speaker == "louis"
+    assert Voice(lang="en").speaker == "clara"
+    assert Voice(lang="en", gender="m").speaker == "matt"
+
+
+def test_single_refresh(stub, discovery):
+    """Only one refresh runs at a time"""
+    stub.delay = 0.2
+    for _ in range(20):
+        discovery.tables("com")
+    discovery.join()
+    assert stub.total_hits == 1
+    # One per tld
+    discovery.tables("jp")
+    discovery.join()
+    assert stub.total_hits == 2
+    assert stub.hits["/voices?tld=jp"] == 1
+
+
+def test_disk_cache(stub, discovery, tmp_path):
+    discovery.refresh("com")
+    assert os.path.exists(str(tmp_path / "com.json"))
+
+    # Another process
+    other = Discovery(directory=str(tmp_path))
+    assert other.tables("com").langs["fr"] == "French"
+    other.join()
+    assert stub.total_hits == 1
+
+
+def test_default_directory(stub, tmp_path, monkeypatch):
+    """Tables are cached in a directory of the user, only readable by them"""
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "cache"))
+    discovery = Discovery()
+    assert discovery.directory == str(tmp_path / "cache" / "navertts" / "discovery")
+    discovery.refresh("com")
+    assert os.stat(discovery.directory).st_mode & 0o777 == 0o700
+    assert os.stat(discovery._path("com")).st_mode & 0o777 == 0o600
+
+
+def test_untrusted_cache(stub, discovery, tmp_path):
+    """Tables that someone else could have written aren't read"""
+    discovery.refresh("com")
+    os.chmod(str(tmp_path / "com.json"), 0o666)
+    other = Discovery(directory=str(tmp_path))
+    assert other.tables("com") is BUILTIN
+    other.join()
+    assert stub.total_hits == 2
+
+
+def test_ttl(stub, discovery, tmp_path):
+    discovery.refresh("com")
+    discovery.tables("com")
+    assert stub.total_hits == 1
+
+    expired = Discovery(directory=str(tmp_path), ttl=0)
+    # Stale tables are used while they're refreshed
+    assert expired.tables("com").langs["fr"] == "French"
+    expired.join()
+    assert stub.total_hits == 2
+
+
+def test_other_endpoint(stub, discovery, monkeypatch):
+    """Tables cached from another endpoint are not used"""
+    discovery.refresh("com")
+    monkeypatch.setattr(
+        constants, "DISCOVERY_ENDPOINT", constants.DISCOVERY_ENDPOINT + "&v=2"
+    )
+    assert "fr" not in Discovery(directory=discovery.directory).tables("com").langs
+
+
+def test_failure(stub, discovery):
+    """Failed discoveries fall back to the last known tables, and are retried later"""
+    stub.status = 500
+    with pytest.raises(RuntimeError):
+        discovery.refresh("com")
+
+    assert discovery.tables("com") is BUILTIN
+    discovery.join()
+    assert discovery.tables("com") is BUILTIN
+    discovery.join()
+    assert stub.total_hits == 2
+
+    stub.status = 200
+    stub.body = lambda query: b"not json"
+    with pytest.raises(RuntimeError):
+        discovery.refresh("com")
+
+
+def test_cli(stub, discovery):
+    """The CLI validates <lang> against discovered languages"""
+    discovery.refresh("com")
+    result = CliRunner().invoke(tts_cli, ["--all"])
+    assert "fr: French" in result.output
+
+    result = CliRunner().invoke(tts_cli, ["--plan", "--lang", "fr", "Bonjour"])
+    assert result.exit_code == 0
+    assert json.loads(result.output)["voices"][0]["speaker"] == "amelie"
+
+
+def test_process_wide():
+    assert isinstance(get_discovery(), Discovery)
+
+
+if __name__ == "__main__":
+    pytest.main(["-x", __file__])
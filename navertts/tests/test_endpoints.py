@@ -0,0 +1,180 @@
+# -*- coding: utf-8 -*-
+import io
+import socket
+import time
+
+import pytest
+
+from navertts import constants, endpoints
+from navertts.endpoints import Endpoint, EndpointPool
+from navertts.tts import NaverTTS, NaverTTSError
+from .conftest import MockNaverServer, part_texts
+
+TEXT = " ".join("Sentence number %d is right here." % i for i in range(6))
+
+
+@pytest.fixture
+def servers():
+    """Two local stand-ins for the NAVER TTS endpoint"""
+    stubs = [MockNaverServer(), MockNaverServer()]
+    yield stubs
+    for stub in stubs:
+        stub.close()
+
+
+@pytest.fixture
+def dead_endpoint():
+    """The endpoint of a port nothing listens on"""
+    s = socket.socket()
+    s.bind(("127.0.0.1", 0))
+    port = s.getsockname()[1]
+    s.close()
+    return "http://127.0.0.1:%d/api/nvoice" % port
+
+
+@pytest.fixture
+def endpoint_pool(monkeypatch):
+    """Install a process-wide endpoint pool for the test"""
+
+    def install(pool):
+        monkeypatch.setattr(endpoints, "_endpoint_pool", pool)
+        return pool
+
+    return install
+
+
+def test_rewrite():
+    endpoint = Endpoint("http://tts-1.example.{tld}/api/nvoice")
+    url = constants.translate_endpoint(text="hi", speaker="danna", tld="co.kr")
+    assert endpoint.rewrite(url, "co.kr") == (
+        "http://tts-1.example.co.kr/api/nvoice?service=dictionary&speech_fmt=mp3"
+        "&text=hi&speaker=danna&speed=0"
+    )
+    with pytest.raises(ValueError):
+        endpoint.rewrite("http://elsewhere.com/api?text=hi", "com")
+
+
+def test_bad_params():
+    with pytest.raises(ValueError):
+        EndpointPool([])
+    with pytest.raises(ValueError):
+        EndpointPool(["a"], strategy="random")
+    with pytest.raises(ValueError):
+        EndpointPool([("a", 0)])
+
+
+def test_weighted_round_robin():
+    pool = EndpointPool([("a", 2), "b"])
+    picks = []
+    for _ in range(9):
+        endpoint = pool.acquire()
+        picks.append(endpoint.template)
+        pool.release(endpoint, True)
+    assert picks.count("a") == 6 and picks.count("b") == 3
+    # Smooth: never more than twice in a row
+    assert "aaa" not in "".join(picks)
+
+
+def test_least_outstanding():
+    pool = EndpointPool(["a", "b", ("c", 2)], strategy=EndpointPool.LEAST_OUTSTANDING)
+    held = [pool.acquire() for _ in range(4)]
+    assert sorted(e.template for e in held) == ["a", "b", "c", "c"]
+
+    pool.release(held[0], True)
+    assert pool.acquire() is held[0]
+    assert [e.outstanding for e in pool.endpoints] == [1, 1, 2]
+
+
+def test_exclude():
+    pool = EndpointPool(["a", "b"])
+    a = pool.acquire()
+    b = pool.acquire([a])
+    assert b is not a
+    assert pool.acquire([a, b]) is None
+
+
+def test_health():
+    pool = EndpointPool(["a", "b"], max_failures=2, cooldown=0.2)
+    a, b = pool.endpoints
+    for _ in range(2):
+        pool.acquire([b])
+        pool.release(a, False)
+    assert a.failures == 2 and a.down_until > 0
+    assert all(pool.acquire() is b for _ in range(3))
+
+    # Every endpoint down: the one back the soonest
+    pool.acquire([a])
+    pool.release(b, False)
+    pool.acquire([a])
+    pool.release(b, False)
+    assert pool.acquire() is a
+    pool.release(a, None)
+
+    time.sleep(0.2)
+    assert {pool.acquire().template for _ in range(2)} == {"a", "b"}
+    pool.release(a, True)
+    assert a.failures == 0 and a.down_until == 0
+    assert pool.to_dict()["endpoints"][0]["down"] == 0
+
+
+def test_spread(servers, endpoint_pool):
+    endpoint_pool(EndpointPool([s.endpoint for s in servers]))
+    tts = NaverTTS(text=TEXT, lang="en")
+    fp = io.BytesIO()
+    tts.write_to_fp(fp)
+    assert part_texts(fp.getvalue()) == tts._tokenize(TEXT)
+    assert [s.total_hits for s in servers] == [3, 3]
+
+
+def test_failover(servers, dead_endpoint, endpoint_pool):
+    pool = endpoint_pool(EndpointPool([dead_endpoint, servers[0].endpoint]))
+    tts = NaverTTS(text=TEXT, lang="en")
+    fp = io.BytesIO()
+    tts.write_to_fp(fp)
+    assert part_texts(fp.getvalue()) == tts._tokenize(TEXT)
+    assert servers[0].total_hits == 6
+
+    dead, live = pool.endpoints
+    assert dead.failures >= pool.max_failures and dead.down_until > 0
+    assert live.failures == 0
+    assert dead.outstanding == live.outstanding == 0
+
+
+def test_all_unreachable(dead_endpoint, endpoint_pool):
+    pool = endpoint_pool(EndpointPool([dead_endpoint, dead_endpoint]))
+    with pytest.raises(NaverTTSError) as e:
+        NaverTTS(text="test", lang="en").write_to_fp(io.BytesIO())
+    assert "Failed to connect" in str(e.value)
+    assert [e.requests for e in pool.endpoints] == [1, 1]
+
+
+def test_no_failover_on_error(servers, endpoint_pool):
+    """Hosts that answer with an error count as failing, without failover"""
+    servers[0].status = 500
+    pool = endpoint_pool(EndpointPool([s.endpoint for s in servers]))
+    with pytest.raises(NaverTTSError):
+        NaverTTS(text="test", lang="en").write_to_fp(io.BytesIO())
+    assert [s.total_hits for s in servers] == [1, 0]
+    assert pool.endpoints[0].failures == 1
+
+
+def test_least_outstanding_slow_host(servers, endpoint_pool, scheduler):
+    """A slow host gets fewer requests"""
+    servers[0].delay = 0.3
+    endpoint_pool(
+        EndpointPool(
+            [s.endpoint for s in servers], strategy=EndpointPool.LEAST_OUTSTANDING
+        )
+    )
+    text = " ".join("Sentence number %d is right here." % i for i in range(24))
+    tts = NaverTTS(text=text, lang="en")
+    fp = io.BytesIO()
+    tts.write_to_fp(fp)
+    assert part_texts(fp.getvalue()) == tts._tokenize(text)
+    slow, fast = (s.total_hits for s in servers)
+    assert slow + fast == 24
+    assert slow < 12 < fast
+
+
+if __name__ == "__main__":
+    pytest.main(["-x", __file__])
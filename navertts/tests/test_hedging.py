@@ -0,0 +1,193 @@
+# -*- coding: utf-8 -*-
+import collections
+import io
+import threading
+import time
+
+import pytest
+
+from navertts.hedging import HedgePolicy
+from navertts.scheduler import Scheduler
+from navertts.tts import NaverTTS
+from .conftest import part_texts
+
+
+def run(policy, scheduler, func, *args):
+    """Run ``func(*args)`` with ``policy``, return ``(result, outcome)``"""
+    result, latency, outcome = policy.submit(scheduler.submit, func, *args).result()
+    assert latency >= 0
+    return result, outcome
+
+
+def seeded(latency=0.01, samples=20, **kwargs):
+    policy = HedgePolicy(min_samples=20, **kwargs)
+    for _ in range(samples):
+        policy.record(latency)
+    return policy
+
+
+def slow_then_fast(slow=1.0, fast=0.0):
+    """A request that is slow on its first call only"""
+    calls = []
+    lock = threading.Lock()
+
+    def func(x):
+        with lock:
+            calls.append(x)
+            first = len(calls) == 1
+        time.sleep(slow if first else fast)
+        return "first" if first else "hedge"
+
+    return func, calls
+
+
+def test_delay():
+    policy = HedgePolicy(percentile=50, min_samples=3)
+    assert policy.delay() is None
+    for latency in (0.3, 0.1, 0.2):
+        policy.record(latency)
+    assert policy.delay() == 0.2
+
+
+def test_fast_request_not_hedged(scheduler):
+    policy = seeded(latency=1.0, budget=1)
+    assert run(policy, scheduler, lambda x: x, 42) == (42, HedgePolicy.NOT_HEDGED)
+
+
+def test_hedge_wins(scheduler):
+    """A slow request is raced by a hedge, which wins"""
+    policy = seeded(budget=1)
+    func, calls = slow_then_fast()
+    start = time.perf_counter()
+    assert run(policy, scheduler, func, "x") == ("hedge", HedgePolicy.HEDGE)
+    assert time.perf_counter() - start < 0.5
+    assert calls == ["x", "x"]
+    assert policy.outcomes[HedgePolicy.HEDGE] == 1
+
+
+def test_primary_wins(scheduler):
+    """The original request can still win the race"""
+    policy = seeded(budget=1)
+    func, calls = slow_then_fast(slow=0.05, fast=1.0)
+    assert run(policy, scheduler, func, "x") == ("first", HedgePolicy.PRIMARY)
+
+
+def test_budget_denied(scheduler):
+    """No hedge without budget"""
+    policy = seeded(budget=0)
+    func, calls = slow_then_fast(slow=0.05)
+    assert run(policy, scheduler, func, "x") == ("first", HedgePolicy.DENIED)
+    assert len(calls) == 1
+
+
+def test_budget_caps_hedge_rate(scheduler):
+    """Hedges stay under the budget share of requests"""
+    policy = seeded(latency=0.001, samples=200, percentile=50, budget=0.1, burst=1)
+
+    def slow():
+        time.sleep(0.01)
+
+    for _ in range(50):
+        run(policy, scheduler, slow)
+    hedged = policy.outcomes[HedgePolicy.PRIMARY] + policy.outcomes[HedgePolicy.HEDGE]
+    assert 1 <= hedged <= 5
+    # (Or not hedged, when done before the timer went off)
+    not_hedged = policy.outcomes[HedgePolicy.NOT_HEDGED]
+    assert policy.outcomes[HedgePolicy.DENIED] + not_hedged == 50 - hedged
+    assert not_hedged <= 5
+
+
+def test_both_fail(scheduler):
+    policy = seeded(budget=1)
+
+    def fail():
+        time.sleep(0.05)
+        raise ValueError("boom")
+
+    with pytest.raises(ValueError):
+        run(policy, scheduler, fail)
+
+
+def test_max_workers():
+    """Requests and their hedges share the workers of the scheduler"""
+    sched = Scheduler(max_workers=2)
+    policy = seeded(latency=0.001, budget=1, burst=100)
+    lock = threading.Lock()
+    running = [0, 0]
+
+    def slow(i):
+        with lock:
+            running[0] += 1
+            running[1] = max(running)
+        time.sleep(0.02)
+        with lock:
+            running[0] -= 1
+        return i
+
+    races = [policy.submit(sched.submit, slow, i) for i in range(20)]
+    assert [r.result()[0] for r in races] == list(range(20))
+    sched.shutdown()
+    assert running[1] == 2
+    # Hedges were sent, but queued behind the requests
+    assert policy.outcomes[HedgePolicy.NOT_HEDGED] < 20
+    assert sched.metrics()["interactive"]["submitted"] > 20
+
+
+def test_cancel():
+    """Cancelling a race cancels its requests that haven't started"""
+    sched = Scheduler(max_workers=1)
+    policy = seeded(latency=1.0)
+    blocker = sched.submit(time.sleep, 0.1)
+    calls = []
+    race = policy.submit(sched.submit, calls.append, "x")
+    assert race.cancel()
+    blocker.result()
+    sched.shutdown()
+    assert calls == []
+
+
+def test_bad_params():
+    with pytest.raises(ValueError):
+        HedgePolicy(percentile=0)
+    with pytest.raises(ValueError):
+        HedgePolicy(budget=2)
+
+
+def test_write_to_fp_hedged(mock_server, scheduler):
+    """Slow parts are hedged and their outcome recorded per part"""
+    seen = collections.Counter()
+    lock = threading.Lock()
+
+    def delay(query):
+        # Only the first request of the part containing "slow" is slow
+        with lock:
+            seen[query["text"]] += 1
+            first = seen[query["text"]] == 1
+        return 2.0 if first and "slow" in query["text"] else 0.0
+
+    mock_server.delay = delay
+    policy = seeded(latency=0.05, budget=1)
+    text = (
+        "This is a fast part with enough words to be its own part. "
+        "This is a slow part with enough words to be its own part. "
+        "This is another fast part which is read after the other one."
+    )
+    tts = NaverTTS(text=text, hedge=policy)
+
+    fp = io.BytesIO()
+    start = time.perf_counter()
+    parts = tts.write_to_fp(fp)
+
+    assert time.perf_counter() - start < 1.5
+    assert part_texts(fp.getvalue()) == [p.text for p in parts]
+    assert len(parts) == 3
+    assert [p.hedge for p in parts] == [
+        HedgePolicy.NOT_HEDGED,
+        HedgePolicy.HEDGE,
+        HedgePolicy.NOT_HEDGED,
+    ]
+    assert all(p.size > 0 for p in parts)
+
+
+if __name__ == "__main__":
+    pytest.main(["-x", __file__])
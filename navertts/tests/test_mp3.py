@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+import pytest
+
+from navertts import mp3
+from .conftest import fake_mp3
+
+
+def frame(header, length):
+    return header + b"\x00" * (length - len(header))
+
+
+# MPEG-1 Layer III, 128 kbps, 44100 Hz: 417 bytes (418 padded), 1152 samples
+MPEG1_L3 = b"\xff\xfb\x90\x64"
+MPEG1_L3_PADDED = b"\xff\xfb\x92\x64"
+# MPEG-2 Layer III, 64 kbps, 22050 Hz: 208 bytes, 576 samples
+MPEG2_L3 = b"\xff\xf3\x80\x64"
+# MPEG-2.5 Layer III, 32 kbps, 11025 Hz: 208 bytes, 576 samples
+MPEG25_L3 = b"\xff\xe3\x40\x64"
+# MPEG-1 Layer II, 192 kbps, 48000 Hz: 576 bytes, 1152 samples
+MPEG1_L2 = b"\xff\xfd\xa4\x64"
+# MPEG-1 Layer I, 128 kbps, 44100 Hz: 136 bytes, 384 samples
+MPEG1_L1 = b"\xff\xff\x40\x64"
+
+
+@pytest.mark.parametrize(
+    "header,length,samples,rate",
+    [
+        (MPEG1_L3, 417, 1152, 44100),
+        (MPEG1_L3_PADDED, 418, 1152, 44100),
+        (MPEG2_L3, 208, 576, 22050),
+        (MPEG25_L3, 208, 576, 11025),
+        (MPEG1_L2, 576, 1152, 48000),
+        (MPEG1_L1, 136, 384, 44100),
+    ],
+)
+def test_frames(header, length, samples, rate):
+    data = frame(header, length) * 3
+    scanner = mp3.scan(data)
+    assert scanner.frames == 3
+    assert scanner.samples == 3 * samples
+    assert scanner.duration == pytest.approx(3.0 * samples / rate)
+    assert scanner.junk == 0
+
+
+def test_fake_mp3():
+    """The mock server's parts: an ID3v2 tag and 4 frames"""
+    scanner = mp3.scan(fake_mp3("hello"))
+    assert scanner.frames == 4
+    assert scanner.duration == pytest.approx(4 * 1152 / 44100.0)
+    assert scanner.junk == 0
+
+
+def test_tags_skipped():
+    # ID3v2 with a footer, ID3v1 at the end
+    id3v2 = b"ID3\x04\x00\x10\x00\x00\x00\x05" + b"\xff" * 5 + b"3DI" + b"\x00" * 7
+    id3v1 = b"TAG" + b"\xff" * 125
+    scanner = mp3.scan(id3v2 + frame(MPEG1_L3, 417) * 2 + id3v1)
+    assert scanner.frames == 2
+    assert scanner.junk == 0
+
+
+def test_junk_resync():
+    data = b"junk\xff\x00" + frame(MPEG1_L3, 417) + b"\x01\x02" + frame(MPEG1_L3, 417)
+    scanner = mp3.scan(data)
+    assert scanner.frames == 2
+    assert scanner.junk == 8
+
+
+def test_vbr_tag_not_counted():
+    # Side info of a stereo MPEG-1 frame is 32 bytes: the tag is at 36
+    xing = MPEG1_L3 + b"\x00" * 32 + b"Xing"
+    data = frame(xing, 417) + frame(MPEG1_L3, 417) * 2
+    assert mp3.scan(data).frames == 2
+    # Only the first frame can be a tag
+    assert mp3.scan(frame(MPEG1_L3, 417) + frame(xing, 417)).frames == 2
+
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 40, 417, 1000])
+def test_feed_chunks(chunk_size):
+    xing = frame(MPEG1_L3 + b"\x00" * 32 + b"Info", 417)
+    data = (
+        fake_mp3("first")
+        + b"junk"
+        + xing
+        + frame(MPEG2_L3, 208) * 3
+        + fake_mp3("second")
+    )
+    expected = mp3.scan(data)
+
+    scanner = mp3.FrameScanner()
+    for i in range(0, len(data), chunk_size):
+        scanner.feed(data[i : i + chunk_size])
+    assert (scanner.frames, scanner.samples, scanner.junk) == (
+        expected.frames,
+        expected.samples,
+        expected.junk,
+    )
+    assert scanner.duration == pytest.approx(expected.duration)
+
+
+def test_empty():
+    scanner = mp3.scan(b"")
+    assert (scanner.frames, scanner.duration, scanner.junk) == (0, 0.0, 0)
+
+
+@pytest.mark.parametrize(
+    "data,expected",
+    [
+        (fake_mp3("tagged"), True),
+        (frame(MPEG1_L3, 417), True),
+        (MPEG2_L3, True),
+        (b"ID3", True),
+        (b"<!DOCTYPE html><html>", False),
+        (b'{"error": "quota"}', False),
+        (b"\xff\xfb", False),
+        (b"\xff\xfb\xf0\x64", False),  # Reserved bitrate
+        (b"", False),
+    ],
+)
+def test_sniff(data, expected):
+    assert mp3.sniff(data) is expected
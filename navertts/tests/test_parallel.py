@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+import random
+
+import pytest
+
+from navertts.parallel import ParallelTokenizer
+from navertts.tts import NaverTTS
+
+# Characters that exercise every default pre-processor and tokenizer case
+ALPHABET = list("abcdefgMm ") * 4 + list("?!.,:-\n") + ["dr.", "M.", "1:2", "\n\n"]
+
+
+def random_text(seed, size):
+    rnd = random.Random(seed)
+    return "".join(rnd.choice(ALPHABET) for _ in range(size))
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_matches_serial_random(seed):
+    """Parallel tokenization is exactly the serial one"""
+    text = random_text(seed, 3000)
+    tts = NaverTTS(text=text)
+    pt = ParallelTokenizer.from_tts(tts, processes=1, block_size=40)
+    assert len(list(pt.iter_blocks(text.strip()))) > 1
+    assert pt.run(text) == tts._tokenize(text)
+
+
+def test_matches_serial_process_pool():
+    """Blocks sent to worker processes come back in order"""
+    text = "\n\n".join(
+        "Paragraph %d. It has a few sentences, some: longer than others! Dr. Who?" % i
+        for i in range(200)
+    )
+    tts = NaverTTS(text=text)
+    pt = ParallelTokenizer.from_tts(tts, processes=2, block_size=500)
+    assert pt.run(text) == tts._tokenize(text)
+
+
+def test_imap_streams_blocks():
+    """imap() yields one list of tokens per block"""
+    text = "\n\n".join("Line number %d, and more." % i for i in range(100))
+    tts = NaverTTS(text=text)
+    pt = ParallelTokenizer.from_tts(tts, processes=1, block_size=100)
+    chunks = list(pt.imap(text))
+    assert len(chunks) > 1
+    assert sum(chunks, []) == tts._tokenize(text)
+
+
+def test_iter_blocks_safe_boundaries():
+    """Blocks are cut between the newlines of a blank line only"""
+    text = "a" * 10 + "-\n\n" + "b" * 10 + "\n\n" + "c" * 10
+    pt = ParallelTokenizer([], None, block_size=5, max_block_size=100)
+    blocks = list(pt.iter_blocks(text))
+    assert "".join(blocks) == text
+    assert blocks == ["a" * 10 + "-\n\n" + "b" * 10 + "\n", "\n" + "c" * 10]
+
+
+def test_iter_blocks_without_blank_lines():
+    """Blocks are cut at the end of a sentence or line, or of a word"""
+    pt = ParallelTokenizer([], None, block_size=5, max_block_size=20)
+    text = (
+        "Aaaa. Bbbb? Cccc dddd\neeee ffff gggg-\nhhhh iiii jjjj kkkkkkkkkkkkkkkkkkkkkk"
+    )
+    assert list(pt.iter_blocks(text)) == [
+        "Aaaa. Bbbb? ",
+        "Cccc dddd\n",
+        "eeee ffff gggg-\n",
+        "hhhh iiii jjjj ",
+        "kkkkkkkkkkkkkkkkkkkk",
+        "kk",
+    ]
+
+
+def test_short_text():
+    """Short texts are tokenized serially"""
+    text = "Hello, world."
+    tts = NaverTTS(text=text)
+    pt = ParallelTokenizer.from_tts(tts)
+    assert pt.run(text) == tts._tokenize(text)
+
+
+if __name__ == "__main__":
+    pytest.main(["-x", __file__])
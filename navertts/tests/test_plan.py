@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+import io
+import json
+
+import pytest
+import requests
+
+from navertts import constants
+from navertts.plan import Plan, estimate_seconds
+from navertts.tts import NaverTTS, Voice
+
+TEXT = (
+    "Dr. Smith arrived at 10:30, as planned. Was it too late? No! "
+    "The meeting (held in the main hall) went on for hours; "
+    "everyone had something to say: the budget, the plan & the rest."
+)
+
+
+def test_plan_parts(offline):
+    tts = NaverTTS(text=TEXT, lang="en")
+    plan = tts.plan()
+    assert [p.text for p in plan.parts] == tts._tokenize(TEXT)
+    assert [p.index for p in plan.parts] == list(range(len(plan.parts)))
+
+    for p in plan.parts:
+        url = constants.translate_endpoint(
+            text=p.text, speaker=tts.speaker, speed=tts.speed, tld=tts.tld
+        )
+        # Exactly the URL requests would send
+        assert p.url == requests.Request("GET", url).prepare().url
+        assert p.url_bytes == len(p.url.encode("ascii"))
+
+    assert plan.requests == len(plan.parts)
+    assert plan.url_bytes == sum(p.url_bytes for p in plan.parts)
+    assert plan.chars == sum(len(p.text) for p in plan.parts)
+    assert plan.seconds == pytest.approx(sum(p.seconds for p in plan.parts))
+
+
+def test_plan_unicode_url(offline):
+    plan = NaverTTS(text="안녕하세요 세계", lang="ko").plan()
+    url = plan.parts[0].url
+    assert "%EC%95%88" in url
+    assert plan.url_bytes == len(url)
+
+
+def test_estimate_seconds():
+    assert estimate_seconds("a" * 14, "en") == pytest.approx(1.0)
+    assert estimate_seconds("a" * 14, "en", speed=5) == pytest.approx(1.5)
+    assert estimate_seconds("a" * 14, "en", speed=-5) == pytest.approx(0.5)
+    assert estimate_seconds("a" * 10, "xx") == pytest.approx(1.0)
+
+
+def test_plan_corpus_by_voice(offline):
+    en = Voice(lang="en")
+    ko = Voice(lang="ko", speed="slow")
+    plan = Plan(keep_parts=False)
+    for _ in range(3):
+        plan.add(NaverTTS(TEXT, voice=en))
+    plan.add(NaverTTS(TEXT, voice=ko))
+
+    assert plan.parts == []
+    assert plan.texts == 4
+    voices = plan.voices
+    assert list(voices) == [en, ko]
+    assert voices[en]["texts"] == 3
+    assert voices[en]["requests"] == 3 * voices[ko]["requests"]
+    assert plan.requests == voices[en]["requests"] + voices[ko]["requests"]
+    # Slower, with fewer characters per second
+    assert voices[ko]["seconds"] > voices[en]["seconds"] / 3
+
+    d = json.loads(json.dumps(plan.to_dict()))
+    assert [v["speaker"] for v in d["voices"]] == [en.speaker, ko.speaker]
+    assert "parts" not in d
+
+
+def test_plan_stream(offline):
+    tts = NaverTTS(text=iter([TEXT[:50], TEXT[50:]]), lang="en")
+    assert [p.text for p in tts.plan().parts] == NaverTTS(TEXT)._tokenize(TEXT)
+
+
+def test_plan_empty(offline):
+    with pytest.raises(AssertionError):
+        NaverTTS(text=" ... ").plan()
+
+
+def test_plan_matches_write_to_fp(mock_server):
+    """The planned parts are the ones sent"""
+    tts = NaverTTS(text=TEXT, lang="en")
+    parts = tts.write_to_fp(io.BytesIO())
+    assert [p.text for p in tts.plan().parts] == [p.text for p in parts]
+
+
+if __name__ == "__main__":
+    pytest.main(["-x", __file__])
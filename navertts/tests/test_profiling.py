@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+import io
+import pstats
+
+import pytest
+from requests.packages.urllib3 import connection
+
+from navertts import constants, profiling
+from navertts.profiling import Profiler
+from navertts.transport import FakeTransport, Urllib3Transport
+from navertts.tts import NaverTTS
+from .conftest import part_texts
+
+TEXT = " ".join("Sentence number %d is right here." % i for i in range(6))
+
+
+def test_phases(mock_server):
+    transport = Urllib3Transport()
+    with Profiler() as profiler:
+        tts = profiler.profile(
+            NaverTTS(text=TEXT, lang="en", transport=profiler.transport(transport))
+        )
+        fp = io.BytesIO()
+        tts.write_to_fp(profiler.writer(fp))
+    transport.close()
+    phases = profiler.to_dict()["phases"]
+    assert part_texts(fp.getvalue()) == tts._tokenize(TEXT)
+
+    assert list(phases) == list(profiling.PHASES)
+    assert phases["startup"]["calls"] == 1
+    assert phases["pre-processing"]["calls"] == len(tts.pre_processor_funcs)
+    assert phases["tokenizing"]["calls"] == 1
+    assert 1 <= phases["connect"]["calls"] <= 6
+    assert phases["ttfb"]["calls"] == phases["body"]["calls"] == 6
+    assert phases["write"]["calls"] >= 6
+    assert all(p["seconds"] >= 0 for p in phases.values())
+    assert profiler.wall >= phases["startup"]["seconds"]
+
+
+def test_stop():
+    """Connections aren't timed once stopped, and nothing else is patched"""
+    connect = connection.HTTPConnection.connect
+    transport = Urllib3Transport()
+    with Profiler() as profiler:
+        profiler.transport(transport)
+        assert len(transport._connect_hooks) == 1
+    assert transport._connect_hooks == ()
+    assert connection.HTTPConnection.connect is connect
+    wall = profiler.wall
+    assert profiler.wall == wall
+
+
+def test_other_requests(mock_server):
+    """Only the connections of the profiled requests are timed"""
+    transport = Urllib3Transport()
+    url = constants.translate_endpoint(text="test", speaker="clara")
+    first, second = Profiler(functions=False), Profiler(functions=False)
+    with first, second:
+        profiled = first.transport(transport)
+        second.transport(profiled)
+        # Not profiled
+        transport.get(url, {}, (5, 5)).close()
+        transport.close()
+        assert first.to_dict()["phases"]["connect"]["calls"] == 0
+
+        r = profiled.get(url, {}, (5, 5))
+        list(r.iter_content(1024))
+        r.close()
+        assert first.to_dict()["phases"]["connect"]["calls"] == 1
+        assert second.to_dict()["phases"]["connect"]["calls"] == 0
+        first.stop()
+        assert len(transport._connect_hooks) == 1
+    assert transport._connect_hooks == ()
+    transport.close()
+
+
+def test_timed():
+    profiler = Profiler(functions=False)
+    upper = profiler.timed("pre-processing", str.upper)
+    assert upper("test") == "TEST"
+    assert profiler.to_dict()["phases"]["pre-processing"]["calls"] == 1
+    with pytest.raises(TypeError):
+        upper(1)
+    assert profiler.to_dict()["phases"]["pre-processing"]["calls"] == 2
+
+
+def test_report(tmp_path):
+    with Profiler() as profiler:
+        tts = NaverTTS(text=TEXT, lang="en", transport=FakeTransport())
+        profiler.profile(tts).write_to_fp(io.BytesIO())
+    report = profiler.report(top=5)
+    assert "tokenizing" in report and "wall" in report
+    assert "cumulative" in report and "write_to_fp" in report
+
+    path = str(tmp_path / "run.pstats")
+    profiler.dump(path)
+    assert pstats.Stats(path).total_calls > 0
+
+    profiler = Profiler(functions=False).start()
+    profiler.stop()
+    assert "cumulative" not in profiler.report()
+    with pytest.raises(ValueError):
+        profiler.dump(path)
+
+
+if __name__ == "__main__":
+    pytest.main(["-x", __file__])
@@ -0,0 +1,235 @@
+# -*- coding: utf-8 -*-
+import io
+import multiprocessing
+import os
+import pickle
+import threading
+import time
+
+import pytest
+
+from navertts import ratelimit
+from navertts.cancel import CancelToken
+from navertts import scheduler as scheduler_mod
+from navertts.ratelimit import SharedRateLimiter
+from navertts.scheduler import Scheduler
+from navertts.tts import (
+    NaverTTS,
+    NaverTTSCancelled,
+    NaverTTSRateLimited,
+    NaverTTSTimeout,
+)
+
+
+@pytest.fixture
+def limiter_dir(tmp_path):
+    return str(tmp_path / "buckets")
+
+
+@pytest.fixture
+def rate_limiter(monkeypatch):
+    """Install a process-wide rate limiter for the test"""
+
+    def install(limiter):
+        monkeypatch.setattr(ratelimit, "_rate_limiter", limiter)
+        return limiter
+
+    return install
+
+
+def test_burst_then_rate(limiter_dir):
+    limiter = SharedRateLimiter(rate=20, burst=5, directory=limiter_dir)
+    start = time.time()
+    for _ in range(15):
+        assert limiter.acquire("com")
+    elapsed = time.time() - start
+    # 5 at once, then 10 at 20/s
+    assert 0.4 < elapsed < 0.8
+
+
+def test_fail_fast(limiter_dir):
+    limiter = SharedRateLimiter(rate=1, burst=3, directory=limiter_dir, blocking=False)
+    assert [limiter.acquire("com") for _ in range(4)] == [True, True, True, False]
+
+
+def test_timeout(limiter_dir):
+    limiter = SharedRateLimiter(rate=1, burst=1, directory=limiter_dir, timeout=0.1)
+    assert limiter.acquire("com")
+    start = time.time()
+    assert not limiter.acquire("com")
+    assert time.time() - start < 0.1
+
+
+def test_release(limiter_dir):
+    limiter = SharedRateLimiter(rate=1, burst=2, directory=limiter_dir)
+    assert [limiter.reserve("com") for _ in range(3)] == [0, 0, pytest.approx(1, 0.1)]
+    # The token of the reservation, then one of the burst, but no more
+    for _ in range(4):
+        limiter.release("com")
+    assert [limiter.reserve("com", blocking=False) for _ in range(3)] == [0, 0, None]
+
+
+def test_buckets_per_tld(limiter_dir):
+    limiter = SharedRateLimiter(
+        rate=1, burst=1, rates={"jp": 2}, directory=limiter_dir, blocking=False
+    )
+    assert limiter.acquire("com")
+    assert not limiter.acquire("com")
+    # Other host, other bucket, with twice the burst
+    assert [limiter.acquire("jp") for _ in range(3)] == [True, True, False]
+
+
+def test_shared_between_instances(limiter_dir):
+    """The bucket is in the directory, not in the instance"""
+    a = SharedRateLimiter(rate=1, burst=2, directory=limiter_dir, blocking=False)
+    b = pickle.loads(pickle.dumps(a))
+    assert a.acquire("com")
+    assert b.acquire("com")
+    assert not a.acquire("com")
+    assert not b.acquire("com")
+
+
+def _worker(limiter, n, queue):
+    stamps = []
+    for _ in range(n):
+        limiter.acquire("com")
+        stamps.append(time.time())
+    queue.put(stamps)
+
+
+def test_aggregate_rate_across_processes(limiter_dir):
+    """The aggregate rate of many processes stays under the limit"""
+    rate, burst, procs, n = 100.0, 5, 4, 25
+    limiter = SharedRateLimiter(rate=rate, burst=burst, directory=limiter_dir)
+
+    ctx = multiprocessing.get_context("spawn")
+    queue = ctx.Queue()
+    workers = [
+        ctx.Process(target=_worker, args=(limiter, n, queue)) for _ in range(procs)
+    ]
+    for w in workers:
+        w.start()
+    stamps = sorted(sum((queue.get(timeout=30) for _ in workers), []))
+    for w in workers:
+        w.join()
+
+    assert len(stamps) == procs * n
+    # In any window, no more than the burst plus what the rate allows
+    # (with some slack for clock reads after the lock is released)
+    for i in range(len(stamps)):
+        for j in range(i, len(stamps)):
+            allowed = burst + rate * (stamps[j] - stamps[i] + 0.02)
+            assert j - i + 1 <= allowed
+    assert stamps[-1] - stamps[0] >= (procs * n - burst) / rate * 0.9
+
+
+def test_write_to_fp_rate_limited(mock_server, rate_limiter, limiter_dir):
+    """Every part request takes a token"""
+    limiter = rate_limiter(SharedRateLimiter(rate=4, burst=2, directory=limiter_dir))
+    text = (
+        "Hello, this is the first part of the text with enough words to be a part. "
+        "And this is the second part of the text, which is read after the first."
+    )
+    start = time.perf_counter()
+    parts = NaverTTS(text=text).write_to_fp(io.BytesIO())
+    assert len(parts) > 2
+    # Parts past the burst waited for their token
+    assert time.perf_counter() - start >= (len(parts) - 2) / 4.0 * 0.9
+    assert not limiter.acquire("com", blocking=False)
+
+
+def test_write_to_fp_not_waiting_in_workers(
+    mock_server, rate_limiter, limiter_dir, monkeypatch
+):
+    """Requests wait for their token holding a slot, not a worker"""
+    sched = Scheduler(max_workers=1)
+    monkeypatch.setattr(scheduler_mod, "_scheduler", sched)
+    rate_limiter(SharedRateLimiter(rate=4, burst=1, directory=limiter_dir))
+    text = " ".join("Sentence number %d is right here." % i for i in range(8))
+    thread = threading.Thread(
+        target=NaverTTS(text=text).write_to_fp, args=(io.BytesIO(),)
+    )
+    thread.start()
+    time.sleep(0.1)
+    # While a part waits for its token, the worker is idle
+    with sched._cond:
+        assert sched._idle == len(sched._workers) == 1
+        assert sched._ready or sched._delayed
+    thread.join()
+    sched.shutdown()
+    assert mock_server.total_hits == len(NaverTTS(text=text)._tokenize(text))
+
+
+def test_cancelled_bulk_not_delaying_interactive(
+    mock_server, rate_limiter, limiter_dir, scheduler, tmp_path
+):
+    """A cancelled bulk job gives back its tokens to the next requests"""
+    rate_limiter(SharedRateLimiter(rate=20, directory=limiter_dir))
+    text = " ".join("Sentence number %d is right here." % i for i in range(200))
+    cancel = CancelToken()
+
+    def bulk():
+        with pytest.raises(NaverTTSCancelled):
+            tts = NaverTTS(text=text, priority="bulk")
+            tts.save(str(tmp_path / "bulk.mp3"), cancel=cancel)
+
+    thread = threading.Thread(target=bulk)
+    thread.start()
+    time.sleep(0.3)
+    cancel.cancel()
+    thread.join()
+
+    start = time.perf_counter()
+    NaverTTS(text="hello", priority="interactive").write_to_fp(io.BytesIO())
+    assert time.perf_counter() - start < 0.5
+    # The burst, then the rate until cancelled, then the interactive request
+    assert mock_server.total_hits <= 20 + 0.3 * 20 + 5
+
+
+def test_write_to_fp_deadline(mock_server, rate_limiter, limiter_dir):
+    """Waiting for a token past the deadline is a timeout"""
+    rate_limiter(SharedRateLimiter(rate=0.5, burst=1, directory=limiter_dir))
+    text = (
+        "This is the first part of the text with enough words to be its own part. "
+        "And this is the second part of the text, which is never sent upstream."
+    )
+    start = time.perf_counter()
+    with pytest.raises(NaverTTSTimeout):
+        NaverTTS(text=text).write_to_fp(io.BytesIO(), deadline=0.5)
+    assert time.perf_counter() - start < 0.5
+    assert mock_server.total_hits == 1
+
+
+def test_default_directory(tmp_path, monkeypatch):
+    """Buckets are in a directory of the user, only accessible to them"""
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "cache"))
+    limiter = SharedRateLimiter(rate=1)
+    assert limiter.directory == str(tmp_path / "cache" / "navertts" / "ratelimit")
+    assert limiter.acquire("com")
+    limiter.close()
+    assert os.stat(limiter.directory).st_mode & 0o777 == 0o700
+    path = os.path.join(limiter.directory, "com.bucket")
+    assert os.stat(path).st_mode & 0o777 == 0o600
+
+    # A bucket someone else could write isn't used
+    os.chmod(path, 0o666)
+    with pytest.raises(IOError):
+        SharedRateLimiter(rate=1).acquire("com")
+
+
+def test_write_to_fp_fail_fast(mock_server, rate_limiter, limiter_dir):
+    rate_limiter(
+        SharedRateLimiter(rate=0.1, burst=1, directory=limiter_dir, blocking=False)
+    )
+    text = (
+        "This is the first part of the text with enough words to be its own part. "
+        "And this is the second part of the text, which is never sent upstream."
+    )
+    with pytest.raises(NaverTTSRateLimited) as e:
+        NaverTTS(text=text).write_to_fp(io.BytesIO())
+    assert "Rate limit reached" in str(e.value)
+    assert mock_server.total_hits == 1
+
+
+if __name__ == "__main__":
+    pytest.main(["-x", __file__])
@@ -0,0 +1,175 @@
+# -*- coding: utf-8 -*-
+import io
+import logging
+import os
+import threading
+import tracemalloc
+from concurrent.futures import Future
+
+import pytest
+
+from navertts.reorder import ReorderBuffer
+from navertts.tts import NaverTTS, NaverTTSError
+from .conftest import MP3_FRAME_SIZE, fake_mp3, part_texts
+
+FRAMES = 100
+PART_SIZE = FRAMES * MP3_FRAME_SIZE
+TEXT = " ".join("Sentence number %d is right here." % i for i in range(40))
+
+
+def done(body):
+    future = Future()
+    future.set_result((body, 0.1, None))
+    return future
+
+
+class Sink:
+    """A file-like object that only counts bytes"""
+
+    def __init__(self):
+        self.size = 0
+
+    def write(self, data):
+        self.size += len(data)
+        return len(data)
+
+
+class RetainingSink:
+    """A file-like object that keeps the objects it's given, as they are"""
+
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(data)
+        return len(data)
+
+
+def test_in_order():
+    buffer = ReorderBuffer(max_memory=1000)
+    bodies = [fake_mp3("part %d" % i, frames=1) for i in range(5)]
+    for idx, body in enumerate(bodies):
+        buffer.add(idx, done(body))
+
+    fp = io.BytesIO()
+    for idx in range(5):
+        part = buffer.get(idx)
+        assert (part.index, part.size, part.frames) == (idx, len(bodies[idx]), 1)
+        buffer.write(part, fp)
+    assert fp.getvalue() == b"".join(bodies)
+    # 2 parts fit in memory, the next ones were spilled
+    assert buffer.spilled == 3
+    assert buffer.peak_memory <= 1000
+    assert buffer.memory == 0
+    buffer.close()
+
+
+def test_out_of_order():
+    """Parts completing ahead of their turn are spilled past the cap"""
+    bodies = [fake_mp3("part %d" % i, frames=FRAMES) for i in range(10)]
+    cap = 3 * len(bodies[0])
+    buffer = ReorderBuffer(max_memory=cap)
+    futures = [Future() for _ in range(10)]
+    for idx, future in enumerate(futures):
+        buffer.add(idx, future)
+    for idx in reversed(range(10)):
+        futures[idx].set_result((bodies[idx], 0.1, None))
+    assert buffer.futures() == []
+
+    fp = io.BytesIO()
+    for idx in range(10):
+        buffer.write(buffer.get(idx), fp)
+    assert part_texts(fp.getvalue()) == ["part %d" % i for i in range(10)]
+    # 9, 8 and 7 fit in memory, 0 is the next part
+    assert buffer.peak_memory <= cap + len(bodies[0])
+    assert buffer.spilled == 6
+    buffer.close()
+
+
+def test_spilled_chunks_retained():
+    """A sink may keep the chunks of spilled parts: they aren't reused"""
+    bodies = [os.urandom(3 * (1 << 16) + i) for i in range(4)]
+    buffer = ReorderBuffer(max_memory=0)
+    futures = [Future() for _ in bodies]
+    for idx, future in enumerate(futures):
+        buffer.add(idx, future)
+    for idx in reversed(range(len(bodies))):
+        futures[idx].set_result((bodies[idx], 0.1, None))
+
+    sink = RetainingSink()
+    for idx in range(len(bodies)):
+        buffer.write(buffer.get(idx), sink)
+    assert buffer.spilled == 3
+    assert len(sink.chunks) > len(bodies)
+    assert b"".join(bytes(c) for c in sink.chunks) == b"".join(bodies)
+    buffer.close()
+
+
+def test_next_part_kept_in_memory():
+    buffer = ReorderBuffer(max_memory=0)
+    future = Future()
+    buffer.add(0, future)
+    threading.Timer(0.05, future.set_result, args=((b"abc", 0, None),)).start()
+    part = buffer.get(0)
+    assert not part.spilled
+    assert buffer.spilled == 0
+
+
+def test_error():
+    buffer = ReorderBuffer(max_memory=100)
+    future = Future()
+    future.set_exception(NaverTTSError("boom"))
+    buffer.add(0, future)
+    with pytest.raises(NaverTTSError):
+        buffer.get(0)
+
+
+def _peak_write(tts):
+    sink = Sink()
+    tracemalloc.start()
+    try:
+        tts.write_to_fp(sink)
+        return sink.size, tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def test_write_to_fp_memory(mock_server, scheduler, monkeypatch, caplog):
+    """A slow first part doesn't make the others pile up in memory"""
+    # Captured log records would count too
+    caplog.set_level(logging.WARNING, logger="navertts")
+    mock_server.body = lambda query: fake_mp3(query["text"], frames=FRAMES)
+    mock_server.delay = lambda query: 0.5 if "number 0 " in query["text"] else 0
+
+    tts = NaverTTS(text=TEXT, lang="en")
+    parts = len(tts._tokenize(TEXT))
+    assert parts == 40
+
+    monkeypatch.setattr(NaverTTS, "NAVER_TTS_REORDER_MEMORY", 1 << 30)
+    size, peak_uncapped = _peak_write(tts)
+    assert size > parts * PART_SIZE
+    assert peak_uncapped > 30 * PART_SIZE
+
+    cap = 4 * PART_SIZE
+    monkeypatch.setattr(NaverTTS, "NAVER_TTS_REORDER_MEMORY", cap)
+    size_capped, peak_capped = _peak_write(tts)
+    assert size_capped == size
+    # The cap, plus the parts being fetched (4 workers) and written
+    assert peak_capped < cap + 12 * PART_SIZE
+    assert peak_capped < peak_uncapped / 2
+
+
+def test_write_to_fp_spilled(mock_server, monkeypatch):
+    """Spilled parts are written back in order"""
+    mock_server.delay = lambda query: 0.3 if "number 0 " in query["text"] else 0
+    monkeypatch.setattr(NaverTTS, "NAVER_TTS_REORDER_MEMORY", 0)
+    tts = NaverTTS(text=TEXT, lang="en")
+    fp = io.BytesIO()
+    results = tts.write_to_fp(fp)
+    assert part_texts(fp.getvalue()) == tts._tokenize(TEXT)
+    assert [r.frames for r in results] == [4] * 40
+    assert sum(r.size for r in results) == len(fp.getvalue())
+
+
+if __name__ == "__main__":
+    pytest.main(["-x", __file__])
@@ -0,0 +1,224 @@
+# -*- coding: utf-8 -*-
+import io
+import random
+import threading
+import time
+
+import pytest
+
+from navertts import scheduler as scheduler_mod
+from navertts.scheduler import PriorityClass, Scheduler
+from navertts.tts import NaverTTS
+from .conftest import part_texts
+
+
+@pytest.fixture
+def sched():
+    s = Scheduler(
+        max_workers=2,
+        classes={
+            "interactive": PriorityClass(weight=3),
+            "bulk": PriorityClass(weight=1, max_concurrency=1),
+        },
+    )
+    yield s
+    s.shutdown()
+
+
+def _gate(sched, priority="interactive"):
+    """Occupy a worker until the returned event is set"""
+    gate = threading.Event()
+    started = threading.Event()
+
+    def block():
+        started.set()
+        gate.wait()
+
+    sched.submit(block, priority=priority)
+    started.wait()
+    return gate
+
+
+def test_submit_result_and_exception(sched):
+    """Futures get the result or the exception of the task"""
+    assert sched.submit(lambda x: x + 1, 41).result() == 42
+
+    def fail():
+        raise ValueError("boom")
+
+    with pytest.raises(ValueError):
+        sched.submit(fail, priority="bulk").result()
+
+
+def test_unknown_priority(sched):
+    """Raise ValueError on an unknown priority class"""
+    with pytest.raises(ValueError):
+        sched.submit(print, priority="urgent")
+
+
+def test_class_cap(sched):
+    """A class never runs more tasks than its cap"""
+    lock = threading.Lock()
+    state = {"running": 0, "max": 0}
+
+    def task():
+        with lock:
+            state["running"] += 1
+            state["max"] = max(state["max"], state["running"])
+        time.sleep(0.01)
+        with lock:
+            state["running"] -= 1
+
+    futures = [sched.submit(task, priority="bulk") for _ in range(10)]
+    for f in futures:
+        f.result()
+    assert state["max"] == 1
+
+
+def test_weighted_fair_queuing():
+    """Classes are dispatched in proportion to their weight"""
+    s = Scheduler(
+        max_workers=1,
+        classes={"interactive": PriorityClass(weight=3), "bulk": PriorityClass()},
+    )
+    gate = _gate(s)
+    order = []
+    futures = []
+    for _ in range(12):
+        futures.append(s.submit(order.append, "b", priority="bulk"))
+        futures.append(s.submit(order.append, "i", priority="interactive"))
+    gate.set()
+    for f in futures:
+        f.result()
+    s.shutdown()
+    assert order[:8].count("i") == 6
+
+
+def test_flows_round_robin():
+    """Flows of a same class take turns"""
+    s = Scheduler(max_workers=1)
+    gate = _gate(s)
+    order = []
+    futures = [s.submit(order.append, "a", flow="a") for _ in range(4)]
+    futures += [s.submit(order.append, "b", flow="b") for _ in range(4)]
+    gate.set()
+    for f in futures:
+        f.result()
+    s.shutdown()
+    assert order == ["a", "b"] * 4
+
+
+def test_interactive_not_starved_by_bulk():
+    """Interactive queue times stay low during a large bulk backlog"""
+    s = Scheduler(
+        max_workers=4,
+        classes={
+            "interactive": PriorityClass(weight=4),
+            "bulk": PriorityClass(weight=1, max_concurrency=2),
+        },
+    )
+    bulk = [s.submit(time.sleep, 0.02, priority="bulk") for _ in range(100)]
+    time.sleep(0.05)
+    for _ in range(20):
+        s.submit(time.sleep, 0.02, priority="interactive").result()
+    metrics = s.metrics()
+    for f in bulk:
+        f.result()
+    s.shutdown()
+
+    assert metrics["interactive"]["completed"] == 20
+    assert metrics["interactive"]["queue_time_p99"] < 0.02
+    assert metrics["bulk"]["queue_time_max"] > 0.2
+
+
+def test_metrics(sched):
+    """Metrics count submitted and completed tasks per class"""
+    for _ in range(3):
+        sched.submit(time.sleep, 0, priority="bulk").result()
+    metrics = sched.metrics()
+    assert metrics["bulk"]["submitted"] == 3
+    assert metrics["bulk"]["completed"] == 3
+    assert metrics["bulk"]["queued"] == 0
+    assert metrics["interactive"]["submitted"] == 0
+    assert metrics["interactive"]["queue_time_p99"] == 0.0
+
+
+def test_delay():
+    """Delayed tasks are queued once due, without holding a worker"""
+    s = Scheduler(max_workers=1)
+    start = time.perf_counter()
+    delayed = s.submit(time.perf_counter, delay=0.2)
+    assert s.submit(time.perf_counter).result() - start < 0.1
+    assert delayed.result() - start >= 0.2
+    s.shutdown()
+    assert s.metrics()["interactive"]["completed"] == 2
+
+
+def test_shutdown_delayed():
+    """Shutting down runs the delayed tasks first"""
+    s = Scheduler(max_workers=2)
+    delayed = s.submit(time.sleep, 0, delay=0.1)
+    s.shutdown()
+    assert delayed.done()
+
+
+def test_acquire():
+    """Tasks acquire when dispatched, and wait holding their slot"""
+    s = Scheduler(max_workers=1)
+    start = time.perf_counter()
+    waited = s.submit(time.perf_counter, acquire=lambda: 0.2)
+    # The next task waits for the slot
+    assert s.submit(time.perf_counter).result() - start >= 0.2
+    assert waited.result() - start >= 0.2
+
+    failed = s.submit(print, acquire=lambda: 1 / 0)
+    with pytest.raises(ZeroDivisionError):
+        failed.result()
+    s.shutdown()
+    assert s.metrics()["interactive"]["running"] == 0
+
+
+def test_release():
+    """What a task cancelled while waiting acquired is released"""
+    s = Scheduler(max_workers=1)
+    released = []
+    future = s.submit(print, acquire=lambda: 0.2, release=lambda: released.append(True))
+    time.sleep(0.05)
+    assert future.cancel()
+    assert released == [True]
+    # Nothing released when the task runs, or was cancelled before acquiring
+    s.submit(print, acquire=lambda: 0, release=released.append).result()
+    s.submit(time.sleep, 0.1)
+    queued = s.submit(print, acquire=lambda: 0, release=released.append)
+    assert queued.cancel()
+    s.shutdown()
+    assert released == [True]
+
+
+def test_shutdown(sched):
+    """Raise RuntimeError when submitting after shutdown"""
+    sched.shutdown()
+    with pytest.raises(RuntimeError):
+        sched.submit(print)
+
+
+def test_write_to_fp_in_order(mock_server, monkeypatch):
+    """Parts fetched concurrently are written in order"""
+    s = Scheduler(max_workers=8)
+    monkeypatch.setattr(scheduler_mod, "_scheduler", s)
+    rnd = random.Random(0)
+    mock_server.delay = lambda query: rnd.random() / 20
+    text = " ".join("Sentence number %d is here." % i for i in range(30))
+    tts = NaverTTS(text=text, priority="bulk")
+
+    fp = io.BytesIO()
+    tts.write_to_fp(fp)
+    s.shutdown()
+
+    assert part_texts(fp.getvalue()) == tts._tokenize(text)
+    assert mock_server.max_active > 1
+    assert s.metrics()["bulk"]["completed"] == len(tts._tokenize(text))
+
+
+if __name__ == "__main__":
+    pytest.main(["-x", __file__])
@@ -0,0 +1,151 @@
+# -*- coding: utf-8 -*-
+import io
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from navertts.hedging import HedgePolicy
+from navertts.singleflight import SingleFlight
+from navertts.transport import get_transport
+from navertts.tts import NaverTTS, NaverTTSError
+from .conftest import part_texts
+
+
+def _run_threads(n, target):
+    barrier = threading.Barrier(n)
+    errors = []
+
+    def run(i):
+        barrier.wait()
+        try:
+            target(i)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(n)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return errors
+
+
+def test_future_coalesces_concurrent_calls():
+    """Concurrent callers with the same key share one execution"""
+    group = SingleFlight()
+    calls = []
+    results = [None] * 16
+
+    def slow(x):
+        calls.append(x)
+        time.sleep(0.2)
+        return x * 2
+
+    with ThreadPoolExecutor(1) as pool:
+
+        def target(i):
+            results[i] = group.future("key", lambda: pool.submit(slow, 21)).result()
+
+        assert _run_threads(16, target) == []
+    assert calls == [21]
+    assert results == [42] * 16
+    assert group.in_flight() == 0
+
+
+def test_future_runs_again_once_done():
+    """A key is forgotten once its future is done"""
+    group = SingleFlight()
+    calls = []
+    with ThreadPoolExecutor(1) as pool:
+        for _ in range(3):
+            group.future("key", lambda: pool.submit(calls.append, 1)).result()
+    assert calls == [1, 1, 1]
+
+
+def test_future_shares_exception():
+    """Every caller gets the exception"""
+    group = SingleFlight()
+
+    def fail():
+        time.sleep(0.2)
+        raise ValueError("boom")
+
+    with ThreadPoolExecutor(1) as pool:
+        errors = _run_threads(
+            8, lambda i: group.future("key", lambda: pool.submit(fail)).result()
+        )
+    assert len(errors) == 8
+    assert all(isinstance(e, ValueError) for e in errors)
+    assert group.in_flight() == 0
+
+
+def test_write_to_fp_one_upstream_hit_per_part(mock_server):
+    """Threads reading the same text hit the upstream once per unique part"""
+    mock_server.delay = 0.2
+    text = " ".join("Sentence number %d is here." % i for i in range(8))
+    n_parts = len(set(NaverTTS(text=text)._tokenize(text)))
+    assert n_parts > 1
+    outputs = [None] * 32
+
+    def target(i):
+        fp = io.BytesIO()
+        NaverTTS(text=text).write_to_fp(fp)
+        outputs[i] = fp.getvalue()
+
+    assert _run_threads(32, target) == []
+    assert len(mock_server.hits) == n_parts
+    assert mock_server.total_hits == n_parts
+    assert all(out == outputs[0] for out in outputs)
+
+
+def test_write_to_fp_distinct_texts_not_coalesced(mock_server):
+    """Different parts are requested separately"""
+    mock_server.delay = 0.1
+    outputs = [None] * 8
+
+    def target(i):
+        fp = io.BytesIO()
+        NaverTTS(text="text number %d" % (i % 4)).write_to_fp(fp)
+        outputs[i] = fp.getvalue()
+
+    assert _run_threads(8, target) == []
+    assert len(mock_server.hits) == 4
+    for i, out in enumerate(outputs):
+        assert part_texts(out) == ["text number %d" % (i % 4)]
+
+
+def test_write_to_fp_transports_not_coalesced(mock_server):
+    """Parts sent with different transports (or hedging) are requested separately"""
+    mock_server.delay = 0.2
+    transports = [type(get_transport())() for _ in range(2)]
+    hedge = HedgePolicy()
+    kwargs = [
+        {"transport": transports[0]},
+        {"transport": transports[1]},
+        {"transport": transports[0], "hedge": hedge},
+    ]
+
+    def target(i):
+        NaverTTS(text="test", **kwargs[i % 3]).write_to_fp(io.BytesIO())
+
+    assert _run_threads(9, target) == []
+    assert mock_server.total_hits == 3
+    for transport in transports:
+        transport.close()
+
+
+def test_write_to_fp_shares_errors(mock_server):
+    """Every coalesced caller gets a NaverTTSError on a bad response"""
+    mock_server.delay = 0.2
+    mock_server.status = 500
+
+    errors = _run_threads(8, lambda i: NaverTTS(text="test").write_to_fp(io.BytesIO()))
+    assert len(errors) == 8
+    assert all(isinstance(e, NaverTTSError) for e in errors)
+    assert mock_server.total_hits == 1
+
+
+if __name__ == "__main__":
+    pytest.main(["-x", __file__])
@@ -0,0 +1,225 @@
+# -*- coding: utf-8 -*-
+import json
+import os
+import socket
+import threading
+import time
+
+import pytest
+from click.testing import CliRunner
+
+from navertts.cli import spool_cli
+from navertts.spool import SpoolDaemon, SpoolQueue
+from navertts.tts import Voice
+from .conftest import part_texts
+
+TEXTS = {
+    "a.txt": "The first file is short.",
+    "b.txt": "The second file is short too.",
+    "c.txt": "And the third file is the last one and it is a bit longer than the others "
+    "so that it is read in more than one part.",
+}
+
+
+def drop(directory, name, text):
+    tmp = os.path.join(directory, "." + name)
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.rename(tmp, os.path.join(directory, name))
+
+
+@pytest.fixture
+def spool(tmp_path):
+    directory = tmp_path / "spool"
+    directory.mkdir()
+    for name, text in TEXTS.items():
+        drop(str(directory), name, text)
+    return str(directory)
+
+
+def make_daemon(spool, tmp_path, **kwargs):
+    return SpoolDaemon(
+        spool, output_dir=str(tmp_path / "out"), voice=Voice(lang="en"), **kwargs
+    )
+
+
+def test_run_once(mock_server, spool, tmp_path):
+    daemon = make_daemon(spool, tmp_path, jobs=2)
+    assert daemon.run_once() == 3
+
+    for name, text in TEXTS.items():
+        with open(daemon.output_path(name), "rb") as f:
+            assert " ".join(part_texts(f.read())) == text
+    assert sorted(os.listdir(str(tmp_path / "out"))) == ["a.mp3", "b.mp3", "c.mp3"]
+
+    stats = daemon.stats()
+    assert (stats["queued"], stats["running"], stats["done"], stats["failed"]) == (
+        0,
+        0,
+        3,
+        0,
+    )
+    assert stats["jobs_per_second"] > 0
+    assert stats["bytes_per_second"] > 0
+
+    # Nothing new
+    hits = mock_server.total_hits
+    assert daemon.run_once() == 0
+    assert mock_server.total_hits == hits
+    daemon.close()
+
+
+def test_restart(mock_server, spool, tmp_path):
+    """Finished jobs aren't processed again, interrupted ones are"""
+    daemon = make_daemon(spool, tmp_path)
+    daemon.run_once()
+    daemon.close()
+
+    drop(spool, "d.txt", "A file dropped while the daemon was stopped.")
+    drop(spool, "a.txt", "The first file was changed.")
+    # Claimed by a daemon that was killed: its lease expires
+    queue = SpoolQueue(os.path.join(spool, ".navertts-spool.db"), lease=0)
+    assert queue.add("e.txt", 1, 0.0)
+    queue.claim()
+    queue.close()
+    drop(spool, "e.txt", "A file that was being processed.")
+
+    hits = mock_server.total_hits
+    daemon = make_daemon(spool, tmp_path)
+    assert daemon.run_once() == 3
+    assert mock_server.total_hits == hits + 3
+    with open(daemon.output_path("a.txt"), "rb") as f:
+        assert part_texts(f.read()) == ["The first file was changed."]
+    daemon.close()
+
+
+def test_failures(mock_server, spool, tmp_path):
+    """API errors are retried, up to max_attempts; bad inputs aren't"""
+    mock_server.status = lambda query: 500 if "second" in query["text"] else 200
+    drop(spool, "empty.txt", " ... ")
+    daemon = make_daemon(spool, tmp_path, max_attempts=2, backoff=0.2)
+    start = time.time()
+    assert daemon.run_once() == 2
+    # The retry waited for its backoff
+    assert time.time() - start >= 0.2
+
+    failed = {job["name"]: job for job in daemon.queue.jobs("failed")}
+    assert sorted(failed) == ["b.txt", "empty.txt"]
+    assert failed["b.txt"]["attempts"] == 2
+    assert failed["empty.txt"]["attempts"] == 1
+    assert not os.path.exists(daemon.output_path("b.txt"))
+    assert not os.path.exists(daemon.output_path("empty.txt"))
+    daemon.close()
+
+
+def test_unexpected_error(mock_server, spool, tmp_path, monkeypatch):
+    """A job failing with any error is marked as failed, not left running"""
+
+    def save(self, *args, **kwargs):
+        raise RuntimeError("boom")
+
+    monkeypatch.setattr("navertts.spool.NaverTTS.save", save)
+    daemon = make_daemon(spool, tmp_path, max_attempts=2)
+    assert daemon.run_once() == 0
+
+    jobs = daemon.queue.jobs()
+    assert [job["state"] for job in jobs] == ["failed"] * 3
+    assert [job["attempts"] for job in jobs] == [1] * 3
+    assert jobs[0]["error"] == "RuntimeError: boom"
+    daemon.close()
+
+
+def test_leases(tmp_path):
+    """Only the running jobs whose lease expired are recovered"""
+    path = str(tmp_path / "queue.db")
+    live, killed = SpoolQueue(path, lease=60), SpoolQueue(path, lease=0)
+    for name in ("a.txt", "b.txt"):
+        assert live.add(name, 1, 0.0)
+    job = live.claim()
+    assert job["owner"] == "%i@%s" % (os.getpid(), socket.gethostname())
+    assert job["lease"] > time.time() + 30
+    killed.claim()
+    time.sleep(0.01)
+
+    assert live.recover() == 1
+    assert [j["name"] for j in live.jobs("running")] == ["a.txt"]
+    assert [j["name"] for j in live.jobs("queued")] == ["b.txt"]
+    assert live.renew() == 1
+
+    # A running job isn't queued again when its file changes
+    assert not live.add("a.txt", 2, 1.0)
+    assert live.jobs("running")[0]["size"] == 1
+    live.done(job["id"])
+    assert live.add("a.txt", 2, 1.0)
+    live.close()
+    killed.close()
+
+
+def test_backoff(tmp_path):
+    """A job queued again isn't claimed before its backoff, which doubles"""
+    queue = SpoolQueue(str(tmp_path / "queue.db"), backoff=0.1)
+    assert queue.next_due() is None
+    queue.add("a.txt", 1, 0.0)
+    assert queue.next_due() == 0
+
+    delays = []
+    for _ in range(2):
+        job = queue.claim()
+        queue.failed(job["id"], "boom", retry=True)
+        assert queue.claim() is None
+        delays.append(queue.next_due() - time.time())
+        time.sleep(max(queue.next_due() - time.time(), 0))
+    assert 0.05 < delays[0] <= 0.1
+    assert 0.15 < delays[1] <= 0.2
+    assert queue.claim()["attempts"] == 3
+
+    # Its file changed: due at once
+    queue.failed(job["id"], "boom", retry=True)
+    assert queue.add("a.txt", 2, 1.0)
+    assert queue.claim()["attempts"] == 1
+    queue.close()
+
+
+def test_run(mock_server, spool, tmp_path):
+    """The daemon picks up files as they're dropped, and reports its stats"""
+    reports = []
+    daemon = make_daemon(spool, tmp_path, poll=0.02)
+    thread = threading.Thread(
+        target=daemon.run, kwargs={"report": 0, "on_report": reports.append}
+    )
+    thread.start()
+    try:
+        drop(spool, "late.txt", "A file dropped while the daemon runs.")
+        deadline = time.time() + 10
+        while daemon.queue.depth()["done"] < 4 and time.time() < deadline:
+            time.sleep(0.02)
+    finally:
+        daemon.stop()
+        thread.join()
+
+    assert os.path.exists(daemon.output_path("late.txt"))
+    assert reports
+    assert set(reports[-1]) == {
+        "queued",
+        "running",
+        "done",
+        "failed",
+        "jobs_per_second",
+        "bytes_per_second",
+    }
+    daemon.close()
+
+
+def test_cli(mock_server, spool, tmp_path):
+    out = str(tmp_path / "out")
+    result = CliRunner().invoke(
+        spool_cli, [spool, "--once", "--lang", "en", "--output", out]
+    )
+    assert result.exit_code == 0, result.output
+    # Stats on stderr
+    assert json.loads(result.output.splitlines()[-1])["done"] == 3
+    assert sorted(os.listdir(out)) == ["a.mp3", "b.mp3", "c.mp3"]
+
+
+if __name__ == "__main__":
+    pytest.main(["-x", __file__])
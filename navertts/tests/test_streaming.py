@@ -0,0 +1,176 @@
+# -*- coding: utf-8 -*-
+import io
+import tracemalloc
+
+import pytest
+
+from navertts.parallel import ParallelTokenizer
+from navertts.streaming import iter_chunks
+from navertts.tts import NaverTTS
+from .conftest import part_texts
+from .test_parallel import random_text
+
+
+def split(text, size):
+    return [text[i : i + size] for i in range(0, len(text), size)]
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_imap_stream_matches_serial(seed):
+    """Streamed tokenization is exactly the serial one, whatever the chunks"""
+    text = "  \n" + random_text(seed, 3000) + "\n\n \n"
+    tts = NaverTTS(text=text)
+    pt = ParallelTokenizer.from_tts(tts, processes=1, block_size=40)
+    expected = tts._tokenize(text)
+    for size in (1, 7, 100, 10000):
+        assert sum(pt.imap_stream(split(text, size)), []) == expected
+
+
+def test_iter_stream_blocks():
+    text = "a" * 10 + "-\n\n" + "b" * 10 + "\n\n" + "c" * 10 + "\n\n  \n\n"
+    pt = ParallelTokenizer([], None, block_size=5, max_block_size=100)
+    blocks = list(pt.iter_stream_blocks(split(text, 3)))
+    assert blocks == list(pt.iter_blocks(text.strip()))
+
+
+@pytest.mark.parametrize(
+    "sentence",
+    [
+        "This is a sentence, without a blank line. Dr. Who? Yes!\n",
+        "A line that goes on-\nand on\n",
+        "no punctuation at all ",
+    ],
+)
+def test_iter_stream_blocks_bounded(sentence):
+    """Without blank lines, the buffer is still cut, exactly"""
+    text = sentence * (40000 // len(sentence))
+    tts = NaverTTS(text=text)
+    pt = ParallelTokenizer.from_tts(tts, processes=1, block_size=500)
+    chunks = split(text, 1000)
+    read = []
+
+    def stream():
+        for chunk in chunks:
+            read.append(len(chunk))
+            yield chunk
+
+    blocks = []
+    for block in pt.iter_stream_blocks(stream()):
+        blocks.append(block)
+        # What's read but not yet yielded
+        assert sum(read) - sum(map(len, blocks)) <= pt.max_block_size + 1000
+    assert len(blocks) > 1
+    assert max(map(len, blocks)) <= pt.max_block_size
+    assert "".join(blocks) == text.strip()
+    assert sum(pt.imap_stream(chunks), []) == tts._tokenize(text)
+
+
+def test_iter_stream_blocks_no_space():
+    """A "word" longer than max_block_size is cut anyway"""
+    text = "x" * 10000
+    pt = ParallelTokenizer([], None, block_size=50, max_block_size=200)
+    blocks = list(pt.iter_stream_blocks(split(text, 300)))
+    assert max(map(len, blocks)) == 200
+    assert "".join(blocks) == text
+
+
+def test_imap_stream_short():
+    text = "Hello, world."
+    tts = NaverTTS(text=text)
+    pt = ParallelTokenizer.from_tts(tts)
+    assert list(pt.imap_stream(iter([text]))) == [tts._tokenize(text)]
+    assert list(pt.imap_stream(iter([]))) == [[]]
+
+
+@pytest.mark.parametrize("newline", ["\n", "\r\n", "\r"])
+def test_iter_chunks_mmap(tmp_path, newline):
+    """Regular files are mapped and decoded like in text mode"""
+    path = tmp_path / "text.txt"
+    text = "Ça va? 这是一个三岁的小孩.\n\n" * 1000
+    path.write_bytes(text.replace("\n", newline).encode("utf-8"))
+
+    with open(str(path), encoding="utf-8") as f:
+        chunks = list(iter_chunks(f, chunk_size=4096))
+    assert len(chunks) > 1
+    assert "".join(chunks) == text
+
+
+def test_iter_chunks_empty(tmp_path):
+    path = tmp_path / "empty.txt"
+    path.touch()
+    with open(str(path), encoding="utf-8") as f:
+        assert list(iter_chunks(f)) == []
+
+
+def test_iter_chunks_not_mappable():
+    text = "Hello\n\nworld" * 100
+    chunks = list(iter_chunks(io.StringIO(text), chunk_size=50))
+    assert len(chunks) > 1
+    assert "".join(chunks) == text
+
+
+def _peak_tokenize(path):
+    tts = NaverTTS(text="x")
+    pt = ParallelTokenizer.from_tts(tts, processes=1)
+    tracemalloc.start()
+    try:
+        with open(str(path), encoding="utf-8") as f:
+            for _ in pt.imap_stream(iter_chunks(f)):
+                pass
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def test_constant_memory(tmp_path):
+    """Peak memory doesn't grow with the size of the input"""
+    paragraph = "This is a sentence, in a paragraph. Dr. Who? Yes!\n\n" * 20
+    small, large = tmp_path / "small.txt", tmp_path / "large.txt"
+    small.write_text(paragraph * 100, encoding="utf-8")
+    large.write_text(paragraph * 1000, encoding="utf-8")
+
+    peak_small = _peak_tokenize(small)
+    peak_large = _peak_tokenize(large)
+    assert large.stat().st_size > 1000000
+    assert peak_large < 2 * peak_small
+
+
+def test_stream_to_fp(mock_server, monkeypatch):
+    """Parts are sent as they are read, with a bounded window"""
+    monkeypatch.setattr(NaverTTS, "NAVER_TTS_STREAM_BLOCK_SIZE", 500)
+    mock_server.delay = 0.01
+    paragraphs = [
+        "Paragraph number %d is long enough to be a few parts of its own, "
+        "it goes on and on. And then it ends.\n\n" % i
+        for i in range(50)
+    ]
+    text = "".join(paragraphs)
+    expected = NaverTTS(text=text)._tokenize(text)
+
+    read = []
+
+    def chunks():
+        for p in paragraphs:
+            read.append(p)
+            yield p
+
+    fp = io.BytesIO()
+    stream = NaverTTS(text=chunks()).stream_to_fp(fp)
+    first = next(stream)
+    assert first.index == 0
+    assert len(read) < len(paragraphs)
+
+    parts = [first] + list(stream)
+    assert [p.text for p in parts] == expected
+    assert part_texts(fp.getvalue()) == expected
+    assert mock_server.max_active <= NaverTTS.NAVER_TTS_STREAM_WINDOW
+
+
+def test_stream_to_fp_empty(mock_server):
+    tts = NaverTTS(text=iter(["  ", "\n"]))
+    with pytest.raises(AssertionError):
+        tts.write_to_fp(io.BytesIO())
+
+
+if __name__ == "__main__":
+    pytest.main(["-x", __file__])
@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+import io
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from navertts import tts as tts_module
+from navertts.cancel import CancelToken
+from navertts.tts import NaverTTS, NaverTTSCancelled, Voice
+from .conftest import part_texts
+
+THREADS = 32
+SYNTHESES = 2000
+
+TEXT = " ".join("Sentence number %d is right here." % i for i in range(6))
+
+
+def text_of(i):
+    """A text of 1 to 3 parts, the same for every ``i`` modulo 500"""
+    i %= 500
+    return " ".join(
+        "Text %d says sentence %d out loud right here and now." % (i, j)
+        for j in range(1 + i % 3 * 2)
+    )
+
+
+def check_output(tts, data, results):
+    """Check that ``data`` holds the parts of ``tts``, in order"""
+    parts = tts._tokenize(tts.text)
+    assert part_texts(data) == parts
+    assert [r.index for r in results] == list(range(len(parts)))
+    assert [r.text for r in results] == parts
+    offset = 0
+    for r in results:
+        assert r.offset == offset
+        offset += r.size
+    assert offset == len(data)
+
+
+def test_immutable():
+    tts = NaverTTS(text="test", lang="en")
+    with pytest.raises(AttributeError):
+        tts.text = "other"
+    with pytest.raises(AttributeError):
+        del tts.voice
+    assert tts.text == "test"
+
+
+def test_default_pipeline():
+    a = NaverTTS(text="test", lang="en")
+    b = NaverTTS(text="test", lang="en")
+    assert a.pre_processor_funcs == tts_module.DEFAULT_PRE_PROCESSORS
+    assert a.tokenizer_func == b.tokenizer_func
+
+    # A list of pre-processors is copied: changing it changes nothing
+    funcs = [str.upper]
+    tts = NaverTTS(text="test", lang="en", pre_processor_funcs=funcs)
+    funcs.append(str.lower)
+    assert tts.pre_processor_funcs == (str.upper,)
+    assert tts._tokenize("test") == ["TEST"]
+
+
+@pytest.mark.parametrize("scheduler", [16], indirect=True)
+def test_shared_voice(mock_server, scheduler):
+    """Thousands of concurrent syntheses with one voice"""
+    voice = Voice(lang="en")
+
+    def synthesize(i):
+        tts = NaverTTS(text=text_of(i), voice=voice)
+        fp = io.BytesIO()
+        results = tts.write_to_fp(fp)
+        check_output(tts, fp.getvalue(), results)
+        return len(results)
+
+    with ThreadPoolExecutor(THREADS) as pool:
+        parts = list(pool.map(synthesize, range(SYNTHESES)))
+    assert sum(parts) == sum(1 + i % 500 % 3 * 2 for i in range(SYNTHESES))
+    # Identical parts in flight at the same time may be fetched once
+    assert 0 < mock_server.total_hits <= sum(parts)
+
+
+@pytest.mark.parametrize("scheduler", [16], indirect=True)
+def test_shared_object(mock_server, scheduler):
+    """One object read by many threads at a time"""
+    tts = NaverTTS(text=TEXT, lang="en")
+
+    def synthesize(i):
+        fp = io.BytesIO()
+        results = tts.write_to_fp(fp)
+        check_output(tts, fp.getvalue(), results)
+        return fp.getvalue()
+
+    with ThreadPoolExecutor(THREADS) as pool:
+        outputs = list(pool.map(synthesize, range(THREADS * 8)))
+    assert len(set(outputs)) == 1
+
+
+@pytest.mark.parametrize("scheduler", [16], indirect=True)
+def test_cancelled_calls(mock_server, scheduler):
+    """Cancelled calls don't spoil the others"""
+    mock_server.delay = 0.005
+    voice = Voice(lang="en")
+
+    def synthesize(i):
+        tts = NaverTTS(text=text_of(i), voice=voice)
+        fp = io.BytesIO()
+        if i % 4 == 0:
+            cancel = CancelToken()
+            cancel.cancel()
+            with pytest.raises(NaverTTSCancelled):
+                tts.write_to_fp(fp, cancel=cancel)
+            return False
+        results = tts.write_to_fp(fp)
+        check_output(tts, fp.getvalue(), results)
+        return True
+
+    with ThreadPoolExecutor(THREADS) as pool:
+        done = list(pool.map(synthesize, range(SYNTHESES // 4)))
+    assert done.count(True) == SYNTHESES // 4 * 3 // 4
+
+
+if __name__ == "__main__":
+    pytest.main(["-x", __file__])
@@ -0,0 +1,136 @@
+# -*- coding: utf-8 -*-
+import io
+import socket
+
+import pytest
+
+from navertts import constants, transport
+from navertts.transport import (
+    ConnectError,
+    FakeTransport,
+    RequestsTransport,
+    Transport,
+    TransportTimeout,
+    Urllib3Transport,
+)
+from navertts.tts import NaverTTS, NaverTTSError, NaverTTSTimeout
+from .conftest import fake_mp3, part_texts
+
+TEXT = "첫 번째 문장입니다. 두 번째 문장입니다! 세 번째 문장은 조금 더 깁니다?"
+
+TRANSPORTS = [RequestsTransport, Urllib3Transport]
+
+
+@pytest.fixture
+def dead_url():
+    """The URL of a port nothing listens on"""
+    s = socket.socket()
+    s.bind(("127.0.0.1", 0))
+    port = s.getsockname()[1]
+    s.close()
+    return "http://127.0.0.1:%d/api/nvoice" % port
+
+
+@pytest.mark.parametrize("cls", TRANSPORTS)
+def test_write_to_fp(mock_server, cls):
+    tts = NaverTTS(text=TEXT, lang="ko", transport=cls())
+    fp = io.BytesIO()
+    tts.write_to_fp(fp)
+    # Unicode text is quoted the same way by every transport
+    assert part_texts(fp.getvalue()) == tts._tokenize(TEXT)
+    tts.transport.close()
+
+
+@pytest.mark.parametrize("cls", TRANSPORTS)
+def test_response(mock_server, cls):
+    t = cls()
+    r = t.get(mock_server.endpoint + "?text=hi", {"X-Test": "1"}, (1, 1))
+    assert (r.status_code, r.reason) == (200, "OK")
+    assert r.headers["content-type"] == "audio/mpeg"
+    assert b"".join(r.iter_content(100)) == fake_mp3("hi")
+    r.close()
+
+    mock_server.status = 404
+    r = t.get(mock_server.endpoint + "?text=hi", {}, (1, 1))
+    assert r.status_code == 404
+    r.close()
+    t.close()
+
+
+@pytest.mark.parametrize("cls", TRANSPORTS)
+def test_abandoned(mock_server, cls):
+    """A response dropped before the end doesn't spoil the next requests"""
+    mock_server.body = lambda query: fake_mp3(query["text"], frames=1000)
+    t = cls()
+    for i in range(3):
+        r = t.get(mock_server.endpoint + "?text=%d" % i, {}, (1, 1))
+        next(iter(r.iter_content(10)))
+        r.close()
+    r = t.get(mock_server.endpoint + "?text=last", {}, (1, 1))
+    assert b"".join(r.iter_content(1 << 14)) == fake_mp3("last", frames=1000)
+    r.close()
+    t.close()
+
+
+@pytest.mark.parametrize("cls", TRANSPORTS)
+def test_errors(mock_server, dead_url, cls):
+    t = cls()
+    with pytest.raises(ConnectError):
+        t.get(dead_url, {}, (1, 1))
+
+    mock_server.delay = 0.5
+    with pytest.raises(TransportTimeout) as e:
+        t.get(mock_server.endpoint, {}, (1, 0.1))
+    assert not isinstance(e.value, ConnectError)
+    t.close()
+
+
+def test_timeout(mock_server):
+    mock_server.delay = 0.5
+    with pytest.raises(NaverTTSTimeout):
+        NaverTTS(text="test", lang="en", timeout=0.1).write_to_fp(io.BytesIO())
+
+
+def test_fake():
+    fake = FakeTransport(body=lambda query: fake_mp3(query["text"]))
+    tts = NaverTTS(text=TEXT, transport=fake)
+    fp = io.BytesIO()
+    tts.write_to_fp(fp)
+    assert part_texts(fp.getvalue()) == tts._tokenize(TEXT)
+    assert sum(fake.hits.values()) == len(tts._tokenize(TEXT))
+    assert all(url.startswith(constants.translate_base()) for url in fake.hits)
+
+    fake = FakeTransport(status=503)
+    with pytest.raises(NaverTTSError) as e:
+        NaverTTS(text="test", transport=fake).write_to_fp(io.BytesIO())
+    assert e.value.rsp.status_code == 503
+
+
+def test_default_body():
+    fp = io.BytesIO()
+    results = NaverTTS(text="test", transport=FakeTransport()).write_to_fp(fp)
+    assert results[0].frames == 4
+    assert len(fp.getvalue()) == 4 * 417
+
+
+def test_process_wide(monkeypatch):
+    assert isinstance(transport.get_transport(), Urllib3Transport)
+    fake = FakeTransport()
+    monkeypatch.setattr(transport, "_transport", fake)
+    NaverTTS(text="test").write_to_fp(io.BytesIO())
+    assert sum(fake.hits.values()) == 1
+
+    # Set on the object, a transport wins over the process-wide one
+    other = FakeTransport()
+    NaverTTS(text="test", transport=other).write_to_fp(io.BytesIO())
+    assert sum(fake.hits.values()) == 1
+    assert sum(other.hits.values()) == 1
+
+
+def test_interface():
+    with pytest.raises(NotImplementedError):
+        Transport().get("http://example.com", {}, (1, 1))
+
+
+if __name__ == "__main__":
+    pytest.main(["-x", __file__])
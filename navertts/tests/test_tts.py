@@ -1,10 +1,16 @@
 # -*- coding: utf-8 -*-
+import io
+import json
 import os
 import pytest
+import time
 from mock import Mock
 
-from navertts.tts import NaverTTS, NaverTTSError
+from navertts.tts import NaverTTS, NaverTTSError, NaverTTSInvalidPayload, Voice
 from navertts.lang import _extra_langs
+from navertts import mp3
+from navertts.transport import RequestsTransport, Urllib3Transport
+from .conftest import fake_mp3, part_texts
 
 # Testing all languages takes some time.
 # Set TEST_LANGS envvar to choose languages to test.
@@ -158,6 +164,44 @@ def test_infer_msg():
     assert error100.msg == "100 (ddd) from TTS API. Probable cause: Unknown"
 
 
+def test_voice_shared():
+    """A Voice can be shared by many NaverTTS objects"""
+    voice = Voice(lang="EN", speed="slow", gender="m")
+    assert (voice.lang, voice.speed, voice.speaker) == ("en", 5, "matt")
+
+    tts1 = NaverTTS(text="one", voice=voice)
+    tts2 = NaverTTS(text="two", lang="ko", voice=voice)
+    assert tts1.voice is tts2.voice is voice
+    assert (tts2.lang, tts2.tld, tts2.speed, tts2.speaker) == ("en", "com", 5, "matt")
+
+
+def test_voice_immutable():
+    """Voice attributes can't be changed, NaverTTS has no __dict__"""
+    voice = Voice()
+    with pytest.raises(AttributeError):
+        voice.lang = "en"
+    with pytest.raises(AttributeError):
+        NaverTTS(text="test").foo = "bar"
+
+
+def test_voice_equality_and_pickle():
+    """Voices compare by value and survive pickling"""
+    import pickle
+
+    voice = Voice(lang="ja", speed=3)
+    assert voice == Voice(lang="ja", speed=3)
+    assert voice != Voice(lang="ja", speed=2)
+    assert hash(voice) == hash(Voice(lang="ja", speed=3))
+    assert pickle.loads(pickle.dumps(voice)) == voice
+
+
+@pytest.mark.parametrize("speed", ["medium", 6, -6, None])
+def test_bad_speed(speed):
+    """Raise ValueError on invalid speed"""
+    with pytest.raises(ValueError):
+        Voice(speed=speed)
+
+
 def test_WebRequest(tmp_path):
     """Test Web Requests."""
     text = "Lorem ipsum"
@@ -173,5 +217,175 @@ def test_WebRequest(tmp_path):
         tts.save(filename)
 
 
+INDEX_TEXT = (
+    "The first part of the text is long enough to be cut in a few parts. "
+    "Then comes the second part. And at last the third part!"
+)
+
+
+def test_write_to_fp_index(mock_server):
+    """Parts are indexed by their byte offset and start time in the output"""
+    fp = io.BytesIO()
+    parts = NaverTTS(text=INDEX_TEXT, lang="en").write_to_fp(fp)
+    data = fp.getvalue()
+    assert len(parts) == 3
+
+    offset, start = 0, 0.0
+    for part in parts:
+        assert (part.offset, part.start) == (offset, pytest.approx(start))
+        chunk = data[part.offset : part.offset + part.size]
+        scanner = mp3.scan(chunk)
+        assert part.frames == scanner.frames == 4
+        assert part.duration == pytest.approx(scanner.duration)
+        offset += part.size
+        start += part.duration
+    assert offset == len(data)
+
+
+def test_save_index(tmp_path, mock_server):
+    savefile = str(tmp_path / "out.mp3")
+    index = str(tmp_path / "out.json")
+    parts = NaverTTS(text=INDEX_TEXT, lang="en").save(savefile, index=index)
+
+    with open(index, encoding="utf-8") as f:
+        saved = json.load(f)
+    assert saved["parts"] == parts
+    assert saved["size"] == os.path.getsize(savefile)
+    assert saved["duration"] == pytest.approx(
+        mp3.scan(open(savefile, "rb").read()).duration
+    )
+    assert [p["index"] for p in parts] == [0, 1, 2]
+    assert parts[1]["offset"] == parts[0]["size"]
+
+
+@pytest.mark.parametrize("scheduler", [8], indirect=True)
+def test_write_variants(mock_server, scheduler):
+    """Variants are tokenized once, fetched together and written apart"""
+    calls = []
+
+    def counting(text):
+        calls.append(text)
+        return text
+
+    tts = NaverTTS(text=INDEX_TEXT, lang="en", pre_processor_funcs=[counting])
+    voices = [Voice(lang="en"), Voice(lang="en", gender="m", speed="slow")]
+    fps = [io.BytesIO(), io.BytesIO()]
+    mock_server.delay = 0.2
+
+    start = time.time()
+    results = tts.write_variants(list(zip(voices, fps)))
+    elapsed = time.time() - start
+
+    assert len(calls) == 1
+    # 6 requests at once rather than 2 x 3 in a row
+    assert mock_server.max_active == 6
+    parts = tts._tokenize(INDEX_TEXT)
+    for voice, fp, result in zip(voices, fps, results):
+        assert result.voice == voice
+        assert part_texts(fp.getvalue()) == parts
+        assert [p.index for p in result.parts] == [0, 1, 2]
+        assert result.size == len(fp.getvalue())
+        assert result.parts[-1].offset + result.parts[-1].size == result.size
+        assert 0.2 <= result.elapsed <= elapsed
+        assert result.to_dict()["speaker"] == voice.speaker
+    speakers = [p.split("speaker=")[1].split("&")[0] for p in mock_server.hits]
+    assert sorted(speakers) == ["danna"] * 3 + ["matt"] * 3
+
+
+def test_write_variants_streamed(mock_server):
+    tts = NaverTTS(text=iter([INDEX_TEXT[:50], INDEX_TEXT[50:]]), lang="en")
+    fps = [io.BytesIO(), io.BytesIO()]
+    voices = [Voice(lang="en"), Voice(lang="en", speed="fast")]
+    tts.write_variants(list(zip(voices, fps)))
+
+    parts = NaverTTS(text=INDEX_TEXT, lang="en")._tokenize(INDEX_TEXT)
+    assert part_texts(fps[0].getvalue()) == part_texts(fps[1].getvalue()) == parts
+
+
+def test_write_variants_empty():
+    with pytest.raises(AssertionError):
+        NaverTTS(text=INDEX_TEXT).write_variants([])
+
+
+ERROR_PAGE = b"<!DOCTYPE html><html><body>Service unavailable</body></html>"
+
+
+@pytest.mark.parametrize(
+    "content_type,body,error",
+    [
+        ("text/html", ERROR_PAGE, "content type 'text/html'"),
+        ("audio/mpeg", ERROR_PAGE * 10, "Not mp3 content: b'<!DOCTYPE"),
+        ("audio/mpeg", b"", "Got 0 byte(s)"),
+        ("audio/mpeg", b"ID3\x03\x00", "Got 5 byte(s)"),
+    ],
+)
+def test_invalid_payload(mock_server, content_type, body, error):
+    """Parts that aren't mp3 content fail before anything is written"""
+    mock_server.content_type = content_type
+    mock_server.body = lambda query: body
+    fp = io.BytesIO()
+    with pytest.raises(NaverTTSInvalidPayload) as e:
+        NaverTTS(text="test", lang="en").write_to_fp(fp)
+    assert error in str(e.value)
+    assert e.value.rsp.status_code == 200
+    assert fp.getvalue() == b""
+
+
+@pytest.mark.parametrize("transport", [RequestsTransport, Urllib3Transport])
+def test_invalid_payload_read(mock_server, transport):
+    """An invalid body is rejected from its first chunk"""
+    mock_server.body = lambda query: ERROR_PAGE * 10000
+    chunks = []
+
+    class Counting(transport):
+        def get(self, *args):
+            r = super(Counting, self).get(*args)
+            iter_content = r.iter_content
+
+            def counting(chunk_size):
+                for chunk in iter_content(chunk_size):
+                    chunks.append(len(chunk))
+                    yield chunk
+
+            r.iter_content = counting
+            return r
+
+    with pytest.raises(NaverTTSInvalidPayload):
+        tts = NaverTTS(text="test", lang="en", transport=Counting())
+        tts.write_to_fp(io.BytesIO())
+    assert len(chunks) == 1
+    assert chunks[0] < len(ERROR_PAGE) * 10000
+
+
+@pytest.mark.parametrize("retries", [0, 1])
+def test_invalid_payload_retries(mock_server, retries):
+    sent = []
+
+    def body(query):
+        sent.append(query["text"])
+        return ERROR_PAGE if len(sent) == 1 else fake_mp3(query["text"])
+
+    mock_server.body = body
+    fp = io.BytesIO()
+    tts = NaverTTS(text="test", lang="en", payload_retries=retries)
+    if retries:
+        tts.write_to_fp(fp)
+        assert part_texts(fp.getvalue()) == ["test"]
+    else:
+        with pytest.raises(NaverTTSInvalidPayload):
+            tts.write_to_fp(fp)
+    assert sent == ["test"] * (retries + 1)
+
+
+def test_payload_retries_default(monkeypatch):
+    assert NaverTTS(text="test").payload_retries == 0
+    monkeypatch.setattr(NaverTTS, "NAVER_TTS_PAYLOAD_RETRIES", 2)
+    tts = NaverTTS(text="test")
+    assert tts.payload_retries == 2
+    # Copies keep it
+    assert tts._replace(priority="bulk").payload_retries == 2
+    assert NaverTTS(text="test", payload_retries=1).payload_retries == 1
+
+
 if __name__ == "__main__":
     pytest.main(["-x", __file__])
@@ -3,8 +3,12 @@ from .core import PreProcessorRegex
 from .core import PreProcessorSub
 from .core import RegexBuilder
 from .core import Tokenizer
+from .dictionary import PreProcessorDict
+from .scanner import ScanCase
+from .scanner import ScanTokenizer
 
 from . import pre_processors
+from . import scanner
 from . import tokenizer_cases
 
 __all__ = [
@@ -12,6 +16,10 @@ __all__ = [
     "PreProcessorRegex",
     "PreProcessorSub",
     "Tokenizer",
+    "PreProcessorDict",
+    "ScanCase",
+    "ScanTokenizer",
     "pre_processors",
+    "scanner",
     "tokenizer_cases",
 ]
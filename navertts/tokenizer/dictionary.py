@@ -0,0 +1,228 @@
+# -*- coding: utf-8 -*-
+import io
+import re
+
+# Node key holding the replacement of the entry ending at that node
+# (never a character, so never a child key)
+_END = ""
+
+# Same as ``\w`` in a ``str`` pattern
+_WORD = re.compile(r"\w")
+
+
+def _fold(c):
+    """Lowercase a single character, keeping it a single character."""
+    lower = c.lower()
+    return lower if len(lower) == 1 else c
+
+
+class PreProcessorDict:
+    r"""Dictionary-based substitution text pre-processor.
+
+    Like :class:`navertts.tokenizer.core.PreProcessorSub`, but for
+    dictionaries with thousands of entries. Instead of one regex (and one
+    pass over the text) per entry, the entries are stored in a trie, built
+    once, and the text is scanned once: at each position where an entry can
+    start, the trie is walked as far as the text allows, so the cost per
+    character doesn't depend on the size of the dictionary.
+
+    Where entries overlap, the leftmost match wins, then the longest.
+    Replaced text is not searched again.
+
+    Args:
+        entries (iterable): ``(<search str>, <replacement>)`` pairs, or a
+            ``dict``. A replacement is either a string or a function taking
+            the matched text and returning its replacement.
+        ignore_case (bool): Ignore case during search. Defaults to ``True``.
+        word_boundaries (bool): Only match whole words, i.e. an entry that
+            starts (ends) with a word character can't be preceded (followed)
+            by one. Defaults to ``True``.
+
+    Example:
+        Expand a few abbreviations, whatever their case::
+
+            >>> pp = PreProcessorDict([('btw', 'by the way'), ('Dr.', 'Doctor')])
+            >>> pp.run("BTW, dr. Who isn't a drbtw.")
+            "by the way, Doctor Who isn't a drbtw."
+
+        Load a large dictionary from a tab-separated file, the first time
+        it's used::
+
+            >>> pp = PreProcessorDict.from_file("pronunciations.tsv")
+            >>> tts = NaverTTS(text, pre_processor_funcs=[pp.run])
+
+    """
+
+    def __init__(self, entries=(), ignore_case=True, word_boundaries=True):
+        """Create the preprocessor."""
+        self.ignore_case = ignore_case
+        self.word_boundaries = word_boundaries
+        self._entries = entries
+        self._trie = None
+        self._starts = None
+
+    @classmethod
+    def from_file(cls, path, sep="\t", encoding="utf-8", **kwargs):
+        """Create a preprocessor from a dictionary file, loaded lazily.
+
+        The file has one ``<search str><sep><replacement>`` entry per line.
+        Empty lines and lines starting with ``#`` are skipped. The file is
+        only read (and the trie built) on the first :meth:`run`.
+
+        Args:
+            path (string): Path to the dictionary file.
+            sep (string): Separator between search string and replacement.
+            encoding (string): Encoding of the file.
+            **kwargs: Other :class:`PreProcessorDict` arguments.
+
+        Returns:
+            PreProcessorDict: The (unloaded) preprocessor.
+
+        """
+        return cls(_FileEntries(path, sep, encoding), **kwargs)
+
+    def _build(self):
+        entries = self._entries
+        if isinstance(entries, dict):
+            entries = entries.items()
+
+        trie = {}
+        starts = set()
+        for search, repl in entries:
+            if not search:
+                raise ValueError("Empty search string (replacement: {!r})".format(repl))
+            key = self._fold(search)
+            node = trie
+            for c in key:
+                node = node.setdefault(c, {})
+            node[_END] = (repl, self._is_word(search[-1]))
+            starts.add((key[0], self._is_word(search[0])))
+
+        # Positions where an entry can start: its first character, not
+        # preceded by a word character if it's itself a word character.
+        alts = []
+        word = "".join(re.escape(c) for c, w in sorted(starts) if w)
+        other = "".join(re.escape(c) for c, w in sorted(starts) if not w)
+        if word:
+            alts.append(
+                "{}[{}]".format(r"(?<!\w)" if self.word_boundaries else "", word)
+            )
+        if other:
+            alts.append("[{}]".format(other))
+        starts = re.compile("|".join(alts)) if alts else None
+
+        # Set last: the instance can be shared between threads
+        self._trie = trie
+        self._starts = starts
+
+    def _fold(self, text):
+        if not self.ignore_case:
+            return text
+        folded = text.lower()
+        if len(folded) != len(text):
+            # Keep indices aligned with ``text``
+            folded = "".join(_fold(c) for c in text)
+        return folded
+
+    def _is_word(self, c):
+        return self.word_boundaries and _WORD.match(c) is not None
+
+    def __len__(self):
+        """Number of entries in the dictionary (loads it)."""
+        if self._trie is None:
+            self._build()
+        count = 0
+        stack = [self._trie]
+        while stack:
+            node = stack.pop()
+            for c, child in node.items():
+                if c == _END:
+                    count += 1
+                else:
+                    stack.append(child)
+        return count
+
+    def run(self, text):
+        """Run the substitutions on ``text``.
+
+        Args:
+            text (string): the input text.
+
+        Returns:
+            string: text after all substitutions have been applied.
+
+        """
+        if self._trie is None:
+            self._build()
+        if self._starts is None:
+            return text
+
+        trie = self._trie
+        folded = self._fold(text)
+        n = len(text)
+        out = []
+        last = 0
+        for m in self._starts.finditer(folded):
+            start = m.start()
+            if start < last:
+                continue
+
+            # Walk the trie for the longest entry starting here
+            node = trie
+            match = None
+            i = start
+            while i < n:
+                node = node.get(folded[i])
+                if node is None:
+                    break
+                i += 1
+                end = node.get(_END)
+                if end is not None and not (
+                    end[1] and i < n and _WORD.match(text, i) is not None
+                ):
+                    match = (i, end[0])
+            if match is None:
+                continue
+
+            end, repl = match
+            out.append(text[last:start])
+            out.append(repl if isinstance(repl, str) else repl(text[start:end]))
+            last = end
+
+        if not out:
+            return text
+        out.append(text[last:])
+        return "".join(out)
+
+    def __repr__(self):  # pragma: no cover
+        """Print the preprocessor."""
+        if self._trie is None:
+            return "PreProcessorDict({!r})".format(self._entries)
+        return "PreProcessorDict(<{} entries>)".format(len(self))
+
+
+class _FileEntries:
+    """Entries of a dictionary file, read when iterated."""
+
+    def __init__(self, path, sep, encoding):
+        self.path = path
+        self.sep = sep
+        self.encoding = encoding
+
+    def __iter__(self):
+        with io.open(self.path, encoding=self.encoding) as f:
+            for line in f:
+                line = line.rstrip("\r\n")
+                if not line or line.startswith("#"):
+                    continue
+                search, sep, repl = line.partition(self.sep)
+                if not sep:
+                    raise ValueError(
+                        "{}: no separator {!r} in line {!r}".format(
+                            self.path, self.sep, line
+                        )
+                    )
+                yield search, repl
+
+    def __repr__(self):  # pragma: no cover
+        return "<file {!r}>".format(self.path)
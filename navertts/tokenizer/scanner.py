@@ -0,0 +1,257 @@
+# -*- coding: utf-8 -*-
+from . import symbols
+import re
+
+
+class ScanCase:
+    """A tokenizer case for the :class:`ScanTokenizer`.
+
+    Instead of a regex, a scan case is defined by the characters that can
+    trigger it and a function that decides whether it matches at a given
+    position, looking around as far as it needs to.
+
+    Args:
+        triggers (string): Characters that can trigger the case.
+        match (callable): A function taking ``(text, start)`` and returning
+            the (exclusive) end index of the match starting at ``start``, or
+            ``None`` when the case doesn't match there. A match must not be
+            empty.
+        offset (int): Where a match starts relative to its trigger
+            character. For example, ``1`` for a case that cuts on the
+            character *following* a trigger. Defaults to ``0``.
+
+    Example:
+        Cut on a semicolon, unless it's preceded by an ampersand
+        (e.g. ``&amp;``)::
+
+            >>> def match(text, start):
+            ...     if start and text[start - 1] == "&":
+            ...         return None
+            ...     return start + 1
+            >>> case = ScanCase(";", match)
+
+    """
+
+    def __init__(self, triggers, match, offset=0):
+        """Create the scan case."""
+        self.triggers = triggers
+        self.match = match
+        self.offset = offset
+
+    def __repr__(self):  # pragma: no cover
+        """Print the scan case."""
+        return "ScanCase({!r}, offset={})".format(self.triggers, self.offset)
+
+
+class ScanTokenizer:
+    r"""A single-pass tokenizer, equivalent to a :class:`Tokenizer`.
+
+    Precomputes a table of all the characters that can trigger one of its
+    ``cases`` and makes a single linear scan of the text for them (a simple
+    character class search). Each case is only evaluated at the positions
+    its own triggers point to, instead of evaluating every case at every
+    position as an alternation of lookbehind patterns does.
+
+    When more than one case match at the same position, the first one in
+    ``cases`` wins, just like the first alternative of a regex. Cutting
+    then resumes after the match. The result is the same as ``re.split``.
+
+    Args:
+        cases (list): List of :class:`ScanCase`. Defaults to the equivalents
+            of the default :class:`navertts.NaverTTS` tokenizer cases, i.e.
+            :func:`tone_marks`, :func:`period_comma`, :func:`colon` and
+            :func:`other_punctuation`.
+
+    Example:
+        A drop-in replacement for the default tokenizer::
+
+            >>> tts = NaverTTS(text, tokenizer_func=ScanTokenizer().run)
+
+    """
+
+    def __init__(self, cases=None):
+        """Create the tokenizer."""
+        if cases is None:
+            cases = [tone_marks(), period_comma(), colon(), other_punctuation()]
+        self.cases = list(cases)
+
+        # Character table: trigger -> ((offset, case index), ...)
+        table = {}
+        for i, case in enumerate(self.cases):
+            for c in case.triggers:
+                entry = (case.offset, i)
+                if entry not in table.setdefault(c, []):
+                    table[c].append(entry)
+        self._table = {c: tuple(entries) for c, entries in table.items()}
+        self._matches = [case.match for case in self.cases]
+        self._triggers = None
+        if table:
+            self._triggers = re.compile(
+                "[{}]".format("".join(re.escape(c) for c in sorted(table)))
+            )
+
+    def run(self, text):
+        """Tokenize `text`.
+
+        Args:
+            text (string): the input text to tokenize.
+
+        Returns:
+            list: A list of strings (token) split according to the tokenizer cases.
+
+        """
+        if self._triggers is None:
+            return [text]
+
+        table = self._table
+        matches = self._matches
+        n = len(text)
+        tokens = []
+        last = 0
+        # Candidate starts after the current trigger: start -> case indices
+        pending = {}
+
+        for m in self._triggers.finditer(text):
+            t = m.start()
+            here = None
+            if pending:
+                # Later triggers can't start a match before `t`
+                for s in sorted(pending):
+                    if s > t:
+                        break
+                    if s == t:
+                        here = pending.pop(s)
+                    else:
+                        last = self._cut(text, s, pending.pop(s), last, tokens)
+
+            for offset, i in table[text[t]]:
+                if offset:
+                    pending.setdefault(t + offset, []).append(i)
+                elif here is None:
+                    here = [i]
+                else:
+                    here.append(i)
+
+            if here is not None and t >= last:
+                if len(here) == 1:
+                    end = matches[here[0]](text, t)
+                    if end is not None:
+                        tokens.append(text[last:t])
+                        last = end
+                else:
+                    last = self._cut(text, t, here, last, tokens)
+
+        for s in sorted(pending):
+            if s < n:
+                last = self._cut(text, s, pending[s], last, tokens)
+
+        tokens.append(text[last:])
+        return tokens
+
+    def _cut(self, text, start, cases, last, tokens):
+        """Try ``cases`` (indices) in order at ``start``, cut on a match.
+
+        Returns:
+            int: The new start of the current token.
+
+        """
+        if start < last:
+            return last
+        for i in sorted(set(cases)):
+            end = self._matches[i](text, start)
+            if end is not None:
+                tokens.append(text[last:start])
+                return end
+        return last
+
+    def __repr__(self):  # pragma: no cover
+        """Print the tokenizer."""
+        return "ScanTokenizer({})".format(self.cases)
+
+
+# Single characters classes, as matched with ``re.IGNORECASE``
+_LETTER = re.compile("[a-z]", re.IGNORECASE)
+_DIGIT = re.compile(r"\d")
+
+# Character tables
+_TONE_MARKS = frozenset(symbols.TONE_MARKS)
+_PERIOD_COMMA = frozenset(symbols.PERIOD_COMMA)
+_COLON = frozenset(symbols.COLON)
+_ALL_PUNC = frozenset(symbols.ALL_PUNC)
+_OTHER_PUNC = _ALL_PUNC - _TONE_MARKS - _PERIOD_COMMA - _COLON
+
+
+def _match_tone_marks(text, start):
+    if start and text[start - 1] in _TONE_MARKS and text[start] != "\n":
+        return start + 1
+    return None
+
+
+def _match_period_comma(text, start):
+    if text[start] not in _PERIOD_COMMA or text[start + 1 : start + 2] != " ":
+        return None
+    if start >= 2 and text[start - 2] == "." and _LETTER.match(text, start - 1):
+        return None
+    return start + 2
+
+
+def _match_colon(text, start):
+    if text[start] not in _COLON:
+        return None
+    if start and _DIGIT.match(text, start - 1):
+        return None
+    return start + 1
+
+
+def _match_other_punctuation(text, start):
+    return start + 1 if text[start] in _OTHER_PUNC else None
+
+
+def _match_all_punctuation(text, start):
+    return start + 1 if text[start] in _ALL_PUNC else None
+
+
+def tone_marks():
+    """Cut on the character following tone-modifying punctuation.
+
+    Same as :func:`navertts.tokenizer.tokenizer_cases.tone_marks`.
+
+    """
+    return ScanCase(symbols.TONE_MARKS, _match_tone_marks, offset=1)
+
+
+def period_comma():
+    """Cut on a period or comma followed by a space.
+
+    Same as :func:`navertts.tokenizer.tokenizer_cases.period_comma`: won't cut
+    when preceded by ".<letter>" (dotted abbreviations).
+
+    """
+    return ScanCase(symbols.PERIOD_COMMA, _match_period_comma)
+
+
+def colon():
+    """Cut on a colon not preceded by a digit.
+
+    Same as :func:`navertts.tokenizer.tokenizer_cases.colon`.
+
+    """
+    return ScanCase(symbols.COLON, _match_colon)
+
+
+def other_punctuation():
+    """Cut on other punctuation.
+
+    Same as :func:`navertts.tokenizer.tokenizer_cases.other_punctuation`.
+
+    """
+    return ScanCase("".join(sorted(_OTHER_PUNC)), _match_other_punctuation)
+
+
+def legacy_all_punctuation():
+    """Cut on all punctuation.
+
+    Same as :func:`navertts.tokenizer.tokenizer_cases.legacy_all_punctuation`.
+
+    """
+    return ScanCase("".join(sorted(_ALL_PUNC)), _match_all_punctuation)
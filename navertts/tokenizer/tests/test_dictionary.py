@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+import os
+import pickle
+import shutil
+import tempfile
+import unittest
+
+from navertts.tokenizer.dictionary import PreProcessorDict
+
+
+class TestPreProcessorDict(unittest.TestCase):
+    def test_preprocessordict(self):
+        pp = PreProcessorDict([("btw", "by the way"), ("Dr.", "Doctor")])
+        self.assertEqual(
+            pp.run("BTW, dr. Who isn't a drbtw."),
+            "by the way, Doctor Who isn't a drbtw.",
+        )
+
+    def test_longest_match(self):
+        pp = PreProcessorDict({"new": "N", "new york": "NY"})
+        self.assertEqual(pp.run("New York newer new"), "NY newer N")
+
+    def test_single_pass(self):
+        """Replacements aren't searched again"""
+        pp = PreProcessorDict([("a", "b"), ("b", "c")])
+        self.assertEqual(pp.run("a b"), "b c")
+
+    def test_case_sensitive(self):
+        pp = PreProcessorDict([("Mac", "PC")], ignore_case=False)
+        self.assertEqual(pp.run("Mac mac"), "PC mac")
+
+    def test_word_boundaries(self):
+        pp = PreProcessorDict([("M.", "Monsieur")])
+        self.assertEqual(pp.run("M. Bacon, IAM. Bacon"), "Monsieur Bacon, IAM. Bacon")
+
+        pp = PreProcessorDict([("a", "x")], word_boundaries=False)
+        self.assertEqual(pp.run("banana"), "bxnxnx")
+
+    def test_callable_repl(self):
+        """Same as the ``abbreviations`` pre-processor, keeping case"""
+        pp = PreProcessorDict([(a + ".", lambda m: m[:-1]) for a in ("dr", "jr")])
+        self.assertEqual(pp.run("Dr. Jones jr. cdr."), "Dr Jones jr cdr.")
+
+    def test_many_entries(self):
+        entries = [("word{}".format(i), "w{}".format(i)) for i in range(20000)]
+        pp = PreProcessorDict(entries)
+        self.assertEqual(len(pp), 20000)
+        self.assertEqual(pp.run("word12345 word123456 WORD7"), "w12345 word123456 w7")
+
+    def test_pickle(self):
+        pp = pickle.loads(pickle.dumps(PreProcessorDict({"btw": "by the way"})))
+        self.assertEqual(pp.run("btw"), "by the way")
+
+
+class TestFromFile(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, "dict.tsv")
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_from_file(self):
+        with open(self.path, "w") as f:
+            f.write("# comment\n\nbtw\tby the way\nimo\tin my opinion\n")
+        pp = PreProcessorDict.from_file(self.path)
+        self.assertEqual(pp.run("imo, btw"), "in my opinion, by the way")
+
+    def test_lazy(self):
+        """The file is only read on first use"""
+        pp = PreProcessorDict.from_file(self.path)
+        with open(self.path, "w") as f:
+            f.write("btw\tby the way\n")
+        self.assertEqual(pp.run("btw"), "by the way")
+
+    def test_bad_line(self):
+        with open(self.path, "w") as f:
+            f.write("btw by the way\n")
+        pp = PreProcessorDict.from_file(self.path)
+        with self.assertRaises(ValueError):
+            pp.run("btw")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+import pickle
+import random
+import unittest
+
+from navertts.tokenizer import Tokenizer, tokenizer_cases
+from navertts.tokenizer.scanner import (
+    ScanCase,
+    ScanTokenizer,
+    legacy_all_punctuation,
+)
+
+DEFAULT_CASES = [
+    tokenizer_cases.tone_marks,
+    tokenizer_cases.period_comma,
+    tokenizer_cases.colon,
+    tokenizer_cases.other_punctuation,
+]
+
+ALPHABET = list("abAZ  1.,:?!？！()\n;…。K5٣") + [". ", ".a. ", "?\n", "1:", "a:"]
+
+
+def random_texts(n=2000, seed=0):
+    r = random.Random(seed)
+    for _ in range(n):
+        yield "".join(r.choice(ALPHABET) for _ in range(r.randint(0, 40)))
+
+
+class TestScanTokenizer(unittest.TestCase):
+    def test_default(self):
+        text = "Dr. Smith arrived at 10:30, as planned. Was it late? No!"
+        self.assertEqual(
+            ScanTokenizer().run(text),
+            Tokenizer(DEFAULT_CASES).run(text),
+        )
+
+    def test_same_as_regex(self):
+        regex = Tokenizer(DEFAULT_CASES).run
+        scan = ScanTokenizer().run
+        for text in random_texts():
+            self.assertEqual(scan(text), regex(text), repr(text))
+
+    def test_same_as_regex_legacy(self):
+        regex = Tokenizer([tokenizer_cases.legacy_all_punctuation]).run
+        scan = ScanTokenizer([legacy_all_punctuation()]).run
+        for text in random_texts(seed=1):
+            self.assertEqual(scan(text), regex(text), repr(text))
+
+    def test_custom_case(self):
+        def match(text, start):
+            if start and text[start - 1] == "&":
+                return None
+            return start + 1
+
+        t = ScanTokenizer([ScanCase(";", match)])
+        self.assertEqual(t.run("a;b&;c;"), ["a", "b&;c", ""])
+
+    def test_no_cases(self):
+        self.assertEqual(ScanTokenizer([]).run("a. b"), ["a. b"])
+
+    def test_pickle(self):
+        t = pickle.loads(pickle.dumps(ScanTokenizer()))
+        self.assertEqual(t.run("a? b"), ["a?", "b"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,457 @@
+# -*- coding: utf-8 -*-
+from . import utils
+
+import collections
+import logging
+import threading
+import time
+import urllib
+from urllib.parse import parse_qs, urlsplit
+
+import requests
+from requests.packages import urllib3
+from requests.structures import CaseInsensitiveDict
+from requests.utils import requote_uri
+
+__all__ = [
+    "ConnectError",
+    "ConnectTimeout",
+    "FakeTransport",
+    "RequestsTransport",
+    "Response",
+    "Transport",
+    "TransportError",
+    "TransportTimeout",
+    "Urllib3Transport",
+    "get_transport",
+    "set_transport",
+]
+
+# Logger
+log = logging.getLogger(__name__)
+log.addHandler(logging.NullHandler())
+
+
+class TransportError(IOError):
+    """A request failed without a (complete) response."""
+
+
+class ConnectError(TransportError):
+    """The host couldn't be reached: the request wasn't processed."""
+
+
+class TransportTimeout(TransportError):
+    """Connecting or reading took longer than the timeout."""
+
+
+class ConnectTimeout(ConnectError, TransportTimeout):
+    """Connecting took longer than the timeout."""
+
+
+class Response:
+    """The response to a request, with its content still to be read.
+
+    Attributes:
+        url (string): The URL of the request.
+        status_code (int): The HTTP status.
+        reason (string): The HTTP reason phrase.
+        headers (dict): The headers, case-insensitive.
+
+    """
+
+    def __init__(self, url, status_code, reason="", headers=None):
+        """Create the response."""
+        self.url = url
+        self.status_code = status_code
+        self.reason = reason
+        self.headers = CaseInsensitiveDict(headers or {})
+
+    def iter_content(self, chunk_size):
+        """Read the content.
+
+        Args:
+            chunk_size (int): Size of the chunks to read at a time.
+
+        Returns:
+            iterable: The chunks (``bytes``).
+
+        Raises:
+            :class:`TransportError`: When reading fails.
+
+        """
+        raise NotImplementedError
+
+    def close(self):
+        """Give the connection back, or drop it when the content wasn't read."""
+
+    def __repr__(self):  # pragma: no cover
+        """Print the response."""
+        return "<Response [{}]>".format(self.status_code)
+
+
+class Transport:
+    """How part requests are sent by :class:`navertts.NaverTTS`.
+
+    Implement :meth:`get` (and :meth:`close`, if there's anything to
+    release) to plug in an HTTP stack of your own: set it with
+    :func:`set_transport`, or as the ``transport`` of a
+    :class:`navertts.NaverTTS`. A transport is shared by every thread that
+    fetches parts, so :meth:`get` must be thread-safe.
+
+    Example:
+        Count the requests that are sent::
+
+            >>> class CountingTransport(Urllib3Transport):
+            ...     count = 0
+            ...     def get(self, url, headers, timeout):
+            ...         self.count += 1
+            ...         return super().get(url, headers, timeout)
+            >>> set_transport(CountingTransport())
+
+    """
+
+    def get(self, url, headers, timeout):
+        """Send a ``GET`` request, without reading its content.
+
+        Args:
+            url (string): The URL.
+            headers (dict): Headers of the request.
+            timeout (tuple): ``(connect, read)`` timeouts, in seconds
+                (``None`` to wait forever).
+
+        Returns:
+            :class:`Response`: The response, whatever its status. It's
+            :meth:`Response.close`'d once read.
+
+        Raises:
+            :class:`TransportError`: When the request failed.
+
+        """
+        raise NotImplementedError
+
+    def close(self):
+        """Release the connections."""
+
+
+class _RequestsResponse(Response):
+    def __init__(self, r):
+        super(_RequestsResponse, self).__init__(r.url, r.status_code, r.reason)
+        self.headers = r.headers
+        self._r = r
+
+    def iter_content(self, chunk_size):
+        try:
+            for chunk in self._r.iter_content(chunk_size):
+                yield chunk
+        except requests.exceptions.RequestException as e:
+            # Read timeouts while reading the content are connection errors
+            if isinstance(e, requests.exceptions.Timeout) or any(
+                isinstance(arg, urllib3.exceptions.ReadTimeoutError) for arg in e.args
+            ):
+                raise TransportTimeout(str(e)) from e
+            raise TransportError(str(e)) from e
+
+    def close(self):
+        self._r.close()
+
+
+class RequestsTransport(Transport):
+    """Send requests with ``requests``.
+
+    Proxies are read from the environment at each request, and
+    certificates aren't verified (see :class:`Urllib3Transport`).
+
+    Args:
+        session (:class:`requests.Session`, optional): The session to send
+            requests with. Defaults to ``requests.get``, without one.
+
+    """
+
+    def __init__(self, session=None):
+        """Create the transport."""
+        self.session = session
+
+    def get(self, url, headers, timeout):
+        """Send a ``GET`` request, see :meth:`Transport.get`."""
+        get = requests.get if self.session is None else self.session.get
+        try:
+            r = get(
+                url=url,
+                headers=headers,
+                proxies=urllib.request.getproxies(),
+                verify=False,
+                timeout=timeout,
+                stream=True,
+            )
+        except requests.exceptions.ConnectTimeout as e:
+            raise ConnectTimeout(str(e)) from e
+        except requests.exceptions.Timeout as e:
+            raise TransportTimeout(str(e)) from e
+        except requests.exceptions.ConnectionError as e:
+            raise ConnectError(str(e)) from e
+        except requests.exceptions.RequestException as e:
+            raise TransportError(str(e)) from e
+        return _RequestsResponse(r)
+
+    def close(self):
+        """Close the session, if any."""
+        if self.session is not None:
+            self.session.close()
+
+
+class _Urllib3Response(Response):
+    def __init__(self, url, r):
+        super(_Urllib3Response, self).__init__(url, r.status, r.reason)
+        self.headers = r.headers
+        self._r = r
+        self._done = False
+
+    def iter_content(self, chunk_size):
+        try:
+            for chunk in self._r.stream(chunk_size):
+                yield chunk
+        except urllib3.exceptions.ReadTimeoutError as e:
+            raise TransportTimeout(str(e)) from e
+        except (urllib3.exceptions.HTTPError, OSError) as e:
+            raise TransportError(str(e)) from e
+        self._done = True
+
+    def close(self):
+        if not self._done:
+            # Not read to the end: the connection can't be reused
+            self._r.close()
+        self._r.release_conn()
+
+
+class _TimedPool:
+    """Mixin of the connection pools of a :class:`Urllib3Transport`.
+
+    Times the opening of its new connections, for the ``connect_hooks`` of
+    ``transport``.
+
+    """
+
+    transport = None
+
+    def _new_conn(self):
+        conn = super(_TimedPool, self)._new_conn()
+        connect = conn.connect
+        transport = self.transport
+
+        def timed_connect():
+            start = time.perf_counter()
+            try:
+                return connect()
+            finally:
+                elapsed = time.perf_counter() - start
+                for hook in transport._connect_hooks:
+                    hook(elapsed)
+
+        conn.connect = timed_connect
+        return conn
+
+
+class Urllib3Transport(Transport):
+    """Send requests with a pool of ``urllib3`` connections (the default).
+
+    Skips the per-request work of ``requests`` (sessions, hooks, cookies,
+    proxy resolution...): connections to each host are kept alive and
+    reused by every thread. As with ``requests``, URLs are quoted and
+    redirects are followed. Certificates aren't verified, for proxies and
+    firewalls that intercept TLS.
+
+    Args:
+        maxsize (int): Connections kept alive per host. More can be opened
+            at once, but they're closed after their request.
+        proxies (dict, optional): Proxy URL by scheme (e.g.
+            ``{"https": "http://proxy:3128"}``). Defaults to the proxies of
+            the environment (``urllib.request.getproxies``), read once.
+
+    """
+
+    def __init__(self, maxsize=32, proxies=None):
+        """Create the transport."""
+        self.maxsize = maxsize
+        self.proxies = urllib.request.getproxies() if proxies is None else proxies
+        self._retries = urllib3.Retry(
+            total=None, connect=0, read=0, status=0, other=0, redirect=10
+        )
+        self._lock = threading.Lock()
+        self._managers = {}
+        self._connect_hooks = ()
+
+    def add_connect_hook(self, hook):
+        """Call ``hook(seconds)`` each time a connection is opened.
+
+        The hook is called by the thread that sent the request, once the
+        connection is open (or failed to).
+
+        Args:
+            hook (callable): Takes the time it took to connect, in seconds.
+
+        """
+        with self._lock:
+            self._connect_hooks += (hook,)
+
+    def remove_connect_hook(self, hook):
+        """Stop calling ``hook``, see :meth:`add_connect_hook`."""
+        with self._lock:
+            hooks = list(self._connect_hooks)
+            hooks.remove(hook)
+            self._connect_hooks = tuple(hooks)
+
+    def _manager(self, url):
+        parts = urlsplit(url)
+        proxy = self.proxies.get(parts.scheme)
+        if proxy is not None and urllib.request.proxy_bypass(parts.hostname or ""):
+            proxy = None
+        manager = self._managers.get(proxy)
+        if manager is None:
+            with self._lock:
+                manager = self._managers.get(proxy)
+                if manager is None:
+                    kwargs = {"maxsize": self.maxsize, "cert_reqs": "CERT_NONE"}
+                    if proxy is None:
+                        manager = urllib3.PoolManager(**kwargs)
+                    else:
+                        manager = urllib3.ProxyManager(proxy, **kwargs)
+                    # Pools whose connections run the connect hooks
+                    manager.pool_classes_by_scheme = {
+                        scheme: type(
+                            "Timed" + cls.__name__,
+                            (_TimedPool, cls),
+                            {"transport": self},
+                        )
+                        for scheme, cls in manager.pool_classes_by_scheme.items()
+                    }
+                    self._managers[proxy] = manager
+        return manager
+
+    def get(self, url, headers, timeout):
+        """Send a ``GET`` request, see :meth:`Transport.get`."""
+        url = requote_uri(url)
+        connect, read = timeout
+        try:
+            r = self._manager(url).request(
+                "GET",
+                url,
+                headers=headers,
+                timeout=urllib3.Timeout(connect=connect, read=read),
+                retries=self._retries,
+                preload_content=False,
+            )
+        except urllib3.exceptions.MaxRetryError as e:
+            raise self._error(e.reason) from e
+        except (urllib3.exceptions.HTTPError, OSError) as e:
+            raise self._error(e) from e
+        return _Urllib3Response(url, r)
+
+    @staticmethod
+    def _error(e):
+        # Before ConnectTimeoutError, a base class of NewConnectionError
+        if isinstance(e, (urllib3.exceptions.NewConnectionError, ConnectionError)):
+            return ConnectError(str(e))
+        if isinstance(e, urllib3.exceptions.ConnectTimeoutError):
+            return ConnectTimeout(str(e))
+        if isinstance(e, urllib3.exceptions.ReadTimeoutError):
+            return TransportTimeout(str(e))
+        return TransportError(str(e))
+
+    def close(self):
+        """Close the connections."""
+        with self._lock:
+            for manager in self._managers.values():
+                manager.clear()
+            self._managers.clear()
+
+
+class _FakeResponse(Response):
+    def __init__(self, url, status_code, headers, body):
+        super(_FakeResponse, self).__init__(url, status_code, "", headers)
+        self._body = body
+
+    def iter_content(self, chunk_size):
+        for pos in range(0, len(self._body), chunk_size):
+            yield self._body[pos : pos + chunk_size]
+
+
+# A silent MPEG-1 Layer III frame (128 kbps, 44.1 kHz): 417 bytes
+SILENT_FRAME = b"\xff\xfb\x90\x64" + b"\x00" * 413
+
+
+class FakeTransport(Transport):
+    """Answer requests from memory, without any network (e.g. for tests).
+
+    Args:
+        body (bytes or callable, optional): The content of every answer, or
+            a function of the query of the request (a ``dict``) returning it.
+            Defaults to a few silent ``mp3`` frames.
+        status (int): HTTP status of the answers.
+        content_type (string): ``Content-Type`` of the answers.
+        delay (float): Seconds to wait before answering.
+
+    Attributes:
+        hits (collections.Counter): Number of requests per URL.
+
+    Example:
+        >>> transport = FakeTransport(body=lambda query: query["text"].encode())
+        >>> NaverTTS("hello", transport=transport).save("hello.mp3")
+        >>> transport.hits
+        Counter({'https://dict.naver.com/api/nvoice?...': 1})
+
+    """
+
+    def __init__(self, body=None, status=200, content_type="audio/mpeg", delay=0.0):
+        """Create the transport."""
+        self.body = SILENT_FRAME * 4 if body is None else body
+        self.status = status
+        self.content_type = content_type
+        self.delay = delay
+        self.hits = collections.Counter()
+        self._lock = threading.Lock()
+
+    def get(self, url, headers, timeout):
+        """Answer a ``GET`` request, see :meth:`Transport.get`."""
+        with self._lock:
+            self.hits[url] += 1
+        if self.delay:
+            time.sleep(self.delay)
+        if self.status != 200:
+            return _FakeResponse(url, self.status, {"Content-Length": "0"}, b"")
+        body = self.body
+        if callable(body):
+            query = {k: v[0] for k, v in parse_qs(urlsplit(url).query).items()}
+            body = body(query)
+        headers = {"Content-Type": self.content_type, "Content-Length": str(len(body))}
+        utils._log(log.debug, "fake answer to %s: %i bytes", url, len(body))
+        return _FakeResponse(url, 200, headers, body)
+
+
+# Process-wide transport of part requests
+_transport = Urllib3Transport()
+
+
+def get_transport():
+    """Get the process-wide :class:`Transport`.
+
+    Returns:
+        :class:`Transport`: The transport, a :class:`Urllib3Transport` by
+        default.
+
+    """
+    return _transport
+
+
+def set_transport(transport):
+    """Replace the process-wide transport.
+
+    Args:
+        transport (:class:`Transport`): The new transport.
+
+    Returns:
+        :class:`Transport`: The previous transport.
+
+    """
+    global _transport
+    previous, _transport = _transport, transport
+    return previous
@@ -1,21 +1,90 @@
 # -*- coding: utf-8 -*-
 from . import constants
+from . import mp3
 from . import tokenizer
 from . import utils
-from .lang import tts_langs
+from .cancel import CancelToken
+from .checkpoint import Checkpoint
+from .endpoints import get_endpoint_pool
+from .lang import _langs_table, _speakers_table
+from .hedging import HedgePolicy
+from .parallel import ParallelTokenizer
+from .plan import Plan
+from .ratelimit import get_rate_limiter
+from .reorder import ReorderBuffer
+from .scheduler import get_scheduler
+from .singleflight import SingleFlight
+from .transport import ConnectError, TransportError, TransportTimeout, get_transport
 
+import collections
+import functools
+import io
+import json
 import logging
 import os
 import requests
+import threading
+import time
 from requests.packages.urllib3.exceptions import InsecureRequestWarning
-import urllib
 
-__all__ = ["NaverTTS", "NaverTTSError"]
+__all__ = [
+    "NaverTTS",
+    "NaverTTSCancelled",
+    "NaverTTSError",
+    "NaverTTSInvalidPayload",
+    "NaverTTSRateLimited",
+    "NaverTTSTimeout",
+    "PartResult",
+    "VariantResult",
+    "Voice",
+    "write_index",
+]
 
 # Logger
 log = logging.getLogger(__name__)
 log.addHandler(logging.NullHandler())
 
+# Process-wide coalescing of identical in-flight part requests,
+# keyed on the endpoint URL
+_inflight = SingleFlight()
+
+# Default pipeline of NaverTTS: tuples, so that no object can change them
+# under the others. The tokenizer is stateless once built, and shared
+DEFAULT_PRE_PROCESSORS = (
+    tokenizer.pre_processors.tone_marks,
+    tokenizer.pre_processors.end_of_line_hyphen,
+    tokenizer.pre_processors.newline,
+    tokenizer.pre_processors.abbreviations,
+    tokenizer.pre_processors.word_sub,
+)
+DEFAULT_TOKENIZER_CASES = (
+    tokenizer.tokenizer_cases.tone_marks,
+    tokenizer.tokenizer_cases.period_comma,
+    tokenizer.tokenizer_cases.colon,
+    tokenizer.tokenizer_cases.other_punctuation,
+)
+_default_tokenizer = tokenizer.Tokenizer(list(DEFAULT_TOKENIZER_CASES))
+
+_warnings_lock = threading.Lock()
+_warnings_disabled = False
+
+
+def _disable_insecure_warning():
+    """Silence the insecure request warning of urllib3, once per process.
+
+    When disabling ssl verify in requests (for proxies and firewalls),
+    urllib3 prints an insecure warning on stdout. Changing the warning
+    filters isn't thread-safe, so it's only done by the first call.
+
+    """
+    global _warnings_disabled
+    if _warnings_disabled:
+        return
+    with _warnings_lock:
+        if not _warnings_disabled:
+            requests.packages.urllib3.disable_warnings(InsecureRequestWarning)
+            _warnings_disabled = True
+
 
 class Speed:
     """Read Speed."""
@@ -25,13 +94,318 @@ class Speed:
     FAST = -5
 
 
+_SPEEDS = {"slow": Speed.SLOW, "normal": Speed.NORMAL, "fast": Speed.FAST}
+
+
+class Voice:
+    """Voice -- A validated, immutable voice configuration.
+
+    Validating the language, resolving the speaker and parsing the speed
+    happen once, when the voice is created. A single voice can then be
+    shared by any number of :class:`NaverTTS` objects (see its ``voice``
+    argument), across threads.
+
+    Args:
+        lang (string, optional): The language (IETF language tag) to
+            read the text in. Defaults to 'ko'.
+        tld (string, optional): Top-level domain. Defaults to 'com'.
+        speed (str or int, optional): Choice of {'slow' (5), 'normal' (0), 'fast' (-5)}.
+            Defaults to 'normal'.
+        gender (string, optional): Choice of {'f', 'm'}. Defaults to 'f'.
+        lang_check (bool, optional): Strictly enforce an existing ``lang``.
+            Default is ``True``.
+
+    Raises:
+        ValueError: When ``lang_check`` is ``True`` and ``lang`` is not
+            supported; when there's no speaker for ``lang``; when ``speed``
+            is not valid.
+
+    Example:
+        Read many texts with the same voice::
+
+            >>> voice = Voice(lang="en", speed="slow")
+            >>> for i, text in enumerate(texts):
+            ...     NaverTTS(text, voice=voice).save("%d.mp3" % i)
+
+    """
+
+    __slots__ = ("lang", "tld", "speed", "gender", "speaker", "lang_check")
+
+    def __init__(
+        self, lang="ko", tld="com", speed="normal", gender="f", lang_check=True
+    ):
+        """Create the voice."""
+        lang = lang.lower()
+        if lang_check:
+            try:
+                if lang not in _langs_table(tld):
+                    raise ValueError("Language not supported: %s" % lang)
+            except RuntimeError as e:
+                log.debug(str(e), exc_info=True)
+                utils._log(log.warning, str(e))
+
+        try:
+            speed_value = _SPEEDS[speed]
+        except (KeyError, TypeError):
+            if isinstance(speed, int) and -5 <= speed and speed <= 5:
+                speed_value = speed
+            else:
+                raise ValueError(
+                    "Expected `speed` in 'slow', 'normal', "
+                    "'fast' or an integer between -5 and 5."
+                    " Got {}".format(speed)
+                )
+
+        set_ = super(Voice, self).__setattr__
+        set_("lang", lang)
+        set_("tld", tld)
+        set_("speed", speed_value)
+        set_("gender", gender)
+        set_("speaker", constants.get_speaker(lang, gender, _speakers_table(tld)))
+        set_("lang_check", lang_check)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Voice is immutable")
+
+    def __delattr__(self, name):
+        raise AttributeError("Voice is immutable")
+
+    def _key(self):
+        return (self.lang, self.tld, self.speed, self.speaker, self.lang_check)
+
+    def __eq__(self, other):
+        return isinstance(other, Voice) and self._key() == other._key()
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash(self._key())
+
+    def __reduce__(self):
+        return (
+            Voice,
+            (self.lang, self.tld, self.speed, self.gender, self.lang_check),
+        )
+
+    def __repr__(self):  # pragma: no cover
+        """Print the voice."""
+        return "Voice(lang={!r}, tld={!r}, speed={!r}, speaker={!r})".format(
+            self.lang, self.tld, self.speed, self.speaker
+        )
+
+
+class PartResult:
+    """Outcome of the TTS API request for one part of the text.
+
+    Attributes:
+        index (int): Position of the part in the text.
+        text (string): The text of the part.
+        size (int): Size of the ``mp3`` content of the part, in bytes.
+        latency (float): Time it took to get the content, in seconds.
+        hedge: Hedging outcome, see :class:`navertts.hedging.HedgePolicy`.
+        offset (int): Position of the part in the output, in bytes.
+        start (float): Time at which the part starts in the output, in seconds.
+        frames (int): Number of ``mp3`` frames of the part.
+        duration (float): Duration of the part, in seconds.
+
+    """
+
+    __slots__ = (
+        "index",
+        "text",
+        "size",
+        "latency",
+        "hedge",
+        "offset",
+        "start",
+        "frames",
+        "duration",
+    )
+
+    def __init__(
+        self,
+        index,
+        text,
+        size,
+        latency,
+        hedge=None,
+        offset=0,
+        start=0.0,
+        frames=0,
+        duration=0.0,
+    ):
+        """Create the part result."""
+        self.index = index
+        self.text = text
+        self.size = size
+        self.latency = latency
+        self.hedge = hedge
+        self.offset = offset
+        self.start = start
+        self.frames = frames
+        self.duration = duration
+
+    def to_dict(self):
+        """Return the index entry of the part (e.g. for ``json.dumps``).
+
+        Returns:
+            dict: The ``index``, ``text``, ``offset``, ``size``, ``start``,
+            ``duration`` and ``frames`` of the part.
+
+        """
+        return {
+            "index": self.index,
+            "text": self.text,
+            "offset": self.offset,
+            "size": self.size,
+            "start": self.start,
+            "duration": self.duration,
+            "frames": self.frames,
+        }
+
+    def __repr__(self):  # pragma: no cover
+        """Print the part result."""
+        return (
+            "PartResult(index={}, offset={}, size={}, start={:.3f}, "
+            "duration={:.3f}, latency={:.3f}, hedge={!r})".format(
+                self.index,
+                self.offset,
+                self.size,
+                self.start,
+                self.duration,
+                self.latency,
+                self.hedge,
+            )
+        )
+
+
+class VariantResult:
+    """Outcome of a variant written by :meth:`NaverTTS.write_variants`.
+
+    Attributes:
+        voice (:class:`Voice`): The voice of the variant.
+        parts (list): A :class:`PartResult` for each part, in order.
+        elapsed (float): Time from the first request of any variant to the
+            last part of this one, in seconds.
+
+    """
+
+    __slots__ = ("voice", "parts", "_done")
+
+    def __init__(self, voice):
+        """Create the variant result."""
+        self.voice = voice
+        self.parts = []
+        # When each part was fetched, since the first request (appended to
+        # by the scheduler's workers)
+        self._done = []
+
+    @property
+    def elapsed(self):
+        """Time from the first request to the last part fetched, in seconds."""
+        return max(self._done) if self._done else 0.0
+
+    @property
+    def size(self):
+        """Size of the ``mp3``, in bytes."""
+        return sum(p.size for p in self.parts)
+
+    @property
+    def duration(self):
+        """Duration of the ``mp3``, in seconds."""
+        return sum(p.duration for p in self.parts)
+
+    @property
+    def latency(self):
+        """Time it took to get the parts, summed, in seconds."""
+        return sum(p.latency for p in self.parts)
+
+    def to_dict(self):
+        """Return the timing of the variant (e.g. for ``json.dumps``)."""
+        return {
+            "lang": self.voice.lang,
+            "tld": self.voice.tld,
+            "speaker": self.voice.speaker,
+            "speed": self.voice.speed,
+            "parts": len(self.parts),
+            "size": self.size,
+            "duration": self.duration,
+            "latency": self.latency,
+            "elapsed": self.elapsed,
+        }
+
+    def __repr__(self):  # pragma: no cover
+        """Print the variant result."""
+        return "VariantResult(voice={!r}, parts={}, elapsed={:.3f})".format(
+            self.voice, len(self.parts), self.elapsed
+        )
+
+
+def write_index(path, parts):
+    """Write the index of an output as JSON.
+
+    Args:
+        path (string): Where to write the index.
+        parts (list): The :class:`PartResult` of the output (or their
+            :meth:`PartResult.to_dict`).
+
+    Example:
+        >>> parts = NaverTTS(text).write_to_fp(fp)
+        >>> write_index("hello.json", parts)
+
+        Gives::
+
+            {"size": 23406, "duration": 1.462, "parts": [
+                {"index": 0, "text": "Hello", "offset": 0, "size": 11703,
+                 "start": 0.0, "duration": 0.731, "frames": 28}, ...]}
+
+    """
+    parts = [p if isinstance(p, dict) else p.to_dict() for p in parts]
+    index = {
+        "size": sum(p["size"] for p in parts),
+        "duration": sum(p["duration"] for p in parts),
+        "parts": parts,
+    }
+    with io.open(path, "w", encoding="utf-8") as f:
+        f.write(json.dumps(index, ensure_ascii=False))
+
+
+def _abandon(futures):
+    """Cancel the futures that haven't started (queued part requests)."""
+    for future in futures:
+        future.cancel()
+
+
+def _fp_error(e):
+    """The error for ``e``, raised writing to a ``fp`` that isn't right."""
+    return TypeError(
+        "'fp' is not a file-like object or it does not take bytes: %s" % str(e)
+    )
+
+
+def _unreachable(e):
+    """Whether the transport error ``e`` means the host couldn't be reached."""
+    return isinstance(e, ConnectError)
+
+
+def _host_failed(e):
+    """Whether the :class:`NaverTTSError` ``e`` is the fault of the API host."""
+    if isinstance(e, NaverTTSInvalidPayload) or e.__cause__ is not None:
+        # Not audio, or the request failed (connection error, timeout)
+        return True
+    return e.rsp is not None and (e.rsp.status_code == 429 or e.rsp.status_code >= 500)
+
+
 class NaverTTS:
     """NaverTTS -- NAVER Text-to-Speech.
 
     An interface to NAVER Papago's Text-to-Speech API.
 
     Args:
-        text (string): The text to be read.
+        text (string or iterable): The text to be read. Can also be an
+            iterable of pieces of text (e.g. :func:`navertts.streaming.iter_chunks`),
+            read as it is needed by :meth:`stream_to_fp`.
         tld (string, optional): Top-level domain. Defaults to 'com'.
         lang (string, optional): The language (IETF language tag) to
             read the text in. Defaults to 'ko'.
@@ -41,19 +415,21 @@ class NaverTTS:
             to catch a language error early. If set to ``True``,
             a ``ValueError`` is raised if ``lang`` doesn't exist.
             Default is ``True``.
-        pre_processor_funcs (list): A list of zero or more functions that are
+        pre_processor_funcs (list or tuple): Zero or more functions that are
             called to transform (pre-process) text before tokenizing. Those
-            functions must take a string and return a string. Defaults to::
+            functions must take a string and return a string. Defaults to
+            ``DEFAULT_PRE_PROCESSORS``::
 
-                [
+                (
                     tokenizer.pre_processors.tone_marks,
-                    tokenizer.pre_processors.end_of_line,
+                    tokenizer.pre_processors.end_of_line_hyphen,
+                    tokenizer.pre_processors.newline,
                     tokenizer.pre_processors.abbreviations,
-                    tokenizer.pre_processors.word_sub
-                ]
+                    tokenizer.pre_processors.word_sub,
+                )
 
         tokenizer_func (callable): A function that takes in a string and
-            returns a list of string (tokens). Defaults to::
+            returns a list of string (tokens). Defaults to a shared::
 
                 tokenizer.Tokenizer([
                     tokenizer.tokenizer_cases.tone_marks,
@@ -62,9 +438,34 @@ class NaverTTS:
                     tokenizer.tokenizer_cases.other_punctuation
                 ]).run
 
+        voice (:class:`Voice`, optional): A validated voice configuration to
+            share between many texts. When set, ``lang``, ``tld``, ``speed``,
+            ``gender`` and ``lang_check`` are ignored and no validation
+            happens.
+        timeout (float or tuple, optional): Connect and read timeouts of each
+            part request, in seconds, as a ``(connect, read)`` tuple or a
+            single value for both. Defaults to ``NAVER_TTS_TIMEOUT``.
+        transport (:class:`navertts.transport.Transport`, optional): How to
+            send the part requests. Defaults to the process-wide transport
+            (see :func:`navertts.transport.set_transport`).
+        payload_retries (int, optional): Times a part that got an invalid
+            payload is requested again. Defaults to
+            ``NAVER_TTS_PAYLOAD_RETRIES``.
+
     See Also:
         :doc:`Pre-processing and tokenizing <tokenizer>`
 
+    Note:
+        A :class:`NaverTTS` is immutable and thread-safe: any number of
+        threads can read it (:meth:`write_to_fp`, :meth:`stream_to_fp`,
+        :meth:`save`, :meth:`write_variants`...) at the same time, as can
+        objects sharing a :class:`Voice`. The state of a call (its parts,
+        buffers, deadline...) is its own. What calls share (the scheduler,
+        rate limiter, endpoint pool, transport and coalescing of identical
+        requests) is process-wide and locked. Custom pre-processors and
+        tokenizers must be thread-safe too; the default ones are stateless.
+        A streamed ``text`` (an iterable) can only be read once.
+
     Raises:
         AssertionError: When ``text`` is ``None`` or empty; when there's nothing
             left to speak after pre-precessing, tokenizing and cleaning.
@@ -74,7 +475,33 @@ class NaverTTS:
 
     """
 
+    __slots__ = (
+        "text",
+        "voice",
+        "pre_processor_funcs",
+        "tokenizer_func",
+        "priority",
+        "hedge",
+        "timeout",
+        "transport",
+        "payload_retries",
+    )
+
     NAVER_TTS_MAX_CHARS = 100  # Max characters the NAVER TTS API takes at a time
+    NAVER_TTS_STREAM_WINDOW = 16  # Max parts of a streamed text in flight
+    NAVER_TTS_STREAM_BLOCK_SIZE = (
+        1 << 16
+    )  # Characters of a streamed text read at a time
+    NAVER_TTS_TIMEOUT = (5.0, 30.0)  # Connect and read timeouts of a part request
+    NAVER_TTS_REORDER_MEMORY = (
+        8 << 20
+    )  # Bytes of parts fetched ahead of their turn held in memory (then on disk)
+    NAVER_TTS_CONTENT_TYPES = (
+        "audio/",
+        "application/octet-stream",
+    )  # Content types (prefixes) of a valid part
+    NAVER_TTS_MIN_PAYLOAD = 128  # Min bytes of a valid part
+    NAVER_TTS_PAYLOAD_RETRIES = 0  # Retries of a part that got an invalid payload
     NAVER_TTS_HEADERS = {
         "Referer": "http://papago.naver.com/",
         "User-Agent": "Mozilla/5.0 (Windows NT 10.0; WOW64) "
@@ -90,69 +517,91 @@ class NaverTTS:
         speed="normal",
         gender="f",
         lang_check=True,
-        pre_processor_funcs=[
-            tokenizer.pre_processors.tone_marks,
-            tokenizer.pre_processors.end_of_line_hyphen,
-            tokenizer.pre_processors.newline,
-            tokenizer.pre_processors.abbreviations,
-            tokenizer.pre_processors.word_sub,
-        ],
-        tokenizer_func=tokenizer.Tokenizer(
-            [
-                tokenizer.tokenizer_cases.tone_marks,
-                tokenizer.tokenizer_cases.period_comma,
-                tokenizer.tokenizer_cases.colon,
-                tokenizer.tokenizer_cases.other_punctuation,
-            ]
-        ).run,
+        pre_processor_funcs=DEFAULT_PRE_PROCESSORS,
+        tokenizer_func=None,
+        voice=None,
+        priority="interactive",
+        hedge=None,
+        timeout=None,
+        transport=None,
+        payload_retries=None,
     ):
         """Create the TTS class."""
         # Debug
-        for k, v in locals().items():
-            if k == "self":
-                continue
-            utils._log(log.debug, "%s: %s", k, v)
+        if log.isEnabledFor(logging.DEBUG):
+            for k, v in locals().items():
+                if k == "self":
+                    continue
+                utils._log(log.debug, "%s: %s", k, v)
+
+        set_ = super(NaverTTS, self).__setattr__
 
         # Text
         assert text, "No text to speak"
-        self.text = text
+        set_("text", text)
 
-        # Translate URL top-level domain
-        self.tld = tld
-
-        # Language
-        if lang_check:
-            try:
-                langs = tts_langs(self.tld)
-                if lang.lower() not in langs:
-                    raise ValueError("Language not supported: %s" % lang)
-            except RuntimeError as e:
-                utils._log(log.debug, str(e), exc_info=True)
-                utils._log(log.warning, str(e))
-
-        self.lang_check = lang_check
-        self.lang = lang.lower()
-        self.speaker = constants.get_speaker(self.lang, gender)
-
-        # Read speed
-        if speed == "slow":
-            self.speed = Speed.SLOW
-        elif speed == "normal":
-            self.speed = Speed.NORMAL
-        elif speed == "fast":
-            self.speed = Speed.FAST
-        elif isinstance(speed, int) and -5 <= speed and speed <= 5:
-            self.speed = speed
-        else:
-            raise ValueError(
-                "Expected `speed` in 'slow', 'normal', "
-                "'fast' or an integer between -5 and 5."
-                " Got {}".format(speed)
+        # Language, speaker and speed
+        if voice is None:
+            voice = Voice(
+                lang=lang, tld=tld, speed=speed, gender=gender, lang_check=lang_check
             )
+        set_("voice", voice)
 
         # Pre-processors and tokenizer
-        self.pre_processor_funcs = pre_processor_funcs
-        self.tokenizer_func = tokenizer_func
+        set_("pre_processor_funcs", tuple(pre_processor_funcs))
+        if tokenizer_func is None:
+            tokenizer_func = _default_tokenizer.run
+        set_("tokenizer_func", tokenizer_func)
+
+        # Scheduling
+        set_("priority", priority)
+        set_("hedge", hedge)
+
+        # Timeouts
+        if timeout is None:
+            timeout = self.NAVER_TTS_TIMEOUT
+        elif not isinstance(timeout, tuple):
+            timeout = (timeout, timeout)
+        set_("timeout", timeout)
+
+        # Transport
+        set_("transport", transport)
+
+        # Retries
+        if payload_retries is None:
+            payload_retries = self.NAVER_TTS_PAYLOAD_RETRIES
+        set_("payload_retries", payload_retries)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("NaverTTS is immutable")
+
+    def __delattr__(self, name):
+        raise AttributeError("NaverTTS is immutable")
+
+    @property
+    def tld(self):
+        """Top-level domain of the API host."""
+        return self.voice.tld
+
+    @property
+    def lang(self):
+        """Language (IETF language tag) the text is read in."""
+        return self.voice.lang
+
+    @property
+    def lang_check(self):
+        """Whether ``lang`` was checked against supported languages."""
+        return self.voice.lang_check
+
+    @property
+    def speaker(self):
+        """API name of the speaker."""
+        return self.voice.speaker
+
+    @property
+    def speed(self):
+        """Read speed, between -5 (fast) and 5 (slow)."""
+        return self.voice.speed
 
     def _tokenize(self, text):
         # Pre-clean
@@ -179,81 +628,726 @@ class NaverTTS:
             min_tokens += utils._minimize(t, " ", self.NAVER_TTS_MAX_CHARS)
         return min_tokens
 
-    def write_to_fp(self, fp):
+    def _tokenize_stream(self, chunks):
+        tokenizer = ParallelTokenizer.from_tts(
+            self, processes=1, block_size=self.NAVER_TTS_STREAM_BLOCK_SIZE
+        )
+        for tokens in tokenizer.imap_stream(chunks):
+            for t in tokens:
+                yield t
+
+    def _iter_parts(self):
+        """The text parts, tokenized at once or as they are read."""
+        if isinstance(self.text, str):
+            text_parts = self._tokenize(self.text)
+            utils._log(log.debug, "text_parts: %i", len(text_parts))
+            return iter(text_parts)
+        return self._tokenize_stream(self.text)
+
+    def plan(self):
+        """Plan the upstream requests, without sending any.
+
+        Returns:
+            :class:`navertts.plan.Plan`: The parts of the text, their endpoint
+            URLs, encoded sizes and estimated audio durations. A streamed text
+            is consumed.
+
+        Raises:
+            AssertionError: When there's nothing left to speak after
+                pre-processing, tokenizing and cleaning.
+
+        Example:
+            >>> plan = NaverTTS(text, lang="en").plan()
+            >>> plan.requests, plan.url_bytes, plan.seconds
+            (3, 412, 19.5)
+            >>> plan.parts[0].url
+            'https://dict.naver.com/api/nvoice?service=dictionary&...'
+
+        """
+        return Plan().add(self)
+
+    def write_to_fp(self, fp, deadline=None, cancel=None):
         """Do the TTS API request and write bytes to a file-like object.
 
         Args:
             fp (file object): Any file-like object to write the ``mp3`` to.
+            deadline (float, optional): Seconds to read the whole text in.
+            cancel (:class:`navertts.cancel.CancelToken`, optional): A token
+                to stop the requests of the text with.
+
+        Returns:
+            list: A :class:`PartResult` for each part of the text, in order.
+            With their byte ``offset`` (from the first byte written), start
+            time, ``frames`` and ``duration``, read from the ``mp3`` frame
+            headers, they index the output (see :func:`write_index`).
 
         Raises:
             :class:`gTTSError`: When there's an error with the API request.
+            :class:`NaverTTSTimeout`: When a part request timed out, or the
+                ``deadline`` passed.
+            :class:`NaverTTSCancelled`: When ``cancel`` was cancelled.
             TypeError: When ``fp`` is not a file-like object that takes bytes.
 
         """
-        # When disabling ssl verify in requests (for proxies and firewalls),
-        # urllib3 prints an insecure warning on stdout. We disable that.
-        requests.packages.urllib3.disable_warnings(InsecureRequestWarning)
+        return list(self.stream_to_fp(fp, deadline, cancel))
 
-        text_parts = self._tokenize(self.text)
-        utils._log(log.debug, "text_parts: %i", len(text_parts))
-        assert text_parts, "No text to send to TTS API"
+    def stream_to_fp(self, fp, deadline=None, cancel=None):
+        """Do the TTS API request and write bytes to a file-like object, lazily.
 
-        for idx, part in enumerate(text_parts):
+        Same as :meth:`write_to_fp`, but yields the result of each part as
+        soon as it's written. When ``text`` is an iterable of pieces of text,
+        it's read, pre-processed and tokenized as parts are needed and no more
+        than ``NAVER_TTS_STREAM_WINDOW`` parts are in flight at a time, so
+        that memory use doesn't grow with the size of the text.
 
-            endpoint_url = constants.translate_endpoint(
-                text=part, speaker=self.speaker, speed=self.speed, tld=self.tld
-            )
-            try:
-                # Request
-                r = requests.get(
-                    url=endpoint_url,
-                    headers=self.NAVER_TTS_HEADERS,
-                    proxies=urllib.request.getproxies(),
-                    verify=False,
+        Args:
+            fp (file object): Any file-like object to write the ``mp3`` to.
+            deadline (float, optional): Seconds to read the whole text in,
+                from the first part on.
+            cancel (:class:`navertts.cancel.CancelToken`, optional): A token
+                to stop the requests of the text with.
+
+        Returns:
+            generator: A :class:`PartResult` for each part of the text, in order.
+
+        Raises:
+            :class:`gTTSError`: When there's an error with the API request.
+            :class:`NaverTTSTimeout`: When a part request timed out, or the
+                ``deadline`` passed.
+            :class:`NaverTTSCancelled`: When ``cancel`` was cancelled.
+            TypeError: When ``fp`` is not a file-like object that takes bytes.
+
+        Example:
+            Read a large file::
+
+                >>> with open("book.txt") as f:
+                ...     tts = NaverTTS(text=streaming.iter_chunks(f))
+                ...     for part in tts.stream_to_fp(out):
+                ...         print(part.index, part.size)
+
+        """
+        _disable_insecure_warning()
+
+        window = None if isinstance(self.text, str) else self.NAVER_TTS_STREAM_WINDOW
+        token = self._cancel_token(deadline, cancel)
+        count = 0
+        text_parts = enumerate(self._iter_parts())
+        for result in self._write_parts(fp, text_parts, window, token):
+            count += 1
+            yield result
+        assert count, "No text to send to TTS API"
+
+    def write_variants(self, variants, deadline=None, cancel=None):
+        """Read the text with several voices, tokenizing it only once.
+
+        The text is pre-processed and tokenized once, then the requests of
+        every variant and part are fetched concurrently by the process-wide
+        scheduler. Each variant is written to its own file-like object, in
+        order. A streamed text is read once, with no more than
+        ``NAVER_TTS_STREAM_WINDOW`` parts (of every variant) in flight.
+
+        Args:
+            variants (list): ``(voice, fp)`` pairs: the :class:`Voice` of a
+                variant and the file-like object to write its ``mp3`` to.
+                The ``voice`` of this object is only used for its defaults.
+            deadline (float, optional): Seconds to read every variant in.
+            cancel (:class:`navertts.cancel.CancelToken`, optional): A token
+                to stop the requests of every variant with.
+
+        Returns:
+            list: A :class:`VariantResult` for each variant, in order, with
+            its parts and timing.
+
+        Raises:
+            :class:`NaverTTSError`: When there's an error with the API request
+                (:class:`NaverTTSTimeout` or :class:`NaverTTSCancelled` as for
+                :meth:`write_to_fp`).
+            TypeError: When a ``fp`` is not a file-like object that takes bytes.
+            AssertionError: When there's no variant, or nothing left to speak
+                after pre-processing, tokenizing and cleaning.
+
+        Example:
+            Publish an article in a female and a slower male voice::
+
+                >>> tts = NaverTTS(article, lang="en")
+                >>> with open("f.mp3", "wb") as f, open("m.mp3", "wb") as m:
+                ...     results = tts.write_variants([
+                ...         (Voice(lang="en"), f),
+                ...         (Voice(lang="en", gender="m", speed="slow"), m),
+                ...     ])
+                >>> [(r.voice.speaker, r.elapsed) for r in results]
+                [('danna', 1.52), ('matt', 1.61)]
+
+        """
+        _disable_insecure_warning()
+
+        variants = [(self._with_voice(voice), fp) for voice, fp in variants]
+        assert variants, "No variant to render"
+        window = None if isinstance(self.text, str) else self.NAVER_TTS_STREAM_WINDOW
+        token = self._cancel_token(deadline, cancel)
+        scheduler = get_scheduler()
+        flow = object()
+        pending = collections.deque()
+        results = [VariantResult(tts.voice) for tts, _ in variants]
+        # Where the next part of each variant starts in its output
+        positions = [[0, 0.0] for _ in variants]
+        start = time.perf_counter()
+
+        def done(result, future):
+            result._done.append(time.perf_counter() - start)
+
+        def write(idx, part, futures):
+            for (tts, fp), future, result, position in zip(
+                variants, futures, results, positions
+            ):
+                part_result = tts._write_part(
+                    fp, idx, part, future, *position, token=token
                 )
+                position[0] += part_result.size
+                position[1] += part_result.duration
+                result.parts.append(part_result)
 
-                utils._log(log.debug, "headers-%i: %s", idx, r.request.headers)
-                utils._log(log.debug, "url-%i: %s", idx, r.request.url)
-                utils._log(log.debug, "status-%i: %s", idx, r.status_code)
+        try:
+            for idx, part in enumerate(self._iter_parts()):
+                futures = []
+                for (tts, _), result in zip(variants, results):
+                    future = tts._submit(idx, part, scheduler, flow, token)
+                    future.add_done_callback(functools.partial(done, result))
+                    futures.append(future)
+                pending.append((idx, part, futures))
+                if window is not None and len(pending) * len(variants) >= window:
+                    write(*pending.popleft())
 
-                r.raise_for_status()
-            except requests.exceptions.HTTPError as e:  # pragma: no cover
-                # Request successful, bad response
-                utils._log(log.debug, str(e))
-                raise NaverTTSError(tts=self, response=r)
-            except requests.exceptions.RequestException as e:  # pragma: no cover
-                # Request failed
-                utils._log(log.debug, str(e))
-                raise NaverTTSError(tts=self)
+            while pending:
+                write(*pending.popleft())
+        except BaseException:
+            if token is not None:
+                _abandon(f for _, _, futures in pending for f in futures)
+            raise
+
+        assert results[0].parts, "No text to send to TTS API"
+        for result in results:
+            utils._log(
+                log.debug,
+                "variant %s: %i part(s) in %.3fs",
+                result.voice,
+                len(result.parts),
+                result.elapsed,
+            )
+        return results
+
+    def _replace(self, **kwargs):
+        """A copy of this object, with the arguments in ``kwargs`` changed."""
+        args = {
+            "pre_processor_funcs": self.pre_processor_funcs,
+            "tokenizer_func": self.tokenizer_func,
+            "voice": self.voice,
+            "priority": self.priority,
+            "hedge": self.hedge,
+            "timeout": self.timeout,
+            "transport": self.transport,
+            "payload_retries": self.payload_retries,
+        }
+        args.update(kwargs)
+        return NaverTTS(self.text, **args)
 
+    def _with_voice(self, voice):
+        """A copy of this object, reading the same text with ``voice``."""
+        return self._replace(voice=voice)
+
+    @staticmethod
+    def _cancel_token(deadline=None, cancel=None):
+        """The token of a call, with its ``deadline`` (``None`` without either)."""
+        if deadline is None:
+            return cancel
+        return CancelToken(timeout=deadline, parent=cancel)
+
+    def _write_parts(self, fp, text_parts, window=None, token=None):
+        """Fetch ``(index, part)`` pairs and write them in order.
+
+        Parts fetched ahead of their turn wait in a :class:`ReorderBuffer`,
+        in memory up to ``NAVER_TTS_REORDER_MEMORY`` bytes, then on disk.
+
+        Returns:
+            generator: A :class:`PartResult` for each part, once written.
+
+        """
+        # Parts are fetched concurrently by the process-wide scheduler
+        # and written in order as they complete
+        scheduler = get_scheduler()
+        flow = object()
+        buffer = ReorderBuffer(self.NAVER_TTS_REORDER_MEMORY)
+        pending = collections.deque()
+        # Where the next part starts in the output (bytes, seconds)
+        position = [0, 0.0]
+
+        def write(idx, part):
+            fetched = buffer.get(idx, token)
+            if fetched is None:
+                self._check(token)
             try:
-                for chunk in r.iter_content(chunk_size=1024):
-                    fp.write(chunk)
+                buffer.write(fetched, fp)
                 utils._log(log.debug, "part-%i written to %s", idx, fp)
             except (AttributeError, TypeError) as e:
-                raise TypeError(
-                    "'fp' is not a file-like object or it does not take bytes: %s"
-                    % str(e)
+                raise _fp_error(e)
+            result = PartResult(
+                idx,
+                part,
+                fetched.size,
+                fetched.latency,
+                fetched.hedge,
+                position[0],
+                position[1],
+                fetched.frames,
+                fetched.duration,
+            )
+            position[0] += result.size
+            position[1] += result.duration
+            return result
+
+        try:
+            for idx, part in text_parts:
+                buffer.add(idx, self._submit(idx, part, scheduler, flow, token))
+                pending.append((idx, part))
+                if window is not None and len(pending) >= window:
+                    yield write(*pending.popleft())
+
+            while pending:
+                yield write(*pending.popleft())
+        except BaseException:
+            if token is not None:
+                _abandon(buffer.futures())
+            raise
+        finally:
+            if buffer.spilled:
+                utils._log(
+                    log.debug,
+                    "%i part(s) spilled, peak memory %i bytes",
+                    buffer.spilled,
+                    buffer.peak_memory,
                 )
+            buffer.close()
 
-    def save(self, savefile):
-        """Do the TTS API request and write result to file.
+    def _submit(self, idx, part, scheduler, flow, token=None):
+        """Submit the request of a part to the scheduler.
+
+        Returns:
+            :class:`concurrent.futures.Future`: The outcome of
+            :meth:`_fetch_part` (or of :meth:`HedgePolicy.submit
+            <navertts.hedging.HedgePolicy.submit>`, the same).
+
+        """
+        endpoint_url = constants.translate_endpoint(
+            text=part, speaker=self.speaker, speed=self.speed, tld=self.tld
+        )
+        # Identical parts requested concurrently (e.g. by other threads
+        # reading the same phrase) share a single upstream request, when
+        # sent the same way (transport, hedging, retries). Not across tokens:
+        # cancelling one call must not fail the others.
+        key = (endpoint_url, self.transport, self.hedge, self.payload_retries, token)
+        submit = functools.partial(self._schedule, scheduler, flow, token)
+        if self.hedge is not None:
+            # The hedge is scheduled like the request: not past the limits
+            submit = functools.partial(self.hedge.submit, submit, self._get_part)
+        else:
+            submit = functools.partial(submit, self._fetch_part)
+        return _inflight.future(
+            key,
+            functools.partial(submit, idx, endpoint_url, scheduler.limiter, token),
+        )
+
+    def _schedule(self, scheduler, flow, token, func, *args):
+        """Submit a request to the scheduler.
+
+        With a process-wide rate limiter, a token is taken when the request
+        is dispatched, in the order of its priority class: it's sent once
+        the token can be used, without holding a worker until then. The
+        token is given back when the request is cancelled before that.
+
+        Returns:
+            :class:`concurrent.futures.Future`: The result of ``func(*args)``,
+            or the :class:`NaverTTSRateLimited` (or :class:`NaverTTSTimeout`)
+            error when there's no token soon enough.
+
+        """
+        rate_limiter = get_rate_limiter()
+        if rate_limiter is None:
+            return scheduler.submit(func, *args, priority=self.priority, flow=flow)
+        return scheduler.submit(
+            func,
+            *args,
+            priority=self.priority,
+            flow=flow,
+            acquire=functools.partial(self._take_token, token, rate_limiter),
+            release=functools.partial(rate_limiter.release, self.tld)
+        )
+
+    def _take_token(self, token=None, rate_limiter=None):
+        """Take a token from ``rate_limiter`` (or the process-wide one), if any.
+
+        Returns:
+            float: Seconds before the request may be sent.
+
+        Raises:
+            :class:`NaverTTSRateLimited`: When there's no token (soon enough).
+            :class:`NaverTTSTimeout`: When the deadline of ``token`` would
+                pass waiting for one.
+
+        """
+        if rate_limiter is None:
+            rate_limiter = get_rate_limiter()
+        if rate_limiter is None:
+            return 0.0
+        timeout = rate_limiter.timeout
+        remaining = None if token is None else token.remaining()
+        deadline = remaining is not None and (timeout is None or remaining < timeout)
+        if deadline:
+            timeout = max(0.0, remaining)
+        delay = rate_limiter.reserve(self.tld, timeout=timeout)
+        if delay is not None:
+            return delay
+        if deadline and rate_limiter.blocking:
+            raise NaverTTSTimeout(
+                "Deadline exceeded waiting for a rate limit token", tts=self
+            )
+        raise NaverTTSRateLimited(
+            "Rate limit reached for host '{}'".format(
+                constants.translate_base(tld=self.tld)
+            ),
+            tts=self,
+        )
+
+    def _write_part(self, fp, idx, part, future, offset=0, start=0.0, token=None):
+        if token is not None and not token.wait(future):
+            self._check(token)
+        body, latency, hedge = future.result()
+        try:
+            fp.write(body)
+            utils._log(log.debug, "part-%i written to %s", idx, fp)
+        except (AttributeError, TypeError) as e:
+            raise _fp_error(e)
+        frames = mp3.scan(body)
+        if frames.junk:
+            utils._log(log.debug, "part-%i: %i byte(s) of junk", idx, frames.junk)
+        return PartResult(
+            idx,
+            part,
+            len(body),
+            latency,
+            hedge,
+            offset,
+            start,
+            frames.frames,
+            frames.duration,
+        )
+
+    def _fetch_part(self, idx, endpoint_url, limiter=None, token=None):
+        """Fetch a single part (not hedged).
+
+        Returns:
+            tuple: ``(body, latency, hedge)``, the ``mp3`` content, the time
+            it took to get it (in seconds) and the hedging outcome.
+
+        """
+        start = time.perf_counter()
+        body = self._get_part(idx, endpoint_url, limiter, token)
+        return body, time.perf_counter() - start, HedgePolicy.NOT_HEDGED
+
+    def _get_part(self, idx, endpoint_url, limiter=None, token=None):
+        """Fetch a single part, retrying invalid payloads.
+
+        A part that gets an invalid payload is requested again, up to
+        ``payload_retries`` times, with a token of the
+        process-wide rate limiter (see :meth:`_take_token`) each.
+
+        Returns:
+            bytes: The ``mp3`` content.
+
+        """
+        retries = self.payload_retries
+        while True:
+            try:
+                return self._request_part(idx, endpoint_url, limiter, token)
+            except NaverTTSInvalidPayload as e:
+                if retries <= 0:
+                    raise
+                retries -= 1
+                utils._log(log.debug, "part-%i: %s, retrying", idx, e)
+            # Rare: waits for a token in the worker
+            time.sleep(self._take_token(token))
+
+    def _request_part(self, idx, endpoint_url, limiter=None, token=None):
+        """Do the TTS API request for a single part.
+
+        With a process-wide :class:`navertts.endpoints.EndpointPool`, the
+        request is sent to one of its endpoints, and to the next ones while
+        they can't be connected to.
 
         Args:
-            savefile (string): The path and file name to save the ``mp3`` to.
+            idx (int): Index of the part, for logging.
+            endpoint_url (string): The full endpoint URL of the part.
+            limiter (:class:`navertts.concurrency.AIMDLimit`, optional):
+                Adaptive concurrency limit to report the outcome to.
+            token (:class:`navertts.cancel.CancelToken`, optional): Stop the
+                request (checked between chunks of the content) when it's
+                cancelled or past its deadline.
+
+        Returns:
+            bytes: The ``mp3`` content of the part.
 
         Raises:
             :class:`NaverTTSError`: When there's an error with the API request.
+            :class:`NaverTTSInvalidPayload`: When the response isn't ``mp3``
+                content (see :meth:`_validate`).
+            :class:`NaverTTSTimeout`: When the request timed out, or the
+                deadline of ``token`` passed.
+            :class:`NaverTTSCancelled`: When ``token`` was cancelled.
 
         """
-        savefile = str(savefile)
+        self._check(token)
+        timeout = self._timeouts(token)
+
+        pool = get_endpoint_pool()
+        if pool is None:
+            return self._request_url(idx, endpoint_url, timeout, limiter, token)
+
+        tried = []
+        while True:
+            endpoint = pool.acquire(tried)
+            tried.append(endpoint)
+            ok = None
+            try:
+                content = self._request_url(
+                    idx,
+                    endpoint.rewrite(endpoint_url, self.tld),
+                    timeout,
+                    limiter,
+                    token,
+                )
+                ok = True
+                return content
+            except NaverTTSError as e:
+                failover = _unreachable(e.__cause__)
+                if failover or _host_failed(e):
+                    ok = False
+                if not failover or len(tried) == len(pool):
+                    raise
+            finally:
+                pool.release(endpoint, ok)
+            utils._log(
+                log.debug,
+                "part-%i: %s unreachable, failing over",
+                idx,
+                endpoint.base(self.tld),
+            )
+            self._check(token)
+            timeout = self._timeouts(token)
+
+    def _request_url(self, idx, url, timeout, limiter=None, token=None):
+        """Send the request of a part to ``url``, see :meth:`_request_part`."""
+        transport = get_transport() if self.transport is None else self.transport
+        start = limiter.start() if limiter is not None else None
+        r = None
         try:
-            with open(savefile, "wb") as f:
-                self.write_to_fp(f)
-                utils._log(log.debug, "Saved to %s", savefile)
-        except NaverTTSError:
-            os.remove(savefile)
+            # Request
+            r = transport.get(url, self.NAVER_TTS_HEADERS, timeout)
+
+            utils._log(log.debug, "url-%i: %s", idx, r.url)
+            utils._log(log.debug, "status-%i: %s", idx, r.status_code)
+
+            if r.status_code >= 400:
+                raise NaverTTSError(tts=self, response=r)
+            self._validate(r)
+            content = self._read_content(r, token)
+        except TransportError as e:
+            # Request failed
+            utils._log(log.debug, str(e))
+            if limiter is not None:
+                limiter.on_drop(start)
+            if isinstance(e, TransportTimeout):
+                raise NaverTTSTimeout(
+                    "Request timed out: {}".format(e), tts=self
+                ) from e
+            raise NaverTTSError(tts=self) from e
+        except NaverTTSError as e:
+            # Bad response (e.g. throttled, or not audio), or cancelled (or
+            # past the deadline) while reading
+            utils._log(log.debug, "part-%i: %s", idx, e)
+            if limiter is not None:
+                if _host_failed(e):
+                    limiter.on_drop(start)
+                else:
+                    limiter.on_ignore(start)
             raise
+        finally:
+            # Give the connection back (or drop it, when not fully read)
+            if r is not None:
+                r.close()
+
+        if limiter is not None:
+            limiter.on_success(start)
+        return content
+
+    def _validate(self, r):
+        """Check the headers of ``r`` before reading its content.
+
+        Raises:
+            :class:`NaverTTSInvalidPayload`: When its content type isn't one
+                of ``NAVER_TTS_CONTENT_TYPES``, or its length is below
+                ``NAVER_TTS_MIN_PAYLOAD``.
+
+        """
+        content_type = r.headers.get("Content-Type")
+        if content_type is not None and not content_type.lower().startswith(
+            self.NAVER_TTS_CONTENT_TYPES
+        ):
+            raise NaverTTSInvalidPayload(
+                "Unexpected content type '{}'".format(content_type),
+                tts=self,
+                response=r,
+            )
+        length = r.headers.get("Content-Length")
+        if length is not None and length.isdigit():
+            self._check_length(r, int(length))
+
+    def _check_length(self, r, length):
+        if length < self.NAVER_TTS_MIN_PAYLOAD:
+            raise NaverTTSInvalidPayload(
+                "Got {} byte(s), expected at least {}".format(
+                    length, self.NAVER_TTS_MIN_PAYLOAD
+                ),
+                tts=self,
+                response=r,
+            )
+
+    def _read_content(self, r, token=None):
+        """Read the content of ``r``, checking ``token`` between chunks.
+
+        The first bytes are checked to be ``mp3`` content (see
+        :func:`navertts.mp3.sniff`) as soon as they're read, and the length
+        once all are.
+
+        Raises:
+            :class:`NaverTTSInvalidPayload`: When the content isn't ``mp3``,
+                or is too short.
+
+        """
+        chunks = []
+        size = 0
+        sniffed = False
+        for chunk in r.iter_content(1 << 14):
+            self._check(token)
+            chunks.append(chunk)
+            size += len(chunk)
+            if not sniffed and size >= mp3.SNIFF_SIZE:
+                self._sniff(r, chunks[0] if len(chunks) == 1 else b"".join(chunks))
+                sniffed = True
+        self._check_length(r, size)
+        if not sniffed:
+            self._sniff(r, b"".join(chunks))
+        return b"".join(chunks)
+
+    def _sniff(self, r, head):
+        if not mp3.sniff(head):
+            raise NaverTTSInvalidPayload(
+                "Not mp3 content: {!r:.40}".format(head[:32]),
+                tts=self,
+                response=r,
+            )
+
+    def _check(self, token):
+        """Raise when ``token`` was cancelled, or its deadline passed."""
+        if token is None:
+            return
+        if token.cancelled:
+            raise NaverTTSCancelled(token.reason, tts=self)
+        if token.expired:
+            raise NaverTTSTimeout("Deadline exceeded", tts=self)
+
+    def _timeouts(self, token=None):
+        """Connect and read timeouts, within the deadline of ``token``."""
+        remaining = None if token is None else token.remaining()
+        if remaining is None:
+            return self.timeout
+        return tuple(
+            remaining if t is None or t > remaining else t for t in self.timeout
+        )
+
+    def save(self, savefile, resume=False, index=None, deadline=None, cancel=None):
+        """Do the TTS API request and write result to file.
+
+        Args:
+            savefile (string): The path and file name to save the ``mp3`` to.
+            resume (bool): Write to a partial file, keeping track of the parts
+                written in a sidecar manifest, and keep both on error. Saving
+                the same text with the same voice again continues from the
+                first missing part (see :class:`navertts.checkpoint.Checkpoint`).
+                ``savefile`` is only (atomically) replaced once complete.
+            index (string, optional): Path where to write the index of the
+                parts in ``savefile`` as JSON (see :func:`write_index`).
+            deadline (float, optional): Seconds to read the whole text in.
+            cancel (:class:`navertts.cancel.CancelToken`, optional): A token
+                to stop the requests of the text with.
+
+        Returns:
+            list: The index entry (see :meth:`PartResult.to_dict`) of each part.
+
+        Raises:
+            :class:`NaverTTSError`: When there's an error with the API request
+                (:class:`NaverTTSTimeout` or :class:`NaverTTSCancelled` as for
+                :meth:`write_to_fp`).
+
+        Example:
+            Retry a long job until it completes, without fetching any part
+            twice::
+
+                >>> while True:
+                ...     try:
+                ...         tts.save("book.mp3", resume=True, index="book.json")
+                ...         break
+                ...     except NaverTTSError:
+                ...         time.sleep(60)
+
+        """
+        savefile = str(savefile)
+        if resume:
+            parts = self._save_resumable(savefile, deadline, cancel)
+        else:
+            try:
+                with open(savefile, "wb") as f:
+                    parts = [p.to_dict() for p in self.write_to_fp(f, deadline, cancel)]
+                    utils._log(log.debug, "Saved to %s", savefile)
+            except NaverTTSError:
+                os.remove(savefile)
+                raise
+
+        if index is not None:
+            write_index(str(index), parts)
+        return parts
+
+    def _save_resumable(self, savefile, deadline=None, cancel=None):
+        window = None if isinstance(self.text, str) else self.NAVER_TTS_STREAM_WINDOW
+        token = self._cancel_token(deadline, cancel)
+        with Checkpoint(savefile, self.voice) as checkpoint:
+            text_parts = checkpoint.resume(self._iter_parts())
+            parts = self._write_parts(checkpoint.fp, text_parts, window, token)
+            for result in parts:
+                # Written after the parts of previous runs
+                result.offset += checkpoint.offset
+                result.start += checkpoint.start
+                checkpoint.commit(result)
+            if not checkpoint.total:
+                checkpoint.discard()
+                raise AssertionError("No text to send to TTS API")
+            checkpoint.finalize()
+        utils._log(
+            log.debug,
+            "Saved to %s (%i of %i part(s) resumed)",
+            savefile,
+            checkpoint.skipped,
+            checkpoint.total,
+        )
+        return checkpoint.parts
 
 
 class NaverTTSError(Exception):
@@ -287,8 +1381,7 @@ class NaverTTSError(Exception):
                 cause = "Host '{}' is not reachable".format(host)
 
         else:
-            # rsp should be <requests.Response>
-            # http://docs.python-requests.org/en/master/api/
+            # rsp should be <navertts.transport.Response>
             status = rsp.status_code
             reason = rsp.reason
 
@@ -302,3 +1395,19 @@ class NaverTTSError(Exception):
                 cause = "Uptream API error. Try again later."
 
         return "{}. Probable cause: {}".format(premise, cause)
+
+
+class NaverTTSRateLimited(NaverTTSError):
+    """The request wasn't sent: the shared rate limit was reached."""
+
+
+class NaverTTSTimeout(NaverTTSError):
+    """A part request timed out, or the deadline of the call passed."""
+
+
+class NaverTTSInvalidPayload(NaverTTSError):
+    """The API answered, but not with ``mp3`` content (e.g. an error page)."""
+
+
+class NaverTTSCancelled(NaverTTSError):
+    """The call was cancelled (see :class:`navertts.cancel.CancelToken`)."""
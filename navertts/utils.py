@@ -1,6 +1,8 @@
 # -*- coding: utf-8 -*-
 from .tokenizer.symbols import ALL_PUNC as punc
+import os
 import re
+import stat
 from string import whitespace
 
 _ALL_PUNC_OR_SPACE = re.compile("^[{}]*$".format(re.escape(punc + whitespace)))
@@ -101,3 +103,34 @@ def _log(log_fun, input_string, *args):
     except UnicodeEncodeError:
         input_string = input_string.encode("ascii", "xmlcharrefreplace").decode()
         return log_fun(input_string, *args)
+
+
+def _cache_dir(name):
+    """Per-user cache directory ``name`` of navertts.
+
+    In ``$XDG_CACHE_HOME/navertts``, or else ``~/.cache/navertts``. Not
+    created: see :func:`_makedirs_private`.
+
+    """
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(
+        os.path.expanduser("~"), ".cache"
+    )
+    return os.path.join(base, "navertts", name)
+
+
+def _makedirs_private(path):
+    """Create the directory ``path`` (if needed), only accessible to the user."""
+    if not os.path.isdir(path):
+        os.makedirs(path, mode=0o700)
+
+
+def _trusted(st):
+    """Whether a file (its ``os.stat`` result ``st``) is the user's own.
+
+    That is, owned by the user and not writable by anyone else: its content
+    can be trusted. Always true where files have no owner (Windows).
+
+    """
+    if not hasattr(os, "getuid"):  # pragma: no cover
+        return True
+    return st.st_uid == os.getuid() and not st.st_mode & (stat.S_IWGRP | stat.S_IWOTH)
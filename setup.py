@@ -25,7 +25,13 @@ setup(
             "coveralls",
         ]
     },
-    entry_points={"console_scripts": ["navertts-cli=navertts.cli:tts_cli"]},
+    entry_points={
+        "console_scripts": [
+            "navertts-cli=navertts.cli:tts_cli",
+            "navertts-spool=navertts.cli:spool_cli",
+            "navertts-archive=navertts.cli:archive_cli",
+        ]
+    },
     description="NaverTTS (NAVER Text-to-Speech), a Python library and CLI tool to "
     "interface with NAVER Papago text-to-speech API",
     long_description=open("README.md", "r").read(),